@@ -352,6 +352,13 @@ def modify_config(config_dict, stn_info, logger, debug=False):
 #              Utilities that update and merge ConfigObj objects
 #==============================================================================
 
+def modify_new_install(config_dict):
+    """Set the options only a new installation gets. An upgrade does not get
+    them, because they change how an existing database is kept."""
+
+    # New sqlite databases use write-ahead logging:
+    config_dict['DatabaseTypes']['SQLite']['performance_profile'] = 'true'
+
 def update_and_merge(config_dict, template_dict):
     
     update_config(config_dict)
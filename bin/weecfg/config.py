@@ -77,6 +77,7 @@ class ConfigEngine(object):
         # Other commands use an existing config file.
         if options.install:
             config_dict = dist_config_dict
+            weecfg.modify_new_install(config_dict)
         else:
             try:
                 config_path, config_dict = weecfg.read_config(
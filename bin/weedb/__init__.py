@@ -18,6 +18,10 @@ Weedb generally follows the MySQL exception model. Specifically:
 
 import sys
 
+# How many rows a cursor fetches from the database at a time, when its result
+# set is iterated over:
+DEFAULT_ARRAYSIZE = 500
+
 # The exceptions that the weedb package can raise:
 class DatabaseError(StandardError):
     """Base class of all weedb exceptions."""
@@ -81,12 +85,13 @@ def drop(db_dict):
 class Connection(object):
     """Abstract base class, representing a connection to a database."""
 
-    def __init__(self, connection, database_name, dbtype):
+    def __init__(self, connection, database_name, dbtype, arraysize=DEFAULT_ARRAYSIZE):
         """Superclass should raise exception of type weedb.OperationalError
         if the database does not exist."""
         self.connection = connection
         self.database_name = database_name
         self.dbtype = dbtype
+        self.arraysize = arraysize
 
     def cursor(self):
         """Returns an appropriate database cursor."""
@@ -121,6 +126,22 @@ class Connection(object):
         should raise an exception of type weedb.ProgrammingError if the table does not exist."""
         raise NotImplementedError
 
+    def createTableLike(self, table, template):
+        """Create a new, empty table, with the same columns and primary key as
+        an existing table. Unlike execute(), this does not commit, so it can
+        be used within a transaction. Implementers should raise an exception
+        of type weedb.ProgrammingError if the template does not exist."""
+        raise NotImplementedError
+
+    def createMemoryTableLike(self, table, template):
+        """Create a new, empty table in memory, with the same columns and
+        primary key as an existing table. The table belongs to this connection
+        alone, and goes away when it is closed. It can be changed even if the
+        connection is read-only. Returns the name to be used for the table in
+        SQL statements. Databases that cannot do this raise
+        NotImplementedError."""
+        raise NotImplementedError
+
     def get_variable(self, var_name):
         """Return a database specific operational variable. Generally, things like 
         pragmas, or optimization-related variables.
@@ -131,6 +152,11 @@ class Connection(object):
         """
         raise NotImplemented
     
+    def checkpoint(self):
+        """Bring the database file up to date with any log of recent changes.
+        Databases that do not keep such a log need do nothing."""
+        pass
+
     def begin(self):
         raise NotImplementedError
 
@@ -147,6 +173,18 @@ class Connection(object):
             pass
 
 
+def genRows(cursor):
+    """Generator function that yields the rows in a cursor's result set. The
+    rows are fetched from the database in chunks of cursor.arraysize, which
+    is much cheaper than fetching them one at a time."""
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
 class Transaction(object):
     """Class to be used to wrap transactions in a 'with' clause."""
     def __init__(self, connection):
@@ -10,11 +10,14 @@ import decimal
 import MySQLdb
 import _mysql_exceptions
 
-from weeutil.weeutil import to_bool
+from weeutil.weeutil import to_bool, to_int
 import weedb
 
 DEFAULT_ENGINE = 'INNODB'
 
+# Maximum number of translated SQL strings to keep for each connection
+SQL_CACHE_SIZE = 200
+
 def guard(fn):
     """Decorator function that converts MySQL exceptions into weedb exceptions."""
 
@@ -97,10 +100,13 @@ class Connection(weedb.Connection):
             database_name: The database to be used. (required)
             port: Its port number (optional; default is 3306)
             engine: The MySQL database engine to use (optional; default is 'INNODB')
+            arraysize: How many rows to fetch at a time when iterating over a result
+              set (optional; default is weedb.DEFAULT_ARRAYSIZE)
             kwargs:   Any extra arguments you may wish to pass on to MySQL (optional)
             
         If the operation fails, an exception of type weedb.OperationalError will be raised.
         """
+        arraysize = to_int(kwargs.pop('arraysize', weedb.DEFAULT_ARRAYSIZE))
         try:
             connection = MySQLdb.connect(host=host, user=user, passwd=password, db=database_name, port=int(port), **kwargs)
         except _mysql_exceptions.OperationalError, e:
@@ -108,7 +114,10 @@ class Connection(weedb.Connection):
             # exception information. Tack it on, in case it might be useful.
             raise weedb.OperationalError(str(e) + " while opening database '%s'" % (database_name,))
 
-        weedb.Connection.__init__(self, connection, database_name, 'mysql')
+        weedb.Connection.__init__(self, connection, database_name, 'mysql', arraysize)
+
+        # Cache of SQL strings, already translated to MySQL placeholders
+        self.sql_cache = {}
 
         # Set the storage engine to be used
         set_engine(self.connection, engine)
@@ -123,6 +132,20 @@ class Connection(weedb.Connection):
         # obliged to include a wrapper around it:
         return Cursor(self)
 
+    def translate(self, sql_string):
+        """Return a SQL string, with its ? placeholders replaced by the %s that
+        MySQL uses. The results are cached."""
+        try:
+            return self.sql_cache[sql_string]
+        except KeyError:
+            pass
+        # Many SQL strings have their arguments built in, so the cache could
+        # grow without limit. Start over if it gets too big.
+        if len(self.sql_cache) >= SQL_CACHE_SIZE:
+            self.sql_cache.clear()
+        mysql_string = self.sql_cache[sql_string] = sql_string.replace('?', '%s')
+        return mysql_string
+
     @guard
     def tables(self):
         """Returns a list of tables in the database."""
@@ -182,6 +205,17 @@ class Connection(weedb.Connection):
         column_list = [row[1] for row in self.genSchemaOf(table)]
         return column_list
 
+    @guard
+    def createTableLike(self, table, template):
+        """Create a new, empty table, with the same schema as an existing
+        table. Note that MySQL commits any transaction in progress first."""
+
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("CREATE TABLE %s LIKE %s" % (table, template))
+        finally:
+            cursor.close()
+
     @guard
     def get_variable(self, var_name):
         cursor = self.connection.cursor()
@@ -217,6 +251,8 @@ class Cursor(object):
 
         # Get the MySQLdb cursor and store it internally:
         self.cursor = connection.connection.cursor()
+        self.translate = connection.translate
+        self.arraysize = connection.arraysize
 
     @guard
     def execute(self, sql_string, sql_tuple=()):
@@ -228,7 +264,7 @@ class Cursor(object):
         sql_tuple: A tuple with the values to be used in the placeholders."""
 
         # MySQL uses '%s' as placeholders, so replace the ?'s with %s
-        mysql_string = sql_string.replace('?', '%s')
+        mysql_string = self.translate(sql_string)
 
         # Convert sql_tuple to a plain old tuple, just in case it actually
         # derives from tuple, but overrides the string conversion (as is the
@@ -237,11 +273,40 @@ class Cursor(object):
 
         return self
 
+    @guard
+    def executemany(self, sql_string, sql_list):
+        """Execute a SQL statement once for each set of parameters in a list.
+        
+        sql_string: A SQL statement to be executed. It should use ? as
+        a placeholder.
+        
+        sql_list: A sequence of tuples, each with the values to be used in the
+        placeholders."""
+
+        mysql_string = self.translate(sql_string)
+
+        # MySQLdb rewrites a multi-row INSERT into a single statement, so
+        # this is much faster than calling execute() in a loop:
+        self.cursor.executemany(mysql_string, [tuple(sql_tuple) for sql_tuple in sql_list])
+
+        return self
+
     def fetchone(self):
         # Get a result from the MySQL cursor, then run it through the massage
         # filter below
         return massage(self.cursor.fetchone())
 
+    @guard
+    def fetchmany(self, size=None):
+        """Fetch the next set of rows, up to size of them. If size is not
+        given, then arraysize rows are fetched. Returns an empty list when
+        there are no more rows."""
+        return [massage(row) for row in self.cursor.fetchmany(size or self.arraysize)]
+
+    @guard
+    def fetchall(self):
+        return [massage(row) for row in self.cursor.fetchall()]
+
     def close(self):
         try:
             self.cursor.close()
@@ -253,7 +318,8 @@ class Cursor(object):
     # Supplying functions __iter__ and next allows the cursor to be used as an iterator.
     #
     def __iter__(self):
-        return self
+        # Fetch the rows in chunks, rather than one at a time
+        return weedb.genRows(self)
 
     def next(self):
         result = self.fetchone()
@@ -269,7 +335,7 @@ class Cursor(object):
 def massage(seq):
     # Return the massaged sequence if it exists, otherwise, return None
     if seq is not None:
-        return [int(i) if isinstance(i, long) or isinstance(i, decimal.Decimal) else i for i in seq]
+        return [int(i) if isinstance(i, (long, decimal.Decimal)) else i for i in seq]
 
 def set_engine(connect, engine):
     """Set the default MySQL storage engine."""
@@ -35,9 +35,36 @@ def guard(fn):
             if e.message.lower().startswith("no such table"):
                 raise weedb.ProgrammingError(e)
             raise weedb.OperationalError(e)
+        except sqlite3.DatabaseError, e:
+            # A read-only connection refused to change the database. See
+            # read_only_authorizer():
+            if e.message.lower().startswith("not authorized"):
+                raise weedb.OperationalError(e)
+            raise
 
     return guarded_fn
 
+# The actions that change a database:
+write_actions = frozenset(getattr(sqlite3, _name) for _name in dir(sqlite3)
+                          if _name.startswith(('SQLITE_INSERT', 'SQLITE_UPDATE', 'SQLITE_DELETE', 'SQLITE_ALTER',
+                                               'SQLITE_CREATE', 'SQLITE_DROP', 'SQLITE_REINDEX', 'SQLITE_ANALYZE')))
+
+def read_only_authorizer(action, arg1, arg2, database, trigger):  # @UnusedVariable
+    """Authorizer of read-only connections. It refuses any change, except to
+    the connection's own tables in memory. See createMemoryTableLike()."""
+    if action in write_actions and database != 'memory':
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+# Pragmas used by the performance profile. Write-ahead logging lets readers and
+# the writer use the database at the same time, without locking each other out.
+# Any pragmas given explicitly take precedence over these.
+performance_pragmas = {'journal_mode' : 'WAL',
+                       'synchronous'  : 'NORMAL',
+                       'cache_size'   : -8000,          # In kibibytes
+                       'mmap_size'    : 67108864,
+                       'temp_store'   : 'MEMORY'}
 
 def connect(database_name='', SQLITE_ROOT='', driver='', **argv):  # @UnusedVariable
     """Factory function, to keep things compatible with DBAPI. """
@@ -73,6 +100,13 @@ def drop(database_name='', SQLITE_ROOT='', driver='', **argv):  # @UnusedVariabl
         os.remove(file_path)
     except OSError:
         raise weedb.NoDatabase("""Attempt to drop non-existent database %s""" % (file_path,))
+    # Remove any write-ahead log as well, so it cannot be applied to a new
+    # database of the same name:
+    for suffix in ('-wal', '-shm'):
+        try:
+            os.remove(file_path + suffix)
+        except OSError:
+            pass
 
 
 class Connection(weedb.Connection):
@@ -91,6 +125,18 @@ class Connection(weedb.Connection):
               Optional. Default is 5.
             isolation_level: The type of isolation level to use. One of None, 
               DEFERRED, IMMEDIATE, or EXCLUSIVE. Default is None (autocommit mode).
+            check_same_thread: If false, the connection can be used by threads other than
+              the one that opened it, provided they do not use it at the same time.
+              Optional. Default is True.
+            performance_profile: If true, use write-ahead logging and the other
+              settings in performance_pragmas. Write-ahead logging stays with the
+              database once it is set. Optional. Default is False.
+            read_only: If true, the connection cannot change the database. It can still
+              change its own tables in memory. Optional. Default is False.
+            arraysize: How many rows to fetch at a time when iterating over a result set.
+              Optional. Default is weedb.DEFAULT_ARRAYSIZE.
+            cached_statements: How many compiled SQL statements to keep, so they can be
+              reused without being parsed again. Optional. Default is 200.
             
         If the operation fails, an exception of type weedb.OperationalError will be raised.
         """
@@ -100,22 +146,41 @@ class Connection(weedb.Connection):
             raise weedb.OperationalError("Attempt to open a non-existent database %s" % self.file_path)
         timeout = to_int(argv.get('timeout', 5))
         isolation_level = argv.get('isolation_level')
+        check_same_thread = to_bool(argv.get('check_same_thread', True))
+        cached_statements = to_int(argv.get('cached_statements', 200))
         try:
-            connection = sqlite3.connect(self.file_path, timeout=timeout, isolation_level=isolation_level)
+            connection = sqlite3.connect(self.file_path, timeout=timeout, isolation_level=isolation_level,
+                                         check_same_thread=check_same_thread,
+                                         cached_statements=cached_statements)
         except sqlite3.OperationalError:
             # The Pysqlite driver does not include the database file path.
             # Include it in case it might be useful.
             raise weedb.OperationalError("Unable to open database '%s'" % (self.file_path,))
 
+        read_only = to_bool(argv.get('read_only', False))
+        all_pragmas = {}
+        if to_bool(argv.get('performance_profile', False)):
+            all_pragmas.update(performance_pragmas)
+            if read_only:
+                # Leave the journal mode to the writers
+                del all_pragmas['journal_mode']
         if pragmas is not None:
-            for pragma in pragmas:
-                connection.execute("PRAGMA %s=%s;" % (pragma, pragmas[pragma]))
-        weedb.Connection.__init__(self, connection, database_name, 'sqlite')
+            all_pragmas.update(pragmas)
+        try:
+            for pragma in all_pragmas:
+                connection.execute("PRAGMA %s=%s;" % (pragma, all_pragmas[pragma]))
+            if read_only:
+                connection.set_authorizer(read_only_authorizer)
+        except sqlite3.OperationalError, e:
+            connection.close()
+            raise weedb.OperationalError(e)
+        weedb.Connection.__init__(self, connection, database_name, 'sqlite',
+                                  to_int(argv.get('arraysize', weedb.DEFAULT_ARRAYSIZE)))
 
     @guard
     def cursor(self):
         """Return a cursor object."""
-        return Cursor(self.connection)
+        return Cursor(self.connection, self.arraysize)
 
     @guard
     def execute(self, sql_string, sql_tuple=()):
@@ -159,6 +224,35 @@ class Connection(weedb.Connection):
             raise weedb.ProgrammingError("No such table %s" % table)
         return column_list
 
+    @guard
+    def createTableLike(self, table, template):
+        """Create a new, empty table, with the same schema as an existing
+        table. Sqlite has no CREATE TABLE ... LIKE, so the statement that
+        created the template is used again, with the new name."""
+
+        self.connection.execute("CREATE TABLE %s %s" % (table, self._column_definitions(template)))
+
+    @guard
+    def createMemoryTableLike(self, table, template):
+        """Create a new, empty table in memory, with the same schema as an
+        existing table. It goes into a database in memory, attached to this
+        connection as 'memory'."""
+
+        if 'memory' not in [row[1] for row in self.connection.execute("PRAGMA database_list;")]:
+            self.connection.execute("ATTACH DATABASE ':memory:' AS memory;")
+        self.connection.execute("CREATE TABLE memory.%s %s" % (table, self._column_definitions(template)))
+        return "memory.%s" % table
+
+    def _column_definitions(self, template):
+        """Return the column definitions of a table, from the statement that
+        created it."""
+        row = self.connection.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND tbl_name=?;",
+                                      (template,)).fetchone()
+        if row is None:
+            raise weedb.ProgrammingError("No such table %s" % template)
+        # Leave out everything before the column definitions:
+        return row[0][row[0].index('('):]
+
     @guard
     def get_variable(self, var_name):
         cursor = self.connection.cursor()
@@ -169,6 +263,12 @@ class Connection(weedb.Connection):
         finally:
             cursor.close()
 
+    @guard
+    def checkpoint(self):
+        """Copy the contents of the write-ahead log back into the database. It
+        does not wait for readers, so it never blocks."""
+        self.connection.execute("PRAGMA wal_checkpoint(PASSIVE);")
+
     @guard
     def begin(self):
         self.connection.execute("BEGIN TRANSACTION")
@@ -191,13 +291,18 @@ class Cursor(sqlite3.Cursor):
 
     # The sqlite3 cursor object is very full featured. We need only turn
     # the sqlite exceptions into weedb exceptions.
-    def __init__(self, *args, **kwargs):
-        sqlite3.Cursor.__init__(self, *args, **kwargs)
+    def __init__(self, connection, arraysize=weedb.DEFAULT_ARRAYSIZE):
+        sqlite3.Cursor.__init__(self, connection)
+        self.arraysize = arraysize
 
     @guard
     def execute(self, *args, **kwargs):
         return sqlite3.Cursor.execute(self, *args, **kwargs)
 
+    @guard
+    def executemany(self, *args, **kwargs):
+        return sqlite3.Cursor.executemany(self, *args, **kwargs)
+
     @guard
     def fetchone(self):
         return sqlite3.Cursor.fetchone(self)
@@ -210,3 +315,8 @@ class Cursor(sqlite3.Cursor):
     def fetchmany(self, size=None):
         if size is None: size = self.arraysize
         return sqlite3.Cursor.fetchmany(self, size)
+
+    def __iter__(self):
+        # Fetching the rows in chunks is as fast as the sqlite3 iterator, and
+        # any errors along the way get turned into weedb exceptions.
+        return weedb.genRows(self)
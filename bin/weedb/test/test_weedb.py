@@ -93,6 +93,27 @@ class Common(unittest.TestCase):
         self.assertRaises(weedb.ProgrammingError, _connect.columnsOf, 'foo')
         _connect.close()
         
+    def test_create_like(self):
+        self.populate_db()
+        _connect = weedb.connect(self.db_dict)
+        self.assertRaises(weedb.ProgrammingError, _connect.createTableLike, 'test3', 'foo')
+        # It can be used within a transaction:
+        with weedb.Transaction(_connect) as _cursor:
+            _connect.createTableLike('test3', 'test1')
+            _cursor.execute("INSERT INTO test3 (dateTime, min, mintime) VALUES (0, 10, 0)")
+        self.assertEqual(sorted(_connect.tables()), ['test1', 'test2', 'test3'])
+        for icol, col in enumerate(_connect.genSchemaOf('test3')):
+            self.assertEqual(schema[icol], col)
+        # The new table is empty, except for the one record, and has the same primary key:
+        _cursor = _connect.cursor()
+        _cursor.execute("SELECT COUNT(*) FROM test3")
+        self.assertEqual(_cursor.fetchone()[0], 1)
+        _cursor.close()
+        with weedb.Transaction(_connect) as _cursor:
+            self.assertRaises(weedb.IntegrityError, _cursor.execute, 
+                              "INSERT INTO test3 (dateTime, min, mintime) VALUES (0, 10, 0)")
+        _connect.close()
+
     def test_select(self):
         self.populate_db()
         _connect = weedb.connect(self.db_dict)
@@ -120,6 +141,28 @@ class Common(unittest.TestCase):
         _cursor.close()
         _connect.close()
         
+    def test_many(self):
+        self.populate_db()
+        # Use a small arraysize, so the result sets take several fetches
+        _connect = weedb.connect(dict(self.db_dict, arraysize=3))
+        _cursor = _connect.cursor()
+        _cursor.executemany("INSERT INTO test2 (dateTime, min, mintime) VALUES (?, ?, ?)",
+                            [(irec, 10*irec, irec) for irec in range(20)])
+        _cursor.execute("SELECT dateTime, min FROM test2 ORDER BY dateTime")
+        self.assertEqual(len(_cursor.fetchmany()), 3)
+        self.assertEqual(len(_cursor.fetchmany(5)), 5)
+        self.assertEqual([_row[0] for _row in _cursor], range(8, 20))
+        self.assertEqual(_cursor.fetchmany(), [])
+
+        _cursor.execute("SELECT dateTime, min FROM test2 ORDER BY dateTime")
+        self.assertEqual(len(_cursor.fetchall()), 20)
+
+        # Duplicate keys should raise the usual weedb exception
+        self.assertRaises(weedb.IntegrityError, _cursor.executemany,
+                          "INSERT INTO test2 (dateTime, min, mintime) VALUES (?, ?, ?)", [(20, 0, 0), (5, 0, 0)])
+        _cursor.close()
+        _connect.close()
+
     def test_bad_select(self):
         self.populate_db()
         _connect = weedb.connect(self.db_dict)
@@ -207,6 +250,56 @@ class TestSqlite(Common):
         _v = _connect.get_variable('foo')
         self.assertEqual(_v, None)
         _connect.close()
+        # The performance profile switches the database to write-ahead logging...
+        _connect = weedb.connect(dict(self.db_dict, performance_profile=True))
+        self.assertEqual(_connect.get_variable('journal_mode')[1].lower(), 'wal')
+        _connect.close()
+        # ... which it keeps, even when opened without the profile:
+        _connect = weedb.connect(self.db_dict)
+        self.assertEqual(_connect.get_variable('journal_mode')[1].lower(), 'wal')
+        _connect.close()
+        
+    def test_read_only(self):
+        self.populate_db()
+        _writer = weedb.connect(dict(self.db_dict, performance_profile=True))
+        _reader = weedb.connect(dict(self.db_dict, read_only=True))
+        # A reader cannot change the database...
+        self.assertRaises(weedb.OperationalError, _reader.execute, "DELETE FROM test1")
+        # ... but it can read it while the writer is in the middle of a transaction:
+        with weedb.Transaction(_writer) as _write_cursor:
+            _write_cursor.execute("INSERT INTO test1 (dateTime, min, mintime) VALUES (100, 0, 0)")
+            _cursor = _reader.cursor()
+            _cursor.execute("SELECT COUNT(*) FROM test1")
+            self.assertEqual(_cursor.fetchone()[0], 20)
+            _cursor.close()
+        _writer.checkpoint()
+        _cursor = _reader.cursor()
+        _cursor.execute("SELECT COUNT(*) FROM test1")
+        self.assertEqual(_cursor.fetchone()[0], 21)
+        _cursor.close()
+        _reader.close()
+        _writer.close()
+        
+    def test_memory_table(self):
+        self.populate_db()
+        _reader = weedb.connect(dict(self.db_dict, read_only=True))
+        # A read-only connection can fill a table in memory of its own:
+        _table = _reader.createMemoryTableLike('test3', 'test1')
+        self.assertEqual(_reader.createMemoryTableLike('test4', 'test1'), 'memory.test4')
+        with weedb.Transaction(_reader) as _cursor:
+            _cursor.execute("INSERT INTO %s SELECT * FROM test1 WHERE dateTime > 14" % _table)
+            _cursor.execute("DELETE FROM %s WHERE dateTime = 19" % _table)
+            self.assertRaises(weedb.OperationalError, _cursor.execute, "DELETE FROM test1")
+        _cursor = _reader.cursor()
+        _cursor.execute("SELECT COUNT(*), MIN(dateTime) FROM %s" % _table)
+        self.assertEqual(_cursor.fetchone(), (4, 15))
+        _cursor.close()
+        # It is not part of the database:
+        self.assertEqual(sorted(_reader.tables()), ['test1', 'test2'])
+        _reader.close()
+        _connect = weedb.connect(self.db_dict)
+        self.assertRaises(weedb.ProgrammingError, _connect.cursor().execute, "SELECT COUNT(*) FROM test3")
+        _connect.close()
         
 class TestMySQL(Common):
     
@@ -225,9 +318,9 @@ class TestMySQL(Common):
     
 def suite():
     tests = ['test_drop', 'test_double_create', 'test_no_db', 'test_no_tables', 
-             'test_create', 'test_bad_table', 'test_select', 'test_bad_select',
+             'test_create', 'test_create_like', 'test_bad_table', 'test_select', 'test_many', 'test_bad_select',
              'test_rollback', 'test_transaction', 'test_variable']
-    return unittest.TestSuite(map(TestSqlite, tests) + map(TestMySQL, tests))
+    return unittest.TestSuite(map(TestSqlite, tests + ['test_read_only', 'test_memory_table']) + map(TestMySQL, tests))
 
 if __name__ == '__main__':
     unittest.TextTestRunner(verbosity=2).run(suite())
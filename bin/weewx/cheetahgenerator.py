@@ -469,7 +469,7 @@ class Almanac(SearchList):
             if celestial_ts:
                 # Look for the record closest in time. Up to one hour off is
                 # acceptable:
-                rec = archive.getRecord(celestial_ts, max_delta=3600)
+                rec = archive.getRecord(celestial_ts, max_delta=3600, columns=['outTemp', 'barometer'])
                 if rec is not None:
                     if 'outTemp' in rec:
                         temperature_C = weewx.units.convert(weewx.units.as_value_tuple(rec, 'outTemp'), "degree_C")[0]
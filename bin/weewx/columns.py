@@ -0,0 +1,433 @@
+#
+#    Copyright (c) 2009-2015 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+
+"""A copy of the archive on disk, kept a column at a time, for queries over
+long spans of time, such as those of plots. See
+weewx.manager.Manager.keep_columns().
+
+The copy is a directory. Each column of the archive, dateTime included, is a
+file of its own, holding a double for each record, in time order. A null is
+NaN. Since all the values are the same width, the values within a span of time
+can be found by a binary search on the dateTime file, then read from each of
+the other files in one go, by mapping them into memory.
+
+The files belong to a generation, which is a subdirectory, named after its
+number. Records are appended to the current generation. Anything else, such as
+a rebuild, writes a new generation, then makes it the current one. So, a reader
+never sees a generation that is only partly written. File 'state' holds the
+number of the current generation, and the time after which the copy holds all
+the archive records. Records are added to the dateTime file last, so its
+length is the number of complete records.
+
+Changes are made holding a lock on file 'lock'. Readers do not need it."""
+
+from __future__ import with_statement
+import array
+import bisect
+import errno
+import fcntl
+import mmap
+import os
+import shutil
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The size of a value, in bytes. They are doubles, in the byte order of the
+# machine.
+ITEM_SIZE = 8
+NAN = float('nan')
+# The number of records written at a time:
+BATCH_SIZE = 10000
+
+
+class ColumnCache(object):
+    """A copy of the archive, kept a column at a time in a directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def span(self):
+        """Return a 2-way tuple (start, through). The copy holds all the
+        archive records with a time greater than start, up to and including
+        through. Returns None if there is no copy yet."""
+        _state = self._read_state()
+        if _state is None:
+            return None
+        (_generation, _start) = _state
+        return (_start, self._through(_generation, _start))
+
+    def columns(self):
+        """Return the names of the columns in the copy."""
+        _state = self._read_state()
+        if _state is None:
+            return []
+        return self._columns(_state[0])
+
+    def reset(self, columns, start_ts):
+        """Start a new, empty copy, with the given columns. It will hold the
+        records added after start_ts."""
+        with _Lock(self.directory):
+            self._new_generation(columns, start_ts, [])
+
+    def rebuild(self, columns, rows):
+        """Replace the copy with one holding all the archive records.
+
+        columns: The names of the columns. 'dateTime' must be among them.
+
+        rows: An iterable of sequences with the values of the columns, in
+        order of time.
+
+        returns: The number of records in the copy."""
+        with _Lock(self.directory):
+            return self._new_generation(columns, 0, rows)
+
+    def append(self, fetch_fn, min_ts=None):
+        """Add the latest records to the copy.
+
+        fetch_fn: A function that will be called with the names of the
+        columns, and a timestamp. It must return an iterable of sequences
+        with the values of those columns for the records later than the
+        timestamp, in order of time.
+
+        min_ts: The time of the earliest record added to the archive since the
+        last time. If the copy holds records later than that, they are
+        dropped and fetched again, so that the missing records get in.
+
+        returns: The number of records added, or None if another process was
+        making changes to the copy. The records will then be added the next
+        time."""
+        try:
+            _lock = _Lock(self.directory, blocking=False)
+        except IOError, e:
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return None
+            raise
+        with _lock:
+            _state = self._read_state()
+            if _state is None:
+                return None
+            (_generation, _start) = _state
+            _through = self._through(_generation, _start)
+            if min_ts is not None and min_ts <= _through:
+                # Records were added in the middle of the copy. Keep what
+                # comes before them, and fetch the rest again:
+                _generation = self._copy(_generation, _start, None, min_ts)
+                _through = self._through(_generation, _start)
+            _columns = self._columns(_generation)
+            return self._write_rows(_generation, _columns, fetch_fn(_columns, _through))
+
+    def drop(self, through_ts):
+        """Drop the records up to and including through_ts. The copy will then
+        hold only the records after it."""
+        with _Lock(self.directory):
+            _state = self._read_state()
+            if _state is not None:
+                self._copy(_state[0], max(_state[1], through_ts), through_ts, None)
+
+    def update(self, timestamp, column, value):
+        """Replace a single value in the copy, if it holds it."""
+        with _Lock(self.directory):
+            _state = self._read_state()
+            if _state is None:
+                return
+            _generation = _state[0]
+            _times = self._map(_generation, 'dateTime')
+            if _times is None:
+                return
+            try:
+                _i = bisect.bisect_left(_MappedColumn(_times), timestamp)
+                if _i == len(_times) // ITEM_SIZE or _MappedColumn(_times)[_i] != timestamp:
+                    return
+            finally:
+                _times.close()
+            try:
+                with open(self._path(_generation, column), 'r+b') as _file:
+                    _file.seek(_i * ITEM_SIZE)
+                    _file.write(struct.pack('d', NAN if value is None else value))
+            except IOError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def add_column(self, column):
+        """Add a column, with nulls for the records already in the copy."""
+        with _Lock(self.directory):
+            _state = self._read_state()
+            if _state is None or column in self._columns(_state[0]):
+                return
+            _n = self._length(_state[0])
+            with open(self._path(_state[0], column), 'wb') as _file:
+                for _i in xrange(0, _n, BATCH_SIZE):
+                    (array.array('d', [NAN]) * min(BATCH_SIZE, _n - _i)).tofile(_file)
+
+    def read(self, start_ts, stop_ts, columns, last_ts=None, left_open=False):
+        """Read the values of some columns within a span of time.
+
+        start_ts, stop_ts: The span of time. Both ends are included, unless
+        left_open is True, in which case start_ts is not.
+
+        columns: The names of the columns to be read.
+
+        last_ts: The time of the last record in the archive. If the span goes
+        past the last record in the copy, but not past this, some of the
+        records are missing from the copy. [Optional. Default is None, which
+        means the copy is up to date]
+
+        returns: A dictionary, keyed by column name, with the values as a
+        NumPy array of floats, or an array.array of type 'd' if NumPy is not
+        available. Nulls are NaN. Returns None if the copy does not hold all the
+        records in the span, or does not have all the columns."""
+        _state = self._read_state()
+        if _state is None:
+            return None
+        (_generation, _start) = _state
+        if start_ts < _start or (start_ts == _start and not left_open):
+            return None
+        _times = self._map(_generation, 'dateTime')
+        if _times is None and not os.path.exists(self._path(_generation, 'dateTime')):
+            # A new generation has just replaced this one
+            return None
+        try:
+            _n = len(_times) // ITEM_SIZE if _times is not None else 0
+            _through = _MappedColumn(_times)[_n - 1] if _n else _start
+            if stop_ts > _through and last_ts is not None and last_ts > _through:
+                return None
+            if not _n:
+                return dict((_column, _empty_column()) for _column in columns)
+            # Find the records within the span with a binary search on time:
+            if numpy is not None:
+                _time_vec = numpy.frombuffer(_times, dtype=float, count=_n)
+                _lo = int(numpy.searchsorted(_time_vec, start_ts, 'right' if left_open else 'left'))
+                _hi = int(numpy.searchsorted(_time_vec, stop_ts, 'right'))
+                del _time_vec
+            else:
+                _bisect_lo = bisect.bisect_right if left_open else bisect.bisect_left
+                _lo = _bisect_lo(_MappedColumn(_times), start_ts)
+                _hi = bisect.bisect_right(_MappedColumn(_times), stop_ts)
+        finally:
+            if _times is not None:
+                _times.close()
+
+        _result = {}
+        for _column in columns:
+            _result[_column] = self._read_column(_generation, _column, _lo, _hi)
+            if _result[_column] is None:
+                return None
+        return _result
+
+    def _read_column(self, generation, column, lo, hi):
+        """Read the values of records lo up to, but not including, hi of a
+        column. Returns None if there is no such column."""
+        _count = max(hi - lo, 0)
+        if not _count:
+            return _empty_column() if os.path.exists(self._path(generation, column)) else None
+        _map = self._map(generation, column)
+        if _map is None or len(_map) < hi * ITEM_SIZE:
+            return None
+        try:
+            if numpy is not None:
+                # Copy the values out, so the map can be closed:
+                return numpy.frombuffer(_map, dtype=float, count=_count, offset=lo * ITEM_SIZE).copy()
+            _values = array.array('d')
+            _values.fromstring(_map[lo * ITEM_SIZE:hi * ITEM_SIZE])
+            return _values
+        finally:
+            _map.close()
+
+    def _new_generation(self, columns, start_ts, rows):
+        """Write a new generation with the given columns and rows, then make
+        it the current one. Returns the number of records in it."""
+        _state = self._read_state()
+        _generation = _state[0] + 1 if _state is not None else 1
+        _dir = self._path(_generation)
+        if os.path.exists(_dir):
+            shutil.rmtree(_dir)
+        os.makedirs(_dir)
+        for _column in columns:
+            open(self._path(_generation, _column), 'wb').close()
+        nrecs = self._write_rows(_generation, columns, rows)
+        self._write_state(_generation, start_ts)
+        if _state is not None:
+            # Any reader still using the old files keeps them open.
+            shutil.rmtree(self._path(_state[0]), ignore_errors=True)
+        return nrecs
+
+    def _copy(self, generation, start_ts, after_ts, before_ts):
+        """Write a new generation, holding the records of another one with a
+        time after after_ts, and before before_ts, then make it the current
+        one. Either can be None, for no limit. Returns the new generation."""
+        _columns = self._columns(generation)
+        _times = self._map(generation, 'dateTime')
+        _lo = _hi = 0
+        if _times is not None:
+            try:
+                _lo = bisect.bisect_right(_MappedColumn(_times), after_ts) if after_ts is not None else 0
+                _hi = bisect.bisect_left(_MappedColumn(_times), before_ts) if before_ts is not None \
+                    else len(_times) // ITEM_SIZE
+            finally:
+                _times.close()
+        _new_generation = generation + 1
+        _dir = self._path(_new_generation)
+        if os.path.exists(_dir):
+            shutil.rmtree(_dir)
+        os.makedirs(_dir)
+        for _column in _columns:
+            with open(self._path(generation, _column), 'rb') as _in:
+                with open(self._path(_new_generation, _column), 'wb') as _out:
+                    _in.seek(_lo * ITEM_SIZE)
+                    _left = max(_hi - _lo, 0) * ITEM_SIZE
+                    while _left > 0:
+                        _bytes = _in.read(min(_left, BATCH_SIZE * ITEM_SIZE))
+                        if not _bytes:
+                            break
+                        _out.write(_bytes)
+                        _left -= len(_bytes)
+        self._write_state(_new_generation, start_ts)
+        shutil.rmtree(self._path(generation), ignore_errors=True)
+        return _new_generation
+
+    def _write_rows(self, generation, columns, rows):
+        """Append rows to the files of a generation. Returns the number of rows
+        written."""
+        _n = self._length(generation)
+        _time_index = columns.index('dateTime')
+        _files = [open(self._path(generation, _column), 'ab') for _column in columns]
+        try:
+            # Drop anything written by a writer that did not finish:
+            for _file in _files:
+                _file.truncate(_n * ITEM_SIZE)
+            nrecs = 0
+            _batch = [array.array('d') for _column in columns]
+            for _row in rows:
+                for (_values, _value) in zip(_batch, _row):
+                    _values.append(NAN if _value is None else _value)
+                nrecs += 1
+                if not nrecs % BATCH_SIZE:
+                    _write_batch(_files, _batch, _time_index)
+                    _batch = [array.array('d') for _column in columns]
+            _write_batch(_files, _batch, _time_index)
+        finally:
+            for _file in _files:
+                _file.close()
+        return nrecs
+
+    def _read_state(self):
+        """Return a 2-way tuple (generation, start), or None if there is no
+        copy yet."""
+        try:
+            with open(os.path.join(self.directory, 'state')) as _file:
+                (_generation, _start) = _file.read().split()
+            return (int(_generation), int(_start))
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+    def _write_state(self, generation, start_ts):
+        # Write a new file, then rename it, so readers see either the old
+        # state or the new one:
+        _path = os.path.join(self.directory, 'state')
+        with open(_path + '.tmp', 'w') as _file:
+            _file.write("%d %d\n" % (generation, start_ts))
+        os.rename(_path + '.tmp', _path)
+
+    def _path(self, generation, column=None):
+        _dir = os.path.join(self.directory, str(generation))
+        return os.path.join(_dir, column + '.col') if column is not None else _dir
+
+    def _columns(self, generation):
+        try:
+            return sorted(_name[:-4] for _name in os.listdir(self._path(generation)) if _name.endswith('.col'))
+        except OSError:
+            return []
+
+    def _length(self, generation):
+        """Return the number of complete records in a generation."""
+        try:
+            return os.path.getsize(self._path(generation, 'dateTime')) // ITEM_SIZE
+        except OSError:
+            return 0
+
+    def _through(self, generation, start_ts):
+        """Return the time of the last record in a generation, or start_ts if
+        it has none."""
+        _times = self._map(generation, 'dateTime')
+        if _times is None:
+            return start_ts
+        try:
+            _n = len(_times) // ITEM_SIZE
+            return int(_MappedColumn(_times)[_n - 1]) if _n else start_ts
+        finally:
+            _times.close()
+
+    def _map(self, generation, column):
+        """Map a file into memory. Returns None if it does not exist, or is
+        empty."""
+        try:
+            with open(self._path(generation, column), 'rb') as _file:
+                if not os.fstat(_file.fileno()).st_size:
+                    return None
+                return mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+
+class _MappedColumn(object):
+    """A column mapped into memory, as a sequence of floats that can be
+    searched with bisect."""
+
+    def __init__(self, mapped):
+        self.mapped = mapped
+
+    def __len__(self):
+        return len(self.mapped) // ITEM_SIZE
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return struct.unpack_from('d', self.mapped, i * ITEM_SIZE)[0]
+
+
+class _Lock(object):
+    """Holds the lock on the copy, while in a with statement. If it is not
+    blocking, an exception of type IOError is raised at once if another
+    process holds the lock."""
+
+    def __init__(self, directory, blocking=True):
+        self.file = open(os.path.join(directory, 'lock'), 'a')
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            self.file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etyp, einst, etb):  # @UnusedVariable
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _write_batch(files, batch, time_index):
+    """Append a batch of values to the files. The times go last, so the
+    records are complete once they show up in the dateTime file."""
+    for (_i, (_file, _values)) in enumerate(zip(files, batch)):
+        if _i != time_index:
+            _values.tofile(_file)
+            _file.flush()
+    batch[time_index].tofile(files[time_index])
+    files[time_index].flush()
+
+def _empty_column():
+    return numpy.empty(0, dtype=float) if numpy is not None else array.array('d')
@@ -11,11 +11,13 @@ import gc
 import os.path
 import platform
 import signal
+import Queue
 import socket
 import sys
 import syslog
 import time
 import thread
+import threading
 
 # 3rd party imports:
 import configobj
@@ -112,6 +114,8 @@ class StdEngine(object):
         
         self.stn_info = weewx.station.StationInfo(self.console, **config_dict['Station'])
         self.db_binder = weewx.manager.DBBinder(config_dict)
+        # If StdArchive writes in the background, this will be its writer thread:
+        self.archive_writer = None
         
     def loadServices(self, config_dict):
         """Set up the services to be run."""
@@ -254,6 +258,9 @@ class StdEngine(object):
             del self.db_binder
         except:
             pass
+        
+        # Close any managers left in the pool:
+        weewx.manager.manager_pool.close()
 
     def _get_console_time(self):
         try:
@@ -471,12 +478,27 @@ class StdArchive(StdService):
             self.archive_delay = to_int(config_dict['StdArchive'].get('archive_delay', 15))
             software_interval = to_int(config_dict['StdArchive'].get('archive_interval', 300))
             self.loop_hilo = to_bool(config_dict['StdArchive'].get('loop_hilo', True))
+            self.catchup_chunk_size = to_int(config_dict['StdArchive'].get('catchup_chunk_size', 100))
+            write_behind = to_bool(config_dict['StdArchive'].get('write_behind', False))
+            write_queue_size = to_int(config_dict['StdArchive'].get('write_queue_size', 100))
         else:
             self.data_binding = 'wx_binding'
             self.record_generation = 'hardware'
             self.archive_delay = 15
             software_interval = 300
             self.loop_hilo = True
+            self.catchup_chunk_size = 100
+            write_behind = False
+            write_queue_size = 100
+        
+        # While catching up, archive records are held here, then added to
+        # the database in bulk. It is None when not catching up.
+        self.catchup_buffer = None
+        
+        # At the end of an archive period, the accumulator with the LOOP
+        # hi/lows is held here, so it can be saved in the same transaction
+        # as the archive record.
+        self.pending_hilo = None
             
         syslog.syslog(syslog.LOG_INFO, "engine: Archive will use data binding %s" % self.data_binding)
         
@@ -511,6 +533,15 @@ class StdArchive(StdService):
         
         self.setup_database(config_dict)
         
+        # Unless requested, the database is written by the main thread. The
+        # LOOP packets wait until it is done.
+        self.writer = None
+        if write_behind:
+            syslog.syslog(syslog.LOG_INFO, "engine: Archive records will be written in the background")
+            self.writer = ArchiveWriter(config_dict, self.data_binding, write_queue_size)
+            self.writer.start()
+            self.engine.archive_writer = self.writer
+
         self.bind(weewx.STARTUP, self.startup)
         self.bind(weewx.PRE_LOOP, self.pre_loop)
         self.bind(weewx.POST_LOOP, self.post_loop)
@@ -576,9 +607,8 @@ class StdArchive(StdService):
         # If we happen to startup in the small time interval between the end of
         # the archive interval and the end of the archive delay period, then
         # there will be no old accumulator.
-        dbmanager = self.engine.db_binder.get_manager(self.data_binding)
         if hasattr(self, 'old_accumulator'):
-            dbmanager.updateHiLo(self.old_accumulator)
+            self.pending_hilo = self.old_accumulator
             # If the user has requested software generation, then do that:
             if self.record_generation == 'software':
                 self._software_catchup()
@@ -592,6 +622,20 @@ class StdArchive(StdService):
                     self._software_catchup()
             else:
                 raise ValueError("Unknown station record generation value %s" % self.record_generation)
+            # If no new record came along, the hi/lows have to be saved on
+            # their own:
+            if self.pending_hilo is not None:
+                if self.writer is not None:
+                    self.writer.put_hilo(self.pending_hilo)
+                else:
+                    self.engine.db_binder.get_manager(self.data_binding).updateHiLo(self.pending_hilo)
+                self.pending_hilo = None
+            # The writes for this archive period are done. Bring the database
+            # file up to date with them, before the reports start reading it:
+            if self.writer is not None:
+                self.writer.put_checkpoint()
+            else:
+                self.engine.db_binder.get_manager(self.data_binding).connection.checkpoint()
 
         # Set the time of the next break loop:
         self.end_archive_delay_ts = self.end_archive_period_ts + self.archive_delay
@@ -599,8 +643,21 @@ class StdArchive(StdService):
     def new_archive_record(self, event):
         """Called when a new archive record has arrived. 
         Put it in the archive database."""
-        dbmanager = self.engine.db_binder.get_manager(self.data_binding)
-        dbmanager.addRecord(event.record)
+        if self.catchup_buffer is not None:
+            # We are in the middle of a catch up. Save the record, to be added
+            # later with the rest of its chunk.
+            self.catchup_buffer.append(event.record)
+            if len(self.catchup_buffer) >= self.catchup_chunk_size:
+                self._flush_catchup()
+        else:
+            self._add_record(event.record)
+
+    def shutDown(self):
+        """Write anything still waiting in the queue, then stop the writer thread."""
+        if self.writer is not None:
+            self.writer.shutDown()
+            self.writer = None
+            self.engine.archive_writer = None
 
     def setup_database(self, config_dict):  # @UnusedVariable
         """Setup the main database archive"""
@@ -620,9 +677,18 @@ class StdArchive(StdService):
         type NotImplementedError will be thrown.""" 
 
         dbmanager = self.engine.db_binder.get_manager(self.data_binding)
-        # Find out when the database was last updated.
+        # Find out when the database was last updated. First write any records
+        # that are still waiting in the queue.
+        if self.writer is not None:
+            self.writer.flush()
         lastgood_ts = dbmanager.lastGoodStamp()
 
+        # Unless disabled, hold the records so they can be added in bulk.
+        # Anything that reads the database through the binder gets them
+        # written first:
+        if self.catchup_chunk_size > 1:
+            self.catchup_buffer = []
+            self.engine.db_binder.set_pending(self.data_binding, self._write_pending)
         try:
             # Now ask the console for any new records since then.
             # (Not all consoles support this feature).
@@ -633,6 +699,43 @@ class StdArchive(StdService):
         except weewx.HardwareError, e:
             syslog.syslog(syslog.LOG_ERR, "engine: Internal error detected. Catchup abandoned")
             syslog.syslog(syslog.LOG_ERR, "**** %s" % e)
+        finally:
+            # Add anything still being held, then go back to adding
+            # records one at a time
+            try:
+                self._flush_catchup()
+            finally:
+                self.catchup_buffer = None
+                self.engine.db_binder.set_pending(self.data_binding, None)
+
+    def _flush_catchup(self):
+        """Add any records held during a catch up to the database."""
+        if self.catchup_buffer:
+            # Take them out of the buffer first. Adding them may look up the
+            # manager, which calls _write_pending() again.
+            records, self.catchup_buffer = self.catchup_buffer, []
+            self._add_record(records, self.catchup_chunk_size)
+            
+    def _write_pending(self):
+        """Called before something reads the database during a catch up. Add
+        the records being held, and wait until they have been written, so it
+        sees them."""
+        self._flush_catchup()
+        if self.writer is not None:
+            self.writer.flush()
+            
+    def _add_record(self, record_obj, chunk_size=None):
+        """Add a record, or a list of records, to the database, along with
+        any hi/lows waiting to be saved."""
+        accumulator, self.pending_hilo = self.pending_hilo, None
+        if self.writer is not None:
+            self.writer.put_record(record_obj, chunk_size, accumulator)
+        else:
+            dbmanager = self.engine.db_binder.get_manager(self.data_binding)
+            if accumulator is not None:
+                dbmanager.addRecord(record_obj, chunk_size=chunk_size, accumulator=accumulator)
+            else:
+                dbmanager.addRecord(record_obj, chunk_size=chunk_size)
         
     def _software_catchup(self):
         # Extract a record out of the old accumulator. 
@@ -651,6 +754,187 @@ class StdArchive(StdService):
         new_accumulator = weewx.accum.Accum(weeutil.weeutil.TimeSpan(start_ts, end_ts))
         return new_accumulator
     
+#==============================================================================
+#                    Class ArchiveWriter
+#==============================================================================
+
+class ArchiveWriter(threading.Thread):
+    """Thread that writes archive records and hi/lo accumulators to the
+    database, in the background.
+    
+    The writes are taken from a queue, and done in the order they were put
+    there. The thread uses its own database manager, so it never shares a
+    connection with the main thread.
+    
+    A write that fails with an OperationalError (for example, the database
+    is locked, or cannot be reached) is held, then tried again, ahead of
+    anything newer, when the next write comes along. Up to queue_size writes
+    are held this way."""
+    
+    def __init__(self, config_dict, data_binding, queue_size=100):
+        """Initialize an instance of ArchiveWriter.
+        
+        config_dict: The configuration dictionary.
+        
+        data_binding: The binding of the database to be written.
+        
+        queue_size: The most writes that can be waiting. If the queue is full,
+        the thread putting a write in it waits for a free place. [Optional.
+        Default is 100]"""
+        threading.Thread.__init__(self, name='ArchiveWriter')
+        self.setDaemon(True)
+        self.config_dict = config_dict
+        self.data_binding = data_binding
+        self.queue = Queue.Queue(queue_size)
+        # Writes that failed, and are waiting to be tried again
+        self.failed = []
+        self.max_failed = queue_size
+        # Time of the latest record written to the database
+        self.last_ts = None
+        # Statistics, for the log
+        self.nwrites = 0
+        self.max_depth = 0
+        self.max_latency = 0.0
+        
+    def put_record(self, record_obj, chunk_size=None, accumulator=None):
+        """Queue a record, or a list of records, to be added to the database.
+        If an accumulator is given, its hi/lows are saved along with them."""
+        # Other services may change the records before they get written, so
+        # queue copies of them.
+        if hasattr(record_obj, 'keys'):
+            record_obj = dict(record_obj)
+        else:
+            record_obj = [dict(record) for record in record_obj]
+        self._put(('record', record_obj, chunk_size, accumulator))
+        
+    def put_hilo(self, accumulator):
+        """Queue an accumulator, to be used to update the daily hi/lows."""
+        self._put(('hilo', None, None, accumulator))
+        
+    def put_checkpoint(self):
+        """Queue a checkpoint of the database. See weedb.Connection.checkpoint()."""
+        self._put(('checkpoint', None, None, None))
+        
+    def flush(self):
+        """Wait until everything in the queue has been written, or has
+        failed."""
+        self.queue.join()
+        
+    def shutDown(self):
+        """Write anything left in the queue, then stop the thread."""
+        if self.isAlive():
+            # A None in the queue signals the thread to stop
+            self.queue.put(None)
+            self.join(60.0)
+            if self.isAlive():
+                syslog.syslog(syslog.LOG_ERR, "engine: Unable to shut down archive writer. "
+                              "%d writes were not done." % self.queue.qsize())
+        if self.failed:
+            syslog.syslog(syslog.LOG_ERR, "engine: Archive writer is stopping with %d failed writes "
+                          "that were not done." % len(self.failed))
+        syslog.syslog(syslog.LOG_INFO, "engine: Archive writer did %d writes. Longest was %.3f seconds. "
+                      "Deepest queue was %d." % (self.nwrites, self.max_latency, self.max_depth))
+        
+    def _put(self, item):
+        self.queue.put(item)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        
+    def run(self):
+        dbmanager = None
+        try:
+            while True:
+                item = self.queue.get()
+                try:
+                    if dbmanager is None:
+                        dbmanager = self._open()
+                    if item is None:
+                        # Give any failed writes one last try
+                        self._retry(dbmanager)
+                        return
+                    self._write(dbmanager, item)
+                    if self.failed and dbmanager is not None:
+                        # The connection may have gone bad. Open a new one
+                        # for the next try.
+                        dbmanager.close()
+                        dbmanager = None
+                finally:
+                    self.queue.task_done()
+        finally:
+            if dbmanager is not None:
+                dbmanager.close()
+                
+    def _open(self):
+        """Open the database manager. Returns None if it cannot be opened, in
+        which case the writes fail, and are held, until it can be."""
+        try:
+            return weewx.manager.open_manager_with_config(self.config_dict, self.data_binding)
+        except Exception, e:
+            # Keep emptying the queue anyway, so the main thread does not wait
+            # on it forever.
+            syslog.syslog(syslog.LOG_ERR, "engine: Archive writer unable to open database: %s" % e)
+            return None
+        
+    def _retry(self, dbmanager):
+        """Try the failed writes again, oldest first. Returns True if they
+        have all been done."""
+        while self.failed:
+            if not self._do(dbmanager, *self.failed[0]):
+                return False
+            del self.failed[0]
+        return True
+        
+    def _write(self, dbmanager, item):
+        # Anything that failed earlier has to be written first, to keep the
+        # writes in order.
+        if self._retry(dbmanager) and self._do(dbmanager, *item):
+            return
+        # A checkpoint of the database can be skipped. Anything else is held,
+        # to be tried again.
+        if item[0] != 'checkpoint':
+            self.failed.append(item)
+            if len(self.failed) > self.max_failed:
+                action = self.failed.pop(0)[0]
+                syslog.syslog(syslog.LOG_ERR, "engine: Archive writer has too many failed writes. "
+                              "Giving up on the oldest %s" % action)
+        
+    def _do(self, dbmanager, action, record_obj, chunk_size, accumulator):
+        """Do one write. Returns True if it was done, or if it failed in a way
+        that trying again will not fix. Returns False if it should be tried
+        again."""
+        if dbmanager is None:
+            syslog.syslog(syslog.LOG_ERR, "engine: Archive writer has no database. Unable to do %s" % action)
+            return False
+        t1 = time.time()
+        try:
+            if action == 'record' and accumulator is not None:
+                dbmanager.addRecord(record_obj, chunk_size=chunk_size, accumulator=accumulator)
+            elif action == 'record':
+                dbmanager.addRecord(record_obj, chunk_size=chunk_size)
+            elif action == 'hilo':
+                dbmanager.updateHiLo(accumulator)
+            else:
+                dbmanager.connection.checkpoint()
+        except weedb.OperationalError, e:
+            syslog.syslog(syslog.LOG_ERR, "engine: Archive writer unable to do %s: %s. "
+                          "Will try again." % (action, e))
+            return False
+        except Exception, e:
+            # Trying again would fail the same way. Log the error, but keep
+            # going, so later writes still get done.
+            syslog.syslog(syslog.LOG_ERR, "engine: Archive writer unable to do %s: %s" % (action, e))
+            return True
+        if action == 'record':
+            if hasattr(record_obj, 'keys'):
+                self.last_ts = weeutil.weeutil.max_with_none((self.last_ts, record_obj['dateTime']))
+            else:
+                self.last_ts = weeutil.weeutil.max_with_none([self.last_ts] + [record['dateTime'] for record in record_obj])
+        latency = time.time() - t1
+        self.nwrites += 1
+        self.max_latency = max(self.max_latency, latency)
+        syslog.syslog(syslog.LOG_DEBUG, "engine: Archive writer did %s in %.3f seconds. "
+                      "Queue depth is %d." % (action, latency, self.queue.qsize()))
+        return True
+
 #==============================================================================
 #                    Class StdTimeSynch
 #==============================================================================
@@ -761,7 +1045,8 @@ class StdReport(StdService):
             self.thread = weewx.reportengine.StdReportEngine(self.config_dict,
                                                              self.engine.stn_info,
                                                              self.record,
-                                                             first_run=not self.launch_time)
+                                                             first_run=not self.launch_time,
+                                                             archive_writer=getattr(self.engine, 'archive_writer', None))
             self.thread.start()
             self.launch_time = time.time()
         except thread.error:
@@ -7,6 +7,8 @@
 Needs to be refactored into smaller functions."""
 
 from __future__ import with_statement
+import array
+import operator
 import time
 import datetime
 import syslog
@@ -136,9 +138,11 @@ class ImageGenerator(weewx.reportengine.ReportGenerator):
                     # Now its time to find and hit the database:
                     binding = line_options['data_binding']
                     archive = self.db_binder.get_manager(binding)
+                    # Ask for columns, so the unit conversions below are done
+                    # a whole column at a time:
                     (start_vec_t, stop_vec_t, data_vec_t) = \
                             archive.getSqlVectors((minstamp, maxstamp), var_type, aggregate_type=aggregate_type,
-                                                  aggregate_interval=aggregate_interval)
+                                                  aggregate_interval=aggregate_interval, columnar=True)
 
                     if weewx.debug:
                         assert(len(start_vec_t) == len(stop_vec_t))
@@ -184,7 +188,11 @@ class ImageGenerator(weewx.reportengine.ReportGenerator):
 
                         gap_fraction = None
                         if plot_type == 'bar':
-                            interval_vec = [x[1] - x[0]for x in zip(new_start_vec_t.value, new_stop_vec_t.value)]
+                            if isinstance(new_stop_vec_t[0], array.array):
+                                interval_vec = map(operator.sub, new_stop_vec_t[0], new_start_vec_t[0])
+                            else:
+                                # NumPy arrays can be subtracted as a whole
+                                interval_vec = (new_stop_vec_t[0] - new_start_vec_t[0]).tolist()
                         elif plot_type == 'line':
                             gap_fraction = to_float(line_options.get('line_gap_fraction'))
                         if gap_fraction is not None:
@@ -202,7 +210,7 @@ class ImageGenerator(weewx.reportengine.ReportGenerator):
                     
                     # Add the line to the emerging plot:
                     plot.addLine(weeplot.genplot.PlotLine(
-                        new_stop_vec_t[0], new_data_vec_t[0],
+                        new_stop_vec_t[0].tolist(), _column_to_list(new_data_vec_t[0]),
                         label         = label, 
                         color         = color,
                         width         = width,
@@ -228,6 +236,13 @@ class ImageGenerator(weewx.reportengine.ReportGenerator):
         if self.log_success:
             syslog.syslog(syslog.LOG_INFO, "genimages: Generated %d images for %s in %.2f seconds" % (ngen, self.skin_dict['REPORT_NAME'], t2 - t1))
 
+def _column_to_list(column):
+    """Convert a column of data, as returned by getSqlVectors(columnar=True),
+    to the list the plotting code expects, with None for the nulls."""
+    values = column.tolist() if hasattr(column, 'tolist') else column
+    # Only NaN is not equal to itself
+    return [None if v != v else v for v in values]
+
 def skipThisPlot(time_ts, aggregate_interval, img_file):
     """A plot can be skipped if it was generated recently and has not changed.
     This happens if the time since the plot was generated is less than the
@@ -5,17 +5,171 @@
 #
 """Classes and functions for interfacing with a weewx archive."""
 from __future__ import with_statement
+import array
+import bisect
+import collections
+import itertools
 import math
+import re
 import syslog
 import sys
+import threading
 import time
 
 import weewx.accum
+import weewx.columns
 from weewx.units import ValueTuple
 import weewx.units
 import weeutil.weeutil
 import weedb
 
+# If the user has installed NumPy, use it to speed up the wind vector
+# calculations. Otherwise, fall back to pure Python:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The number of records to be inserted at a time when copying an archive
+DEFAULT_CHUNK_SIZE = 1000
+
+# The number of records kept by getRecord() for reuse
+RECORD_CACHE_SIZE = 50
+
+def memoize_aggregate(fn):
+    """Decorator function that caches the results of a getAggregate method
+    in the manager. The results are keyed on the method, timespan, observation
+    type, aggregation type, and option 'val'. Other options are assumed not to
+    change over the life of the manager. 
+    
+    Nested calls, such as when a subclass calls the version of its
+    superclass, go straight through to the database."""
+
+    def memoized_fn(self, timespan, obs_type, aggregate_type, **option_dict):
+        if self._in_aggregate:
+            return fn(self, timespan, obs_type, aggregate_type, **option_dict)
+        _key = (fn, timespan.start, timespan.stop, obs_type, aggregate_type, option_dict.get('val'))
+        try:
+            _result = self._aggregate_cache[_key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Option 'val' cannot be hashed. Do not cache.
+            _key = None
+        else:
+            self.aggregate_hits += 1
+            return _result
+        
+        self._in_aggregate = True
+        try:
+            _result = fn(self, timespan, obs_type, aggregate_type, **option_dict)
+        finally:
+            self._in_aggregate = False
+        self.aggregate_misses += 1
+        if _key is not None:
+            self._aggregate_cache[_key] = _result
+        return _result
+
+    memoized_fn.__name__ = fn.__name__
+    memoized_fn.__doc__ = fn.__doc__
+    return memoized_fn
+
+#==============================================================================
+#                         class CompactRecord
+#==============================================================================
+
+class CompactRecord(tuple):
+    """A read-only archive record, held as a tuple of values.
+    
+    To code that only reads it, it looks like a dictionary: it can be indexed
+    by observation type, and has get(), keys(), items(), and so on. The keys
+    are held by the class, rather than by each record, so a record costs no
+    more than the row it came from. Use compact_record_class() to get the
+    class for a list of keys. If a record has to be changed, convert it with
+    dict(record) first."""
+    
+    __slots__ = ()
+    _keys = ()
+    _index = {}
+    
+    def __getitem__(self, key):
+        return tuple.__getitem__(self, self._index[key])
+    
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+    
+    def __contains__(self, key):
+        return key in self._index
+    
+    has_key = __contains__
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    iterkeys = __iter__
+    
+    def keys(self):
+        return list(self._keys)
+    
+    def itervalues(self):
+        return tuple.__iter__(self)
+    
+    def values(self):
+        return list(tuple.__iter__(self))
+    
+    def iteritems(self):
+        return itertools.izip(self._keys, tuple.__iter__(self))
+    
+    def items(self):
+        return zip(self._keys, tuple.__iter__(self))
+    
+    def copy(self):
+        return dict(self.iteritems())
+    
+    def __eq__(self, other):
+        if isinstance(other, (dict, CompactRecord)):
+            return self.copy() == dict(other)
+        return NotImplemented
+    
+    def __ne__(self, other):
+        _eq = self.__eq__(other)
+        return _eq if _eq is NotImplemented else not _eq
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return "CompactRecord(%r)" % (self.copy(),)
+
+# The record classes made so far, keyed by their tuple of keys
+_compact_record_classes = {}
+
+def compact_record_class(keys):
+    """Return the subclass of CompactRecord for records with the given list of
+    keys. It is made the first time it is asked for. After that, the same class
+    is returned.
+    
+    Example:
+    >>> cls = compact_record_class(['dateTime', 'usUnits', 'outTemp'])
+    >>> rec = cls((1420070400, 1, 20.5))
+    >>> print rec['outTemp'], rec.get('barometer'), 'usUnits' in rec
+    20.5 None True
+    >>> print sorted(rec.items())
+    [('dateTime', 1420070400), ('outTemp', 20.5), ('usUnits', 1)]
+    >>> compact_record_class(('dateTime', 'usUnits', 'outTemp')) is cls
+    True
+    """
+    _keys = tuple(keys)
+    try:
+        return _compact_record_classes[_keys]
+    except KeyError:
+        _cls = type('CompactRecord', (CompactRecord,),
+                    {'__slots__' : (),
+                     '_keys'     : _keys,
+                     '_index'    : dict((k, i) for (i, k) in enumerate(_keys))})
+        _compact_record_classes[_keys] = _cls
+        return _cls
+
 #==============================================================================
 #                         class Manager
 #==============================================================================
@@ -46,7 +200,25 @@ class Manager(object):
     
     first_timestamp: The timestamp of the earliest record in the table.
     
-    last_timestamp: The timestamp of the last record in the table."""
+    last_timestamp: The timestamp of the last record in the table.
+    
+    aggregate_hits, aggregate_misses: The number of calls to getAggregate()
+    that were answered by the cache of aggregates, and that had to go to the
+    database. The cache is cleared whenever the database changes. So is the
+    cache of recently fetched records used by getRecord().
+    
+    Functions getRecord(), genBatchRows() and genBatchRecords() take an
+    optional list of the columns to be read. On a wide schema, where most of
+    the columns never hold any data, reading only the columns returned by
+    getLiveKeys() can save a lot of work.
+    
+    The archive records need not all be in the table table_name. Old records
+    can be rolled up into coarser tables, or tiers, by downsample(), and the
+    records can be kept in a table per year. See PartitionedManager. The
+    latest records can also be copied into memory. See keep_hot(). Queries of
+    the archive should use table_for_span() in their FROM clause, rather than
+    table_name. For plots, getSqlVectors() can also read a copy of the archive
+    kept a column at a time on disk. See keep_columns()."""
     
     def __init__(self, connection, table_name='archive', schema=None):
         """Initialize an object of type Manager.
@@ -64,6 +236,35 @@ class Manager(object):
 
         self.connection = connection
         self.table_name = table_name
+        # The database dictionary used to open the connection, if known. It
+        # allows other processes to open their own connection:
+        self.database_dict = None
+        # Cache of INSERT statements, keyed by the table and the set of keys in
+        # a record:
+        self._insert_stmt_cache = {}
+        # Cache of aggregates. See memoize_aggregate():
+        self._aggregate_cache = {}
+        # Cache of records returned by getRecord(), least recently used first:
+        self._record_cache = collections.OrderedDict()
+        self._in_aggregate = False
+        self.aggregate_hits = 0
+        self.aggregate_misses = 0
+        # The set of columns known to have held data, and the time of the
+        # last record checked for them. See getLiveKeys():
+        self._live_keys = None
+        self._live_through = None
+        # The tiers of downsampled records. See _load_tiers():
+        self._tiers = []
+        self._tier_tables = {}
+        self._tiers_through = None
+        self._first_stamps = None
+        # The copy in memory of the latest records. See keep_hot():
+        self._hot_table = None
+        self._hot_window = None
+        self._hot_start = None
+        self._hot_through = None
+        # The columnar copy of the archive on disk. See keep_columns():
+        self._column_cache = None
 
         # Now get the SQL types. 
         try:
@@ -100,6 +301,7 @@ class Manager(object):
 
         # Create an instance of the right class and return it:
         dbmanager = cls(connection, table_name)
+        dbmanager.database_dict = database_dict
         return dbmanager
     
     @classmethod
@@ -136,6 +338,7 @@ class Manager(object):
 
         # Create an instance of the right class and return it:
         dbmanager = cls(connection, table_name=table_name, schema=schema)
+        dbmanager.database_dict = database_dict
         return dbmanager
     
     @property
@@ -184,33 +387,346 @@ class Manager(object):
 
     def _sync(self):
         """Resynch the internal caches."""
+        # Another manager may have downsampled the archive:
+        self._load_tiers()
+
+        # Cache the first and last timestamps
+        self.first_timestamp = self.firstGoodStamp()
+        self.last_timestamp  = self.lastGoodStamp()
+
         # Fetch the first row in the database to determine the unit system in
         # use. If the database has never been used, then the unit system is
         # still indeterminate --- set it to 'None'.
-        _row = self.getSql("SELECT usUnits FROM %s LIMIT 1;" % self.table_name)
+        _row = self.getSql("SELECT usUnits FROM %s LIMIT 1;" % self.table_for_span(self.first_timestamp, self.first_timestamp))
         self.std_unit_system = _row[0] if _row is not None else None
         
-        # Cache the first and last timestamps
-        self.first_timestamp = self.firstGoodStamp()
-        self.last_timestamp  = self.lastGoodStamp()
+        # Another manager may have changed the database:
+        self._clear_query_cache()
+        if self._hot_window:
+            self._sync_hot()
+
+    def _clear_query_cache(self):
+        """Discard any cached aggregates and records."""
+        self._aggregate_cache = {}
+        self._record_cache = collections.OrderedDict()
+
+    def _load_tiers(self):
+        """Find the tiers of downsampled records in the database, and the span
+        of time each of them holds."""
+        _pattern = re.compile(r'^%s_tier_(\d+)$' % re.escape(self.table_name))
+        # The tables of all the tiers, keyed by their interval:
+        self._tier_tables = {}
+        # The tiers holding records, in time order. Each is a tuple (first
+        # timestamp, last timestamp, interval, table name):
+        self._tiers = []
+        for _table in self.connection.tables():
+            _match = _pattern.match(_table)
+            if _match:
+                _interval = int(_match.group(1))
+                self._tier_tables[_interval] = _table
+                _row = self.getSql("SELECT MIN(dateTime), MAX(dateTime) FROM %s" % _table)
+                if _row and _row[0] is not None:
+                    self._tiers.append((_row[0], _row[1], _interval, _table))
+        self._tiers.sort()
+        # Records up to this time are in the tiers, the rest in the main table:
+        self._tiers_through = max(_tier[1] for _tier in self._tiers) if self._tiers else None
+        self._first_stamps = self._get_first_stamps()
+
+    def _get_first_stamps(self):
+        """Return the time of the first record in each tier, and in the main
+        tables. Downsampling takes the oldest records of a table, so if another
+        manager has downsampled the archive, one of these has changed."""
+        _stamps = [self.getSql("SELECT MIN(dateTime) FROM %s" % self._tier_tables[_interval])[0]
+                   for _interval in sorted(self._tier_tables)]
+        _first = None
+        for _table in self._main_tables():
+            _first = self.getSql("SELECT MIN(dateTime) FROM %s" % _table)[0]
+            if _first is not None:
+                break
+        _stamps.append(_first)
+        return _stamps
+
+    def _check_tiers(self):
+        """Reload the tiers, if another manager has moved records into them
+        since they were loaded. It takes an index probe per table. Only reads
+        are done, so it is safe within a transaction."""
+        if self._get_first_stamps() != self._first_stamps:
+            self._load_tiers()
+            self._clear_query_cache()
 
     def lastGoodStamp(self):
         """Retrieves the epoch time of the last good archive record.
         
         returns: Time of the last good archive record as an epoch time, or
         None if there are no records."""
-        _row = self.getSql("SELECT MAX(dateTime) FROM %s" % self.table_name)
-        return _row[0] if _row else None
+        for _table in reversed(self._database_tables()):
+            _row = self.getSql("SELECT MAX(dateTime) FROM %s" % _table)
+            if _row and _row[0] is not None:
+                return _row[0]
+        return None
     
     def firstGoodStamp(self):
         """Retrieves earliest timestamp in the archive.
         
         returns: Time of the first good archive record as an epoch time, or
         None if there are no records."""
-        _row = self.getSql("SELECT MIN(dateTime) FROM %s" % self.table_name)
-        return _row[0] if _row else None
+        for _table in self._database_tables():
+            _row = self.getSql("SELECT MIN(dateTime) FROM %s" % _table)
+            if _row and _row[0] is not None:
+                return _row[0]
+        return None
+
+    def table_for_span(self, start_ts=None, stop_ts=None):
+        """Return what to put in the FROM clause of a query on the archive
+        records within a span of time. The query must still select the records
+        it wants with a WHERE clause.
+        
+        start_ts, stop_ts: The span of time. Both ends are included. If 'None',
+        there is no limit on that side.
+        
+        returns: The name of a table. If the span covers more than one table,
+        a subquery that joins them. See downsample(), keep_hot() and
+        PartitionedManager."""
+        _tables = self._archive_tables(start_ts, stop_ts)
+        if not _tables:
+            # Nothing there. The main table has the right columns, and no
+            # records, so queries on it return nothing.
+            return self.table_name
+        if len(_tables) == 1:
+            return _tables[0]
+        # Each part of the union is limited to the span, so the rest of each
+        # table does not have to be read:
+        _where = []
+        if start_ts is not None:
+            _where.append("dateTime >= %d" % start_ts)
+        if stop_ts is not None:
+            _where.append("dateTime <= %d" % math.ceil(stop_ts))
+        _where_str = " WHERE %s" % " AND ".join(_where) if _where else ""
+        return "(%s) AS %s_span" % (" UNION ALL ".join("SELECT * FROM %s%s" % (_table, _where_str) for _table in _tables), 
+                                    self.table_name)
+
+    def _archive_tables(self, start_ts=None, stop_ts=None):
+        """Return a list of the tables that hold the archive records within a
+        span of time, in time order. Both ends of the span are included. See
+        table_for_span()."""
+        if self._hot_covers(start_ts, stop_ts):
+            return [self._hot_table]
+        return self._database_tables(start_ts, stop_ts)
+
+    def _database_tables(self, start_ts=None, stop_ts=None):
+        """Return a list of the tables in the database that hold the archive
+        records within a span of time, in time order: first the tiers, then
+        the main tables."""
+        self._check_tiers()
+        _tables = [_table for (_first, _last, _interval, _table) in self._tiers
+                   if (start_ts is None or _last >= start_ts) and (stop_ts is None or _first <= stop_ts)]
+        if self._tiers_through is None or stop_ts is None or stop_ts > self._tiers_through:
+            _tables += self._main_tables(start_ts, stop_ts)
+        return _tables
+
+    def _archive_table_of(self, timestamp, create=False):
+        """Return the name of the table that holds the archive record with a
+        given timestamp. If create is True, the table is created first, if
+        there isn't one yet, so a new record can be put in it."""
+        self._check_tiers()
+        if self._tiers_through is not None and timestamp <= self._tiers_through:
+            # A record that falls before the end of the tiers goes to the
+            # first tier that ends after it:
+            for (_i, (_first, _last, _interval, _table)) in enumerate(self._tiers):
+                if timestamp <= _last:
+                    if create and timestamp < _first:
+                        self._tiers[_i] = (timestamp, _last, _interval, _table)
+                    return _table
+        return self._main_table_of(timestamp, create)
+
+    def _hot_covers(self, start_ts, stop_ts):
+        """Return True if the copy in memory holds all the archive records
+        within a span of time. See keep_hot()."""
+        if self._hot_start is None or start_ts is None or start_ts <= self._hot_start:
+            return False
+        if stop_ts is None or stop_ts > self._hot_through:
+            # Another manager may have added newer records. Looking for them
+            # takes a single probe of the index:
+            self._refresh_hot()
+        return start_ts > self._hot_start
+
+    def _main_tables(self, start_ts=None, stop_ts=None):
+        """Return a list of the tables, other than the tiers, that hold the
+        archive records within a span of time, in time order."""
+        return [self.table_name]
+
+    def _main_table_of(self, timestamp, create=False):
+        """Return the name of the table, other than the tiers, that holds the
+        archive record with a given timestamp. See _archive_table_of()."""
+        return self.table_name
+
+    def keep_hot(self, hours):
+        """Keep a copy in memory of the archive records of the last few hours.
+        Queries over a span of time that fits within them are answered from
+        the copy, without going to the database. 
+        
+        Records added with addRecord() go into the copy as well. Records
+        added by other managers are copied when a query needs them, if they
+        are newer than those already in the copy. Records removed by other
+        managers (for example, by downsample()) are dropped from the copy at
+        the next call to _sync(). Values changed in place by other managers
+        are not seen until keep_hot() is called again.
+        
+        hours: How many hours of records to keep. If zero or None, no copy is
+        kept.
+        
+        Not all databases can do this. If this one cannot, it is logged, and
+        the manager carries on without a copy."""
+        if not hours:
+            self._hot_window = self._hot_start = self._hot_through = None
+            return
+        if self._hot_table is None:
+            try:
+                self._hot_table = self.connection.createMemoryTableLike("%s_hot" % self.table_name, self.table_name)
+            except NotImplementedError:
+                syslog.syslog(syslog.LOG_INFO, "manager: database '%s' cannot keep records in memory" % self.database_name)
+                return
+        self._hot_window = int(hours * 3600)
+        self._load_hot()
+
+    def _load_hot(self):
+        """Copy the latest records into memory, replacing any there before."""
+        # Queries go to the database until the copy is complete:
+        self._hot_start = self._hot_through = None
+        _cursor = self.connection.cursor()
+        try:
+            _cursor.execute("DELETE FROM %s" % self._hot_table)
+            if self.last_timestamp is not None:
+                _start = self.last_timestamp - self._hot_window
+                for _table in self._database_tables(_start, None):
+                    _cursor.execute("INSERT INTO %s SELECT * FROM %s WHERE dateTime > ?" % (self._hot_table, _table), (_start,))
+                self._hot_start = _start
+                self._hot_through = self.last_timestamp
+            else:
+                # No records yet. They all go into memory, as they come:
+                self._hot_start = self._hot_through = 0
+        finally:
+            _cursor.close()
+
+    def _sync_hot(self):
+        """Bring the copy in memory up to date with the database, which other
+        managers may have changed. Newer records are copied in. The copy is
+        loaded afresh only if records within it are gone from the database."""
+        if self._hot_start is None or (self.last_timestamp or 0) < self._hot_through:
+            self._load_hot()
+            return
+        _count = 0
+        for _table in self._database_tables(self._hot_start, self._hot_through):
+            _count += self.getSql("SELECT COUNT(*) FROM %s WHERE dateTime > ? AND dateTime <= ?" % _table, 
+                                  (self._hot_start, self._hot_through))[0]
+        if _count != self.getSql("SELECT COUNT(*) FROM %s" % self._hot_table)[0]:
+            self._load_hot()
+        else:
+            self._refresh_hot()
 
-    def addRecord(self, record_obj, log_level=syslog.LOG_NOTICE):
+    def _refresh_hot(self):
+        """Copy into memory any records newer than the latest one there, then
+        drop the records that are no longer within the window."""
+        _cursor = self.connection.cursor()
+        try:
+            for _table in self._database_tables(self._hot_through, None):
+                _cursor.execute("INSERT INTO %s SELECT * FROM %s WHERE dateTime > ?" % (self._hot_table, _table), (self._hot_through,))
+            _cursor.execute("SELECT MAX(dateTime) FROM %s" % self._hot_table)
+            _row = _cursor.fetchone()
+        finally:
+            _cursor.close()
+        if _row and _row[0] is not None and _row[0] > self._hot_through:
+            self._hot_through = _row[0]
+            self._trim_hot()
+
+    def _trim_hot(self):
+        """Drop the records that are no longer within the window."""
+        _start = self._hot_through - self._hot_window
+        if _start > self._hot_start:
+            _cursor = self.connection.cursor()
+            try:
+                _cursor.execute("DELETE FROM %s WHERE dateTime <= ?" % self._hot_table, (_start,))
+            finally:
+                _cursor.close()
+            self._hot_start = _start
+
+    def _add_hot(self, records, cursor):
+        """Put records just added to the database into the copy in memory as
+        well, if they are within the window."""
+        _groups = {}
+        for record in records:
+            if record['dateTime'] > self._hot_start:
+                key_list, sql_insert_stmt = self._get_insert_stmt(record, self._hot_table)
+                _groups.setdefault(sql_insert_stmt, (key_list, []))[1].append(record)
+                self._hot_through = max(self._hot_through, record['dateTime'])
+        for sql_insert_stmt in _groups:
+            key_list, group = _groups[sql_insert_stmt]
+            cursor.executemany(sql_insert_stmt, [[record[k] for k in key_list] for record in group])
+
+    def keep_columns(self, directory=None):
+        """Keep a copy of the archive on disk, a column at a time, and have
+        getSqlVectors() read it, rather than the database, whenever it holds
+        the records needed. See weewx.columns.
+        
+        Records added with addRecord() go into the copy as well, as do any
+        added by other managers since the last time. Values changed with
+        updateValue(), and types added with add_obs_type(), are changed in the
+        copy too. Records rolled up by downsample() are dropped from it.
+        
+        A new copy holds only the records added from then on. Call
+        rebuild_columns() to copy the rest of the archive.
+        
+        directory: The directory holding the copy. [Optional. For an SQLite
+        database, the default is the database file, with '.columns' added.
+        Other databases have no default]"""
+        if directory is None:
+            if not self.database_dict or self.database_dict.get('driver') != 'weedb.sqlite':
+                raise weewx.ViolatedPrecondition("No directory given for the columnar copy of database '%s'" % 
+                                                 self.database_name)
+            import weedb.sqlite
+            _database_dict = dict(self.database_dict)
+            _database_dict.setdefault('SQLITE_ROOT', '')
+            directory = weedb.sqlite.get_filepath(**_database_dict) + '.columns'
+        self._column_cache = weewx.columns.ColumnCache(directory)
+        if self._column_cache.span() is None:
+            self._column_cache.reset(self.sqlkeys, self.last_timestamp or 0)
+            syslog.syslog(syslog.LOG_NOTICE, "manager: Started columnar copy of database '%s' in %s" % 
+                          (self.database_name, directory))
+        else:
+            # Pick up any records added since the last time:
+            self._append_columns()
+
+    def rebuild_columns(self):
+        """Copy the whole archive into the columnar copy, replacing what was
+        there. See keep_columns().
+        
+        returns: The number of records copied."""
+        if self._column_cache is None:
+            raise weewx.ViolatedPrecondition("Database '%s' has no columnar copy" % self.database_name)
+        _columns = list(self.sqlkeys)
+        nrecs = self._column_cache.rebuild(_columns, 
+                                           self.genSql("SELECT %s FROM %s ORDER BY dateTime ASC" % 
+                                                       (', '.join("`%s`" % k for k in _columns), self.table_for_span())))
+        syslog.syslog(syslog.LOG_INFO, "manager: Copied %d records of database '%s' into columns" % 
+                      (nrecs, self.database_name))
+        return nrecs
+
+    def _append_columns(self, min_ts=None):
+        """Add the records newer than the latest one in the columnar copy to
+        it. If min_ts is given, it is the time of the earliest record just
+        added. See weewx.columns.ColumnCache.append()."""
+        def _fetch(columns, through_ts):
+            return self.genSql("SELECT %s FROM %s WHERE dateTime > ? ORDER BY dateTime ASC" % 
+                               (', '.join("`%s`" % k for k in columns), self.table_for_span(through_ts + 1, None)), 
+                               (through_ts,))
+        try:
+            self._column_cache.append(_fetch, min_ts)
+        except (weedb.DatabaseError, IOError, OSError), e:
+            # The queries go to the database until the copy gets fixed:
+            syslog.syslog(syslog.LOG_ERR, "manager: Unable to update columnar copy of database '%s': %s" % 
+                          (self.database_name, e))
+
+    def addRecord(self, record_obj, log_level=syslog.LOG_NOTICE, chunk_size=None):
         """Commit a single record or a collection of records to the archive.
         
         record_obj: Either a data record, or an iterable that can return data
@@ -219,6 +735,12 @@ class Manager(object):
         database.
         
         log_level: What syslog level to use for any logging. Default is syslog.LOG_NOTICE.
+        
+        chunk_size: If non-None, the records are inserted in bulk, this many at
+        a time. Records sharing the same set of keys are sent to the database
+        with a single executemany() call. Useful when adding a large number of
+        records, such as during a catch up or a transfer.
+        [Optional. Default is None (insert one record at a time)]
         """
         
         # Determine if record_obj is just a single dictionary instance
@@ -226,10 +748,38 @@ class Manager(object):
         # something iterable (a list):
         record_list = [record_obj] if hasattr(record_obj, 'keys') else record_obj
         
-        min_ts = None
-        max_ts = 0
-        with weedb.Transaction(self.connection) as cursor:
+        try:
+            with weedb.Transaction(self.connection) as cursor:
+                min_ts, max_ts = self._addRecords(record_list, cursor, log_level, chunk_size)
+        except:
+            # The copy in memory may not have been rolled back with the rest:
+            if self._hot_start is not None:
+                self._load_hot()
+            raise
 
+        # Update the cached timestamps. This has to sit outside the
+        # transaction context, in case an exception occurs.
+        self._update_timestamps(min_ts, max_ts)
+        
+    def _addRecords(self, record_list, cursor, log_level, chunk_size):
+        """Internal function for adding a list of records to the database,
+        using an open cursor. See addRecord().
+        
+        returns: A 2-way tuple with the smallest and largest timestamps of the
+        records actually added, or (None, None) if none were."""
+        
+        min_ts = None
+        max_ts = None
+        if chunk_size:
+            _record_iter = iter(record_list)
+            while True:
+                _chunk = list(itertools.islice(_record_iter, chunk_size))
+                if not _chunk:
+                    break
+                for record in self._addChunk(_chunk, cursor, log_level):
+                    min_ts = min(min_ts, record['dateTime']) if min_ts is not None else record['dateTime']
+                    max_ts = max(max_ts, record['dateTime'])
+        else:
             for record in record_list:
                 try:
                     self._addSingleRecord(record, cursor, log_level)
@@ -240,11 +790,22 @@ class Manager(object):
                                   (weeutil.weeutil.timestamp_to_string(record['dateTime']), 
                                    self.database_name,
                                    e))
-
-        # Update the cached timestamps. This has to sit outside the
-        # transaction context, in case an exception occurs.
-        self.first_timestamp = min(min_ts, self.first_timestamp)
-        self.last_timestamp  = max(max_ts, self.last_timestamp)
+        return (min_ts, max_ts)
+        
+    def _update_timestamps(self, min_ts, max_ts):
+        """Update the cached first and last timestamps after records have been
+        added, and discard any cached aggregates, which may now be out of date."""
+        self.first_timestamp = weeutil.weeutil.min_with_none((min_ts, self.first_timestamp))
+        self.last_timestamp  = weeutil.weeutil.max_with_none((max_ts, self.last_timestamp))
+        self._clear_query_cache()
+        # Records added before the last one checked by getLiveKeys() would be
+        # missed by it, so start over:
+        if min_ts is not None and self._live_through is not None and min_ts <= self._live_through:
+            self._live_keys = None
+        if self._hot_start is not None:
+            self._trim_hot()
+        if self._column_cache is not None and max_ts is not None:
+            self._append_columns(min_ts)
         
     def _addSingleRecord(self, record, cursor, log_level):
         """Internal function for adding a single record to the database."""
@@ -257,15 +818,112 @@ class Manager(object):
         # system as the records already in the database:
         self._check_unit_system(record['usUnits'])
 
+        # Only data types that appear in the database schema can be
+        # inserted. Get the list of keys, and the matching INSERT statement:
+        key_list, sql_insert_stmt = self._get_insert_stmt(record)
+        # Get the values in the same order:
+        value_list = [record[k] for k in key_list]
+        
+        cursor.execute(sql_insert_stmt, value_list)
+        if self._hot_start is not None:
+            self._add_hot([record], cursor)
+        syslog.syslog(log_level, "manager: added record %s to database '%s'" % 
+                      (weeutil.weeutil.timestamp_to_string(record['dateTime']),
+                       self.database_name))
+
+    def _addChunk(self, record_chunk, cursor, log_level):
+        """Internal function for adding a list of records to the database in
+        bulk. 
+        
+        Records that are already in the database, or that appear more than
+        once in the chunk, are logged and skipped, just as they would be by
+        _addSingleRecord().
+        
+        returns: A list of the records actually added."""
+
+        for record in record_chunk:
+            if record['dateTime'] is None:
+                syslog.syslog(syslog.LOG_ERR, "manager: archive record with null time encountered")
+                raise weewx.ViolatedPrecondition("Manager record with null time encountered.")
+            self._check_unit_system(record['usUnits'])
+
+        # Find which of the timestamps are already in the database. One
+        # indexed range query is a lot cheaper than letting each INSERT fail.
+        _start_ts = min(record['dateTime'] for record in record_chunk)
+        _stop_ts  = max(record['dateTime'] for record in record_chunk)
+        _seen = set(_row[0] for _row in cursor.execute("SELECT dateTime FROM %s WHERE dateTime >= ? AND dateTime <= ?" % 
+                                                         self.table_for_span(_start_ts, _stop_ts), (_start_ts, _stop_ts)))
+
+        # Sort the new records by the set of keys they use. Each group can
+        # then share a single INSERT statement.
+        _added = []
+        _groups = {}
+        for record in record_chunk:
+            if record['dateTime'] in _seen:
+                syslog.syslog(syslog.LOG_ERR, "manager: unable to add record %s to database '%s': duplicate timestamp" %
+                              (weeutil.weeutil.timestamp_to_string(record['dateTime']), self.database_name))
+                continue
+            _seen.add(record['dateTime'])
+            key_list, sql_insert_stmt = self._get_insert_stmt(record)
+            _groups.setdefault(sql_insert_stmt, (key_list, []))[1].append(record)
+            _added.append(record)
+        
+        for sql_insert_stmt in _groups:
+            key_list, group = _groups[sql_insert_stmt]
+            # A failed executemany() can leave the rows before the bad one
+            # inserted, so the group goes in under a savepoint:
+            cursor.execute("SAVEPOINT weewx_chunk")
+            try:
+                cursor.executemany(sql_insert_stmt, [[record[k] for k in key_list] for record in group])
+                if self._hot_start is not None:
+                    self._add_hot(group, cursor)
+            except (weedb.IntegrityError, weedb.OperationalError), e:
+                # Something is wrong with this group. Undo whatever got in,
+                # then fall back to adding the records one at a time, so the
+                # good ones still get in.
+                syslog.syslog(syslog.LOG_ERR, "manager: bulk insert into database '%s' failed: %s" % (self.database_name, e))
+                cursor.execute("ROLLBACK TO SAVEPOINT weewx_chunk")
+                cursor.execute("RELEASE SAVEPOINT weewx_chunk")
+                for record in group:
+                    try:
+                        Manager._addSingleRecord(self, record, cursor, log_level)
+                    except (weedb.IntegrityError, weedb.OperationalError), e:
+                        syslog.syslog(syslog.LOG_ERR, "manager: unable to add record %s to database '%s': %s" %
+                                      (weeutil.weeutil.timestamp_to_string(record['dateTime']), self.database_name, e))
+                        _added.remove(record)
+            else:
+                cursor.execute("RELEASE SAVEPOINT weewx_chunk")
+
+        if _added:
+            syslog.syslog(log_level, "manager: added %d records %s to %s to database '%s'" % 
+                          (len(_added), 
+                           weeutil.weeutil.timestamp_to_string(_added[0]['dateTime']),
+                           weeutil.weeutil.timestamp_to_string(_added[-1]['dateTime']),
+                           self.database_name))
+        return _added
+
+    def _get_insert_stmt(self, record, table=None):
+        """Return a 2-way tuple (key_list, sql_insert_stmt) with the keys in the
+        record that can be inserted, and the SQL INSERT statement that does it.
+        The results are cached, so records with the same set of keys, going to
+        the same table, share the same statement.
+        
+        table: The table the record goes into. [Optional. Default is the
+        table that holds the records of its time]"""
+        
+        _table = table or self._archive_table_of(record['dateTime'], create=True)
+        _key_set = frozenset(record.keys())
+        try:
+            return self._insert_stmt_cache[(_table, _key_set)]
+        except KeyError:
+            pass
+        
         # Only data types that appear in the database schema can be
         # inserted. To find them, form the intersection between the
         # set of all record keys and the set of all sql keys
-        record_key_set = set(record.keys())
-        insert_key_set = record_key_set.intersection(self.sqlkeys)
+        insert_key_set = _key_set.intersection(self.sqlkeys)
         # Convert to an ordered list:
         key_list = list(insert_key_set)
-        # Get the values in the same order:
-        value_list = [record[k] for k in key_list]
         
         # This will a string of sql types, separated by commas. Because
         # some of the weewx sql keys (notably 'interval') are reserved
@@ -275,13 +933,11 @@ class Manager(object):
         # question marks:
         q_str = ','.join('?' * len(key_list))
         # Form the SQL insert statement:
-        sql_insert_stmt = "INSERT INTO %s (%s) VALUES (%s)" % (self.table_name, k_str, q_str) 
-        cursor.execute(sql_insert_stmt, value_list)
-        syslog.syslog(log_level, "manager: added record %s to database '%s'" % 
-                      (weeutil.weeutil.timestamp_to_string(record['dateTime']),
-                       self.database_name))
+        sql_insert_stmt = "INSERT INTO %s (%s) VALUES (%s)" % (_table, k_str, q_str) 
+        self._insert_stmt_cache[(_table, _key_set)] = (key_list, sql_insert_stmt)
+        return (key_list, sql_insert_stmt)
 
-    def genBatchRows(self, startstamp=None, stopstamp=None):
+    def genBatchRows(self, startstamp=None, stopstamp=None, columns=None):
         """Generator function that yields raw rows from the archive database
         with timestamps within an interval.
         
@@ -291,34 +947,40 @@ class Manager(object):
         stopstamp: Inclusive end of the interval in epoch time. If 'None', then
         end at last archive record.
         
+        columns: A list of the columns to be read. See _get_column_list().
+        [Optional. Default is all the columns, in the order of sqlkeys]
+        
         yields: A list with the data records"""
 
-        _cursor = self.connection.cursor()
-        try:
-            if startstamp is None:
-                if stopstamp is None:
-                    _gen = _cursor.execute("SELECT * FROM %s ORDER BY dateTime ASC" % self.table_name)
-                else:
-                    _gen = _cursor.execute("SELECT * FROM %s WHERE dateTime <= ? ORDER BY dateTime ASC" % self.table_name, (stopstamp,))
-            else:
-                if stopstamp is None:
-                    _gen = _cursor.execute("SELECT * FROM %s WHERE dateTime > ? ORDER BY dateTime ASC" % self.table_name, (startstamp,))
+        _column_str = ', '.join("`%s`" % k for k in self._get_column_list(columns)) if columns is not None else '*'
+        _last_time = 0
+        # Go through the tables holding the records one at a time, in order:
+        for _table in self._archive_tables(startstamp, stopstamp):
+            _cursor = self.connection.cursor()
+            try:
+                if startstamp is None:
+                    if stopstamp is None:
+                        _gen = _cursor.execute("SELECT %s FROM %s ORDER BY dateTime ASC" % (_column_str, _table))
+                    else:
+                        _gen = _cursor.execute("SELECT %s FROM %s WHERE dateTime <= ? ORDER BY dateTime ASC" % (_column_str, _table), (stopstamp,))
                 else:
-                    _gen = _cursor.execute("SELECT * FROM %s WHERE dateTime > ? AND dateTime <= ? ORDER BY dateTime ASC" % self.table_name,
-                                            (startstamp, stopstamp))
-               
-            _last_time = 0
-            for _row in _gen:
-                # The following is to get around a bug in sqlite when all the
-                # tables are in one file:
-                if _row[0] <= _last_time:
-                    continue
-                _last_time = _row[0]
-                yield _row
-        finally:
-            _cursor.close()
+                    if stopstamp is None:
+                        _gen = _cursor.execute("SELECT %s FROM %s WHERE dateTime > ? ORDER BY dateTime ASC" % (_column_str, _table), (startstamp,))
+                    else:
+                        _gen = _cursor.execute("SELECT %s FROM %s WHERE dateTime > ? AND dateTime <= ? ORDER BY dateTime ASC" % (_column_str, _table),
+                                                (startstamp, stopstamp))
+                   
+                for _row in _gen:
+                    # The following is to get around a bug in sqlite when all the
+                    # tables are in one file:
+                    if _row[0] <= _last_time:
+                        continue
+                    _last_time = _row[0]
+                    yield _row
+            finally:
+                _cursor.close()
 
-    def genBatchRecords(self, startstamp=None, stopstamp=None):
+    def genBatchRecords(self, startstamp=None, stopstamp=None, columns=None, compact=False):
         """Generator function that yields records with timestamps within an
         interval.
         
@@ -328,13 +990,26 @@ class Manager(object):
         stopstamp: Inclusive end of the interval in epoch time. If 'None', then
         end at last archive record.
         
+        columns: A list of the columns to be read. The records will hold only
+        these, plus dateTime and usUnits. [Optional. Default is all the columns]
+        
+        compact: If True, the records are read-only CompactRecords, rather than
+        dictionaries. They are a lot cheaper to make and to keep, which matters
+        when going through a large archive. [Optional. Default is False]
+        
         yields: A dictionary where key is the observation type (eg, 'outTemp')
         and the value is the observation value"""
         
-        for _row in self.genBatchRows(startstamp, stopstamp):
-            yield dict(zip(self.sqlkeys, _row)) if _row else None
+        _keys = self._get_column_list(columns) if columns is not None else self.sqlkeys
+        if compact:
+            _cls = compact_record_class(_keys)
+            for _row in self.genBatchRows(startstamp, stopstamp, columns):
+                yield _cls(_row) if _row else None
+        else:
+            for _row in self.genBatchRows(startstamp, stopstamp, columns):
+                yield dict(zip(_keys, _row)) if _row else None
         
-    def getRecord(self, timestamp, max_delta=None):
+    def getRecord(self, timestamp, max_delta=None, columns=None):
         """Get a single archive record with a given epoch time stamp.
         
         timestamp: The epoch time of the desired record.
@@ -342,28 +1017,290 @@ class Manager(object):
         max_delta: The largest difference in time that is acceptable. 
         [Optional. The default is no difference]
         
+        columns: A list of the columns to be read. The record will hold only
+        these, plus dateTime and usUnits. [Optional. Default is all the columns]
+        
         returns: a record dictionary or None if the record does not exist."""
 
+        # Recently fetched records are kept in a cache, so templates that use
+        # the same record many times go to the database only once:
+        _key = (timestamp, max_delta, tuple(columns) if columns is not None else None)
+        try:
+            _record = self._record_cache.pop(_key)
+        except KeyError:
+            _record = self._getRecord(timestamp, max_delta, columns)
+            if len(self._record_cache) >= RECORD_CACHE_SIZE:
+                # Discard the least recently used record:
+                self._record_cache.popitem(last=False)
+        self._record_cache[_key] = _record
+        # Return a copy, so the caller is free to change it:
+        return dict(_record) if _record is not None else None
+        
+    def _getRecord(self, timestamp, max_delta, columns):
+        """Get a single archive record from the database. See getRecord()."""
+
+        if max_delta:
+            # Find the time of the nearest record, then get it using the primary key:
+            timestamp = self.getNearestStamp(timestamp, max_delta)
+            if timestamp is None:
+                return None
+
+        if columns is not None:
+            _keys = self._get_column_list(columns)
+            _column_str = ', '.join("`%s`" % k for k in _keys)
+        else:
+            _keys = self.sqlkeys
+            _column_str = '*'
         _cursor = self.connection.cursor()
         try:
-            if max_delta:
-                time_start_ts = timestamp - max_delta
-                time_stop_ts  = timestamp + max_delta
-                _cursor.execute("SELECT * FROM %s WHERE dateTime>=? AND dateTime<=? "\
-                                "ORDER BY ABS(dateTime-?) ASC LIMIT 1" % self.table_name,
-                                (time_start_ts, time_stop_ts, timestamp))
-            else:
-                _cursor.execute("SELECT * FROM %s WHERE dateTime=?" % self.table_name, (timestamp,))
+            _table = self._hot_table if self._hot_covers(timestamp, timestamp) else self._archive_table_of(timestamp)
+            _cursor.execute("SELECT %s FROM %s WHERE dateTime=?" % (_column_str, _table), (timestamp,))
             _row = _cursor.fetchone()
-            return dict(zip(self.sqlkeys, _row)) if _row else None
+            return dict(zip(_keys, _row)) if _row else None
         finally:
             _cursor.close()
 
+    def _get_column_list(self, columns):
+        """Return the list of columns to be read for a list of requested
+        columns. It starts with dateTime and usUnits, which are always needed,
+        followed by the rest of the requested columns, in the order given.
+        Columns that are not in the table are left out."""
+        return ['dateTime', 'usUnits'] + [k for k in columns if k in self.sqlkeys and k not in ('dateTime', 'usUnits')]
+
+    def getLiveKeys(self):
+        """Return a list of the columns in the archive table that have held
+        data in at least one record, in the same order as sqlkeys.
+        
+        The answer is remembered. After that, only records added since the last
+        call are checked. Columns that first get data in records added before
+        then by another manager will not be noticed until this manager is
+        reopened."""
+        
+        if self._live_keys is None:
+            self._live_keys = set()
+            self._live_through = None
+        _dead_keys = [k for k in self.sqlkeys if k not in self._live_keys]
+        _last_ts = self.last_timestamp
+        if _dead_keys and _last_ts is not None and (self._live_through is None or _last_ts > self._live_through):
+            # If there is a last checked record, only newer records need to be
+            # scanned, which is an indexed range query.
+            self._live_keys.update(self._scan_live_keys(_dead_keys, self._live_through, _last_ts))
+            self._live_through = _last_ts
+        return [k for k in self.sqlkeys if k in self._live_keys]
+
+    def _scan_live_keys(self, keys, startstamp=None, stopstamp=None):
+        """Return a list of those keys whose columns hold data in at least one
+        record within an interval. A single scan counts the values in all the
+        columns. 
+        
+        startstamp: Exclusive start of the interval. If 'None', then start at
+        the earliest archive record.
+        
+        stopstamp: Inclusive end of the interval. If 'None', then end at the
+        last archive record."""
+        
+        if not keys:
+            return []
+        _where = []
+        _args = []
+        if startstamp is not None:
+            _where.append("dateTime > ?")
+            _args.append(startstamp)
+        if stopstamp is not None:
+            _where.append("dateTime <= ?")
+            _args.append(stopstamp)
+        _sql_str = "SELECT %s FROM %s" % (', '.join("COUNT(`%s`)" % k for k in keys), self.table_for_span(startstamp, stopstamp))
+        if _where:
+            _sql_str += " WHERE " + " AND ".join(_where)
+        _row = self.getSql(_sql_str, _args)
+        return [k for (k, n) in zip(keys, _row) if n] if _row else []
+
+    def getNearestStamp(self, timestamp, max_delta=None):
+        """Find the time of the archive record nearest a given time.
+        
+        timestamp: The epoch time to look around.
+        
+        max_delta: The largest difference in time that is acceptable.
+        [Optional. The default is no limit]
+        
+        returns: The epoch time of the nearest record, or None if there is no
+        record within max_delta. If two records are equally near, the
+        earlier one is returned."""
+
+        # Sorting on the distance to the timestamp would defeat the index on
+        # dateTime. Instead, look for the nearest record on each side. Each
+        # of these is a single seek on the index. If the archive is split
+        # into several tables, work outwards from the timestamp, one table at
+        # a time, until a record is found.
+        _low  = timestamp - max_delta if max_delta is not None else None
+        _high = timestamp + max_delta if max_delta is not None else None
+        _below_ts = _above_ts = None
+        for _table in reversed(self._archive_tables(_low, timestamp)):
+            _row = self.getSql("SELECT MAX(dateTime) FROM %s WHERE dateTime<=? AND dateTime>=?" % _table,
+                               (timestamp, _low if _low is not None else 0))
+            _below_ts = _row[0] if _row else None
+            if _below_ts is not None:
+                break
+        for _table in self._archive_tables(timestamp, _high):
+            _row = self.getSql("SELECT MIN(dateTime) FROM %s WHERE dateTime>=? AND dateTime<=?" % _table,
+                               (timestamp, _high if _high is not None else sys.maxint))
+            _above_ts = _row[0] if _row else None
+            if _above_ts is not None:
+                break
+
+        if _below_ts is None:
+            return _above_ts
+        if _above_ts is None or timestamp - _below_ts <= _above_ts - timestamp:
+            return _below_ts
+        return _above_ts
+
     def updateValue(self, timestamp, obs_type, new_value):
         """Update (replace) a single value in the database."""
         
         self.connection.execute("UPDATE %s SET %s=? WHERE dateTime=?" % 
-                                (self.table_name, obs_type), (new_value, timestamp))
+                                (self._archive_table_of(timestamp), obs_type), (new_value, timestamp))
+        if self._hot_start is not None and timestamp > self._hot_start:
+            self.connection.execute("UPDATE %s SET %s=? WHERE dateTime=?" % 
+                                    (self._hot_table, obs_type), (new_value, timestamp))
+        if self._column_cache is not None:
+            self._column_cache.update(timestamp, obs_type, new_value)
+        self._clear_query_cache()
+
+    def add_obs_type(self, obs_type, sql_type='REAL'):
+        """Add a new observation type to the archive table, in place.
+        
+        The column is added with ALTER TABLE, so, unlike reconfig(), the
+        archive does not get copied. Existing records get NULL for the new type.
+        Programs that already have the database open, such as weewxd, will not
+        store the new type until they are restarted.
+        
+        obs_type: The name of the new type.
+        
+        sql_type: Its SQL type. [Optional. Default is 'REAL']"""
+        
+        if obs_type in self.sqlkeys:
+            raise weewx.ViolatedPrecondition("Type '%s' is already in table '%s' of database '%s'" % 
+                                             (obs_type, self.table_name, self.database_name))
+        with weedb.Transaction(self.connection) as _cursor:
+            # All the tables holding records must keep the same columns:
+            for _table in [self.table_name] + [x for x in self._tier_tables.values() + self._main_tables() if x != self.table_name] + \
+                    ([self._hot_table] if self._hot_table else []):
+                _cursor.execute("ALTER TABLE %s ADD COLUMN `%s` %s" % (_table, obs_type, sql_type))
+        self.sqlkeys = self.connection.columnsOf(self.table_name)
+        # The INSERT statements have to include the new column:
+        self._insert_stmt_cache = {}
+        self._clear_query_cache()
+        if self._column_cache is not None:
+            self._column_cache.add_column(obs_type)
+        syslog.syslog(syslog.LOG_NOTICE, "manager: Added type '%s' to table '%s' in database '%s'" % 
+                      (obs_type, self.table_name, self.database_name))
+
+    def downsample(self, interval, stop_ts, batch_size=86400, progress_fn=None):
+        """Roll up the archive records older than a time into records of a
+        coarser interval, then delete them. This is how the archive gets thinned
+        out as it ages.
+        
+        The rolled up records go into a table of their own, a tier, named after
+        the interval (e.g., archive_tier_900). They are made the way an
+        accumulator makes a record (see weewx.accum.Accum.getRecord()): most
+        types get averaged, rain and ET get summed, and so on. The records rolled
+        up are taken from the main table, and from any tiers with a finer
+        interval. Queries go to whichever tables hold the span of time they are
+        about. The daily summaries are not touched, so they keep the statistics
+        of the original records.
+        
+        interval: The interval of the rolled up records, in seconds. It must
+        divide an hour, or be a whole number of hours that divides a day.
+        
+        stop_ts: Records up to this time get rolled up. It is rounded down to a
+        multiple of the interval, so that only whole intervals are rolled up.
+        
+        batch_size: The span of time, in seconds, rolled up in a transaction.
+        [Optional. Default is a day]
+        
+        progress_fn: If given, it will be called after each batch, with the
+        number of records rolled up so far, and the time of the end of the
+        batch.
+        
+        returns: The number of records rolled up."""
+        
+        if interval <= 0 or interval % 60 or (3600 % interval and (interval % 3600 or 86400 % interval)):
+            raise weewx.ViolatedPrecondition("Cannot downsample to an interval of %s seconds" % interval)
+
+        def _interval_of(ts):
+            # Return the start and stop of the interval holding a timestamp.
+            # Because of daylight saving time, not all days are as long.
+            _start = int(weeutil.weeutil.startOfInterval(ts, interval))
+            return (_start, int(weeutil.weeutil.startOfInterval(_start + interval * 3 // 2, interval)))
+
+        # Another manager may have downsampled the archive already:
+        self._load_tiers()
+        _stop = _interval_of(stop_ts + 1)[0]
+        _sources = [_table for (_first, _last, _interval, _table) in self._tiers if _interval < interval] + \
+            self._main_tables(None, _stop)
+        _first = None
+        for _table in _sources:
+            _row = self.getSql("SELECT MIN(dateTime) FROM %s" % _table)
+            if _row and _row[0] is not None and (_first is None or _row[0] < _first):
+                _first = _row[0]
+        if _first is None or _first > _stop:
+            return 0
+
+        _tier_table = self._tier_tables.get(interval)
+        if _tier_table is None:
+            _tier_table = "%s_tier_%d" % (self.table_name, interval)
+            self.connection.createTableLike(_tier_table, self.table_name)
+            self._tier_tables[interval] = _tier_table
+            syslog.syslog(syslog.LOG_NOTICE, "manager: Created tier '%s' in database '%s'" % (_tier_table, self.database_name))
+
+        _column_str = ', '.join("`%s`" % k for k in self.sqlkeys)
+        _record_class = compact_record_class(self.sqlkeys)
+        nrecs = 0
+        _start = _interval_of(_first)[0]
+        try:
+            while _start < _stop:
+                # Batches end on the boundary between two intervals:
+                _end = _start
+                while _end < _stop and _end - _start < batch_size:
+                    _end = _interval_of(_end + 1)[1]
+                _end = min(_end, _stop)
+                with weedb.Transaction(self.connection) as _cursor:
+                    _accums = {}
+                    for _table in _sources:
+                        _cursor.execute("SELECT %s FROM %s WHERE dateTime > ? AND dateTime <= ?" % (_column_str, _table), 
+                                        (_start, _end))
+                        for _row in _cursor.fetchall():
+                            _record = _record_class(_row)
+                            _span = _interval_of(_record['dateTime'])
+                            if _span not in _accums:
+                                _accums[_span] = weewx.accum.Accum(weeutil.weeutil.TimeSpan(*_span))
+                            _accums[_span].addRecord(_record)
+                            nrecs += 1
+                    for _span in sorted(_accums):
+                        _record = _accums[_span].getRecord()
+                        # A type with no data at all is NULL, rather than a sum of zero:
+                        for (_obs_type, _stats) in _accums[_span].iteritems():
+                            if _obs_type in _record and not _stats.count:
+                                _record[_obs_type] = None
+                        _record['interval'] = interval // 60
+                        _key_list = [k for k in _record if k in self.sqlkeys]
+                        _cursor.execute("INSERT INTO %s (%s) VALUES (%s)" % 
+                                        (_tier_table, ','.join("`%s`" % k for k in _key_list), ','.join('?' * len(_key_list))),
+                                        [_record[k] for k in _key_list])
+                    for _table in _sources:
+                        _cursor.execute("DELETE FROM %s WHERE dateTime > ? AND dateTime <= ?" % _table, (_start, _end))
+                if progress_fn:
+                    progress_fn(nrecs, _end)
+                _start = _end
+        finally:
+            # Pick up the new spans of the tiers:
+            self._sync()
+            # The columnar copy still has the records that were rolled up:
+            if self._column_cache is not None and nrecs:
+                self._column_cache.drop(_start)
+        syslog.syslog(syslog.LOG_INFO, "manager: Rolled up %d records through %s into tier '%s'" % 
+                      (nrecs, weeutil.weeutil.timestamp_to_string(_stop), _tier_table))
+        return nrecs
 
     def getSql(self, sql, sqlargs=()):
         """Executes an arbitrary SQL statement on the database.
@@ -408,7 +1345,11 @@ class Manager(object):
                             
     simple_sql = "SELECT %(aggregate_type)s(%(obs_type)s) FROM %(table_name)s "\
                    "WHERE dateTime > %(start)s AND dateTime <= %(stop)s AND %(obs_type)s IS NOT NULL"
+
+    # Aggregation types that _getSqlVectors can calculate from a single scan of the archive:
+    scan_aggregates = ['min', 'max', 'sum', 'avg', 'count', 'last']
                    
+    @memoize_aggregate
     def getAggregate(self, timespan, obs_type,
                      aggregate_type, **option_dict):  # @UnusedVariable
         """Returns an aggregation of a statistical type for a given time period.
@@ -434,7 +1375,7 @@ class Manager(object):
         
         interpolate_dict = {'aggregate_type' : aggregate_type,
                             'obs_type'       : obs_type,
-                            'table_name'     : self.table_name,
+                            'table_name'     : self.table_for_span(timespan.start, timespan.stop),
                             'start'          : timespan.start,
                             'stop'           : timespan.stop}
         
@@ -450,7 +1391,8 @@ class Manager(object):
     
     def getSqlVectors(self, timespan, obs_type, 
                       aggregate_type=None,
-                      aggregate_interval=None): 
+                      aggregate_interval=None,
+                      columnar=False): 
         """Get time and (possibly aggregated) data vectors within a time
         interval.
         
@@ -482,6 +1424,15 @@ class Manager(object):
         be a vector of types complex. The real part is the x-component of the
         wind, the imaginary part the y-component. 
 
+        columnar: If True, the vectors are returned as columns, instead of
+        lists. With NumPy, a column is a NumPy array: int64 for the times,
+        float for the data, with NaN for the nulls, and complex for the wind
+        vectors. Without NumPy, it is an array.array of type 'l' for the times
+        and 'd' for the data, again with NaN for the nulls. There is no
+        array.array of complex numbers, so without NumPy the wind vectors stay
+        in a list. Columns can be converted with weewx.units.convert() as a
+        whole. Default: False (lists)
+
         See the file weewx.units for the definition of a ValueTuple.
         """
 
@@ -490,10 +1441,17 @@ class Manager(object):
         
         # Check to see if the requested type is not 'windvec' or 'windgustvec'
         if obs_type not in windvec_types:
-            # The type is not one of the extended wind types. Use the regular
-            # version:
-            return self._getSqlVectors(timespan, obs_type, 
-                                      aggregate_type, aggregate_interval)
+            # The type is not one of the extended wind types. Try the columnar
+            # copy of the archive first, if there is one:
+            if self._column_cache is not None:
+                vectors = self._getColumnVectors(timespan, obs_type, 
+                                                 aggregate_type, aggregate_interval)
+                if vectors is not None:
+                    return vectors if columnar else _to_lists(vectors)
+            # Use the regular version:
+            vectors = self._getSqlVectors(timespan, obs_type, 
+                                          aggregate_type, aggregate_interval)
+            return _to_columns(vectors, 'd') if columnar else vectors
 
         # It is an extended wind type. Prepare the lists that will hold the
         # final results.
@@ -521,84 +1479,30 @@ class Manager(object):
                 if aggregate_type not in ['sum', 'count', 'avg', 'max', 'min']:
                     raise weewx.ViolatedPrecondition("Invalid aggregation type" % aggregate_type)
                 
-                # This SQL select string will select the proper wind types
-                sql_str = 'SELECT dateTime, %s, usUnits FROM %s WHERE dateTime > ? AND dateTime <= ?' % \
-                    (windvec_types[obs_type], self.table_name)
-
-                # Go through each aggregation interval, calculating the aggregation.
-                for stamp in weeutil.weeutil.intervalgen(timespan[0], timespan[1], aggregate_interval):
-    
-                    _mag_extreme = _dir_at_extreme = None
-                    _xsum = _ysum = 0.0
-                    _count = 0
-                    _last_time = None
-    
-                    for _rec in _cursor.execute(sql_str, stamp):
-                        (_mag, _dir) = _rec[1:3]
-    
-                        if _mag is None:
-                            continue
-    
-                        # A good direction is necessary unless the mag is zero:
-                        if _mag == 0.0  or _dir is not None:
-                            _count += 1
-                            _last_time  = _rec[0]
-                            if std_unit_system:
-                                if std_unit_system != _rec[3]:
-                                    raise weewx.UnsupportedFeature("Unit type cannot change "\
-                                                                   "within a time interval.")
-                            else:
-                                std_unit_system = _rec[3]
-                            
-                            # Pick the kind of aggregation:
-                            if aggregate_type == 'min':
-                                if _mag_extreme is None or _mag < _mag_extreme:
-                                    _mag_extreme = _mag
-                                    _dir_at_extreme = _dir
-                            elif aggregate_type == 'max':
-                                if _mag_extreme is None or _mag > _mag_extreme:
-                                    _mag_extreme = _mag
-                                    _dir_at_extreme = _dir
-                            else:
-                                # No need to do the arithmetic if mag is zero.
-                                # We also need a good direction
-                                if _mag > 0.0 and _dir is not None:
-                                    _xsum += _mag * math.cos(math.radians(90.0 - _dir))
-                                    _ysum += _mag * math.sin(math.radians(90.0 - _dir))
-                    # We've gone through the whole interval. Were there any
-                    # good data?
-                    if _count:
-                        # Record the time of the last good data point:
-                        start_vec.append(stamp.start)
-                        stop_vec.append(stamp.stop)
-                        # Form the requested aggregation:
-                        if aggregate_type in ('min', 'max'):
-                            if _dir_at_extreme is None:
-                                # The only way direction can be zero with a
-                                # non-zero count is if all wind velocities
-                                # were zero
-                                if weewx.debug:
-                                    assert(_mag_extreme <= 1.0e-6)
-                                x_extreme = y_extreme = 0.0
-                            else:
-                                x_extreme = _mag_extreme * math.cos(math.radians(90.0 - _dir_at_extreme))
-                                y_extreme = _mag_extreme * math.sin(math.radians(90.0 - _dir_at_extreme))
-                            data_vec.append(complex(x_extreme, y_extreme))
-                        elif aggregate_type == 'sum':
-                            data_vec.append(complex(_xsum, _ysum))
-                        elif aggregate_type == 'count':
-                            data_vec.append(_count)
-                        else:
-                            # Must be 'avg'
-                            data_vec.append(complex(_xsum/_count, _ysum/_count))
+                # Work out the aggregation intervals, then fetch the whole
+                # time span with a single, ordered query:
+                _stamps = list(weeutil.weeutil.intervalgen(timespan[0], timespan[1], aggregate_interval))
+                if _stamps:
+                    sql_str = 'SELECT dateTime, %s, usUnits FROM %s WHERE dateTime > ? AND dateTime <= ? '\
+                        'ORDER BY dateTime ASC' % (windvec_types[obs_type], self.table_for_span(_stamps[0].start, _stamps[-1].stop))
+                    _rows = _cursor.execute(sql_str, (_stamps[0].start, _stamps[-1].stop)).fetchall()
+                    
+                    # Sort the rows into the intervals, and aggregate them:
+                    _aggregate_fn = _aggregate_windvec_numpy if numpy else _aggregate_windvec_python
+                    std_unit_system, _results = _aggregate_fn(_rows, _stamps, aggregate_type)
+                    for (_i, _value) in _results:
+                        start_vec.append(_stamps[_i].start)
+                        stop_vec.append(_stamps[_i].stop)
+                        data_vec.append(_value)
             else:
                 # No aggregation desired. It's a lot simpler. Go get the
                 # data in the requested time period
                 # This SQL select string will select the proper wind types
                 sql_str = 'SELECT dateTime, %s, usUnits, `interval` FROM %s WHERE dateTime >= ? AND dateTime <= ?' % \
-                        (windvec_types[obs_type], self.table_name)
+                        (windvec_types[obs_type], self.table_for_span(*timespan))
                 
-                for _rec in _cursor.execute(sql_str, timespan):
+                _rows = _cursor.execute(sql_str, timespan).fetchall()
+                for _rec in _rows:
                     start_vec.append(_rec[0] - _rec[4])
                     stop_vec.append(_rec[0])
                     if std_unit_system:
@@ -607,27 +1511,21 @@ class Manager(object):
                                                            "within a time interval.")
                     else:
                         std_unit_system = _rec[3]
-                    # Break the mag and dir down into x- and y-components.
-                    (_mag, _dir) = _rec[1:3]
-                    if _mag is None or _dir is None:
-                        data_vec.append(None)
-                    else:
-                        x = _mag * math.cos(math.radians(90.0 - _dir))
-                        y = _mag * math.sin(math.radians(90.0 - _dir))
-                        if weewx.debug:
-                            # There seem to be some little rounding errors that
-                            # are driving my debugging crazy. Zero them out
-                            if abs(x) < 1.0e-6 : x = 0.0
-                            if abs(y) < 1.0e-6 : y = 0.0
-                        data_vec.append(complex(x,y))
+                # Break the mags and dirs down into x- and y-components.
+                _to_xy_fn = _windvec_to_xy_numpy if numpy else _windvec_to_xy_python
+                data_vec = _to_xy_fn([_rec[1] for _rec in _rows], [_rec[2] for _rec in _rows])
         finally:
             _cursor.close()
 
         (time_type, time_group) = weewx.units.getStandardUnitType(std_unit_system, 'dateTime')
         (data_type, data_group) = weewx.units.getStandardUnitType(std_unit_system, obs_type, aggregate_type)
-        return (weewx.units.ValueTuple(start_vec, time_type, time_group),
-                weewx.units.ValueTuple(stop_vec, time_type, time_group),
-                weewx.units.ValueTuple(data_vec, data_type, data_group))
+        vectors = (weewx.units.ValueTuple(start_vec, time_type, time_group),
+                   weewx.units.ValueTuple(stop_vec, time_type, time_group),
+                   weewx.units.ValueTuple(data_vec, data_type, data_group))
+        if columnar:
+            # A count is a plain number, not a wind vector:
+            return _to_columns(vectors, 'd' if aggregate_type == 'count' else 'c')
+        return vectors
 
     def _check_unit_system(self, unit_system):
         """ Check to make sure a unit system is the same as what's already in use in the database."""
@@ -710,17 +1608,20 @@ class Manager(object):
                 if not aggregate_interval:
                     raise weewx.ViolatedPrecondition("Aggregation interval missing")
 
-                if aggregate_type.lower() == 'last':
-                    sql_str = "SELECT %s, MIN(usUnits), MAX(usUnits) FROM %s WHERE dateTime = "\
-                        "(SELECT MAX(dateTime) FROM %s WHERE "\
-                        "dateTime > ? AND dateTime <= ? AND %s IS NOT NULL)" % (sql_type, self.table_name, 
-                                                                                self.table_name, sql_type)
-                else:
-                    sql_str = "SELECT %s(%s), MIN(usUnits), MAX(usUnits) FROM %s "\
-                        "WHERE dateTime > ? AND dateTime <= ?" % (aggregate_type, sql_type, self.table_name)
+                if aggregate_type.lower() in Manager.scan_aggregates:
+                    # All the intervals can be calculated from a single
+                    # ordered scan of the archive:
+                    return self._getSqlVectorsScan(timespan, sql_type, aggregate_type.lower(),
+                                                   aggregate_interval, _cursor)
+
+                # Any other aggregate is left to the database, an interval at
+                # a time:
+                sql_str = "SELECT %s(%s), MIN(usUnits), MAX(usUnits) FROM %%(table)s "\
+                    "WHERE dateTime > ? AND dateTime <= ?" % (aggregate_type, sql_type)
 
                 for stamp in weeutil.weeutil.intervalgen(startstamp, stopstamp, aggregate_interval):
-                    _cursor.execute(sql_str, stamp)
+                    # Each interval goes only to the table(s) that hold it:
+                    _cursor.execute(sql_str % {'table' : self.table_for_span(stamp.start, stamp.stop)}, stamp)
                     _rec = _cursor.fetchone()
                     # Don't accumulate any results where there wasn't a record
                     # (signified by a null result)
@@ -738,7 +1639,7 @@ class Manager(object):
             else:
                 # No aggregation
                 sql_str = "SELECT dateTime, %s, usUnits, `interval` FROM %s "\
-                            "WHERE dateTime >= ? AND dateTime <= ?" % (sql_type, self.table_name)
+                            "WHERE dateTime >= ? AND dateTime <= ?" % (sql_type, self.table_for_span(startstamp, stopstamp))
                 for _rec in _cursor.execute(sql_str, (startstamp, stopstamp)):
                     start_vec.append(_rec[0] - _rec[3])
                     stop_vec.append(_rec[0])
@@ -758,22 +1659,572 @@ class Manager(object):
                 ValueTuple(stop_vec, time_type, time_group), 
                 ValueTuple(data_vec, data_type, data_group))
 
+    def _getSqlVectorsScan(self, timespan, sql_type, aggregate_type, aggregate_interval, cursor):
+        """Aggregated version of _getSqlVectors() that uses a single query.
+        
+        The interval boundaries are calculated once, using intervalgen(). Then
+        the records within the timespan are retrieved, in order, with a single
+        query, and are sorted into intervals in Python. This saves a round
+        trip to the database for every interval.
+        
+        aggregate_type: One of the types in Manager.scan_aggregates, in lower
+        case. The results are the same as the corresponding SQL aggregate
+        function, applied over each interval.
+        
+        See _getSqlVectors() for the other parameters, and the return value."""
+
+        start_vec = list()
+        stop_vec  = list()
+        data_vec  = list()
+        std_unit_system = None
+
+        _stamps = list(weeutil.weeutil.intervalgen(timespan[0], timespan[1], aggregate_interval))
+        _stops = [_stamp.stop for _stamp in _stamps]
+        # The non-null values that fall in each interval:
+        _values = [[] for _stamp in _stamps]
+
+        if _stamps:
+            sql_str = "SELECT dateTime, %s, usUnits FROM %s WHERE dateTime > ? AND dateTime <= ? "\
+                "ORDER BY dateTime ASC" % (sql_type, self.table_for_span(_stamps[0].start, _stamps[-1].stop))
+            for _rec in cursor.execute(sql_str, (_stamps[0].start, _stamps[-1].stop)):
+                if std_unit_system:
+                    if std_unit_system != _rec[2]:
+                        raise weewx.UnsupportedFeature("Unit type cannot change "\
+                                                       "within a time interval (%s vs %s)." %
+                                                       (std_unit_system, _rec[2]))
+                else:
+                    std_unit_system = _rec[2]
+                if _rec[1] is None:
+                    continue
+                # Find the interval(s) this record falls in. Intervals are
+                # exclusive on the left, inclusive on the right.
+                i = bisect.bisect_left(_stops, _rec[0])
+                while i < len(_stamps) and _stamps[i].start < _rec[0]:
+                    _values[i].append(_rec[1])
+                    i += 1
+
+        for (_stamp, _vals) in zip(_stamps, _values):
+            _result = _aggregate_values(_vals, aggregate_type)
+            # Don't accumulate any result where there was no data
+            if _result is not None:
+                start_vec.append(_stamp.start)
+                stop_vec.append(_stamp.stop)
+                data_vec.append(_result)
+
+        (time_type, time_group) = weewx.units.getStandardUnitType(std_unit_system, 'dateTime')
+        (data_type, data_group) = weewx.units.getStandardUnitType(std_unit_system, sql_type, aggregate_type)
+        return (ValueTuple(start_vec, time_type, time_group),
+                ValueTuple(stop_vec, time_type, time_group), 
+                ValueTuple(data_vec, data_type, data_group))
+
+    def _getColumnVectors(self, timespan, sql_type, aggregate_type=None, aggregate_interval=None):
+        """Version of _getSqlVectors() that reads the columnar copy of the
+        archive, instead of the database. See keep_columns(). The records
+        within the timespan are found with a binary search on time, then their
+        values are read in one go. The aggregates are the same as those of
+        _getSqlVectorsScan().
+        
+        returns: The vectors, as columns. See getSqlVectors(). Returns None if
+        the copy does not hold all the records needed, or if the aggregation
+        is not one of Manager.scan_aggregates."""
+
+        if aggregate_type:
+            if not aggregate_interval or aggregate_type.lower() not in Manager.scan_aggregates:
+                return None
+            _stamps = list(weeutil.weeutil.intervalgen(timespan[0], timespan[1], aggregate_interval))
+            if not _stamps:
+                return None
+            _data = self._column_cache.read(_stamps[0].start, _stamps[-1].stop, ['dateTime', 'usUnits', sql_type],
+                                            self.last_timestamp, left_open=True)
+        else:
+            _data = self._column_cache.read(timespan[0], timespan[1], ['dateTime', 'usUnits', 'interval', sql_type],
+                                            self.last_timestamp)
+        if _data is None:
+            return None
+        
+        std_unit_system = None
+        _units = _data['usUnits']
+        if len(_units):
+            std_unit_system = int(_units[0])
+            if (_units.min() != _units.max()) if numpy else (min(_units) != max(_units)):
+                raise weewx.UnsupportedFeature("Unit type cannot change "\
+                                               "within a time interval.")
+        (time_type, time_group) = weewx.units.getStandardUnitType(std_unit_system, 'dateTime')
+        (data_type, data_group) = weewx.units.getStandardUnitType(std_unit_system, sql_type, aggregate_type)
+        
+        _times = _data['dateTime']
+        _values = _data[sql_type]
+        if not aggregate_type:
+            if numpy:
+                start_vec = (_times - _data['interval']).astype(numpy.int64)
+                stop_vec = _times.astype(numpy.int64)
+            else:
+                start_vec = array.array('l', [int(_t - _i) for (_t, _i) in zip(_times, _data['interval'])])
+                stop_vec = array.array('l', [int(_t) for _t in _times])
+            return (ValueTuple(start_vec, time_type, time_group),
+                    ValueTuple(stop_vec, time_type, time_group), 
+                    ValueTuple(_values, data_type, data_group))
 
-def reconfig(old_db_dict, new_db_dict, new_unit_system=None, new_schema=None):
-    """Copy over an old archive to a new one, using a provided schema."""
+        start_vec = list()
+        stop_vec  = list()
+        data_vec  = list()
+        _aggregate_fn = _aggregate_values_numpy if numpy else _aggregate_values
+        for _stamp in _stamps:
+            # Intervals are exclusive on the left, inclusive on the right
+            _lo = bisect.bisect_right(_times, _stamp.start)
+            _hi = bisect.bisect_right(_times, _stamp.stop)
+            _result = _aggregate_fn(_values[_lo:_hi], aggregate_type.lower())
+            if _result is not None:
+                start_vec.append(_stamp.start)
+                stop_vec.append(_stamp.stop)
+                data_vec.append(_result)
+        return _to_columns((ValueTuple(start_vec, time_type, time_group),
+                            ValueTuple(stop_vec, time_type, time_group), 
+                            ValueTuple(data_vec, data_type, data_group)), 'd')
+
+
+#==============================================================================
+#                       Columns
+#==============================================================================
+
+def _to_column(values, typecode):
+    """Convert a list of values to a column.
+    
+    values: The values. Nulls are represented by None.
+    
+    typecode: 'l' for integers, which cannot be null, 'd' for floats, or 'c'
+    for complex numbers.
+    
+    returns: A NumPy array if NumPy is available, otherwise an array.array.
+    Nulls become NaN. There is no array.array of complex numbers, so without
+    NumPy complex numbers are returned as they are."""
+
+    if numpy:
+        if typecode == 'l':
+            return numpy.array(values, dtype=numpy.int64)
+        elif typecode == 'c':
+            return numpy.array([complex(_NAN, _NAN) if v is None else v for v in values], dtype=complex)
+        # NumPy turns None into NaN by itself:
+        return numpy.array(values, dtype=float)
+    if typecode == 'l':
+        return array.array('l', values)
+    elif typecode == 'c':
+        return values
+    return array.array('d', [_NAN if v is None else v for v in values])
+
+def _to_columns(vectors, typecode):
+    """Convert the 3-way tuple of value tuples returned by getSqlVectors() to
+    columns. typecode is the type of the data vector. See _to_column()."""
+    (start_vec_t, stop_vec_t, data_vec_t) = vectors
+    return (ValueTuple(_to_column(start_vec_t[0], 'l'), start_vec_t[1], start_vec_t[2]),
+            ValueTuple(_to_column(stop_vec_t[0], 'l'), stop_vec_t[1], stop_vec_t[2]),
+            ValueTuple(_to_column(data_vec_t[0], typecode), data_vec_t[1], data_vec_t[2]))
+
+def _to_lists(vectors):
+    """The reverse of _to_columns(): convert columns to lists, with None for
+    the nulls."""
+    (start_vec_t, stop_vec_t, data_vec_t) = vectors
+    # Only NaN is not equal to itself:
+    return (ValueTuple(start_vec_t[0].tolist(), start_vec_t[1], start_vec_t[2]),
+            ValueTuple(stop_vec_t[0].tolist(), stop_vec_t[1], stop_vec_t[2]),
+            ValueTuple([None if v != v else v for v in data_vec_t[0].tolist()], data_vec_t[1], data_vec_t[2]))
+
+def _aggregate_values(values, aggregate_type):
+    """Aggregate a sequence of values, the way the SQL aggregate function
+    would. Nulls, either None or NaN, are left out.
+    
+    aggregate_type: One of the types in Manager.scan_aggregates.
+    
+    returns: The aggregate, or None if there are no values to aggregate. A
+    count is returned even then."""
+    # Only NaN is not equal to itself:
+    _vals = [v for v in values if v is not None and v == v]
+    if aggregate_type == 'count':
+        # Like SQL, a count is returned even if there is no data
+        return len(_vals)
+    elif not _vals:
+        return None
+    elif aggregate_type == 'min':
+        return min(_vals)
+    elif aggregate_type == 'max':
+        return max(_vals)
+    elif aggregate_type == 'sum':
+        return sum(_vals)
+    elif aggregate_type == 'avg':
+        return float(sum(_vals)) / len(_vals)
+    # Must be 'last'
+    return _vals[-1]
+
+def _aggregate_values_numpy(values, aggregate_type):
+    """Version of _aggregate_values() that uses NumPy array operations. The
+    values must be a NumPy array of floats."""
+    _vals = values[~numpy.isnan(values)]
+    if aggregate_type == 'count':
+        return len(_vals)
+    elif not len(_vals):
+        return None
+    elif aggregate_type == 'min':
+        return float(_vals.min())
+    elif aggregate_type == 'max':
+        return float(_vals.max())
+    elif aggregate_type == 'sum':
+        return float(_vals.sum())
+    elif aggregate_type == 'avg':
+        return float(_vals.sum()) / len(_vals)
+    return float(_vals[-1])
+
+_NAN = float('nan')
+
+#==============================================================================
+#                       Wind vector utilities
+#
+#     Each comes in two flavors: one using NumPy, and one using pure Python.
+#     They give the same results.
+#==============================================================================
+
+def _aggregate_windvec_python(rows, stamps, aggregate_type):
+    """Aggregate wind vectors over a sequence of intervals.
+    
+    rows: A list of tuples (dateTime, magnitude, direction, usUnits), in
+    order of increasing time.
+    
+    stamps: The intervals, as a list of TimeSpans in increasing order. They
+    are exclusive on the left, inclusive on the right.
+    
+    aggregate_type: One of 'min', 'max', 'sum', 'count', or 'avg'.
+    
+    returns: A 2-way tuple (std_unit_system, results). The results are a list
+    of tuples (i, value), one for each interval i that has any good data. The
+    value is the count for aggregate_type 'count', otherwise a complex number
+    holding the x- and y-components of the aggregate."""
+
+    N = len(stamps)
+    stops = [stamp.stop for stamp in stamps]
+    counts = [0] * N
+    xsums = [0.0] * N
+    ysums = [0.0] * N
+    mag_extremes = [None] * N
+    dir_at_extremes = [None] * N
+    std_unit_system = None
+    
+    for (ts, mag, dirn, unit_system) in rows:
+        # A good direction is necessary unless the mag is zero:
+        if mag is None or not (mag == 0.0 or dirn is not None):
+            continue
+        # Find the interval the record falls in:
+        i = bisect.bisect_left(stops, ts)
+        if i >= N or ts <= stamps[i].start:
+            continue
+        if std_unit_system:
+            if std_unit_system != unit_system:
+                raise weewx.UnsupportedFeature("Unit type cannot change "\
+                                               "within a time interval.")
+        else:
+            std_unit_system = unit_system
+        counts[i] += 1
+        # Pick the kind of aggregation:
+        if aggregate_type == 'min':
+            if mag_extremes[i] is None or mag < mag_extremes[i]:
+                mag_extremes[i] = mag
+                dir_at_extremes[i] = dirn
+        elif aggregate_type == 'max':
+            if mag_extremes[i] is None or mag > mag_extremes[i]:
+                mag_extremes[i] = mag
+                dir_at_extremes[i] = dirn
+        elif mag > 0.0 and dirn is not None:
+            # No need to do the arithmetic if mag is zero.
+            # We also need a good direction
+            xsums[i] += mag * math.cos(math.radians(90.0 - dirn))
+            ysums[i] += mag * math.sin(math.radians(90.0 - dirn))
+
+    results = []
+    for i in range(N):
+        # Were there any good data?
+        if not counts[i]:
+            continue
+        if aggregate_type in ('min', 'max'):
+            if dir_at_extremes[i] is None:
+                # The only way direction can be None with a non-zero count is
+                # if all wind velocities were zero
+                x_extreme = y_extreme = 0.0
+            else:
+                x_extreme = mag_extremes[i] * math.cos(math.radians(90.0 - dir_at_extremes[i]))
+                y_extreme = mag_extremes[i] * math.sin(math.radians(90.0 - dir_at_extremes[i]))
+            results.append((i, complex(x_extreme, y_extreme)))
+        elif aggregate_type == 'sum':
+            results.append((i, complex(xsums[i], ysums[i])))
+        elif aggregate_type == 'count':
+            results.append((i, counts[i]))
+        else:
+            # Must be 'avg'
+            results.append((i, complex(xsums[i] / counts[i], ysums[i] / counts[i])))
+
+    return (std_unit_system, results)
+
+def _aggregate_windvec_numpy(rows, stamps, aggregate_type):
+    """Version of _aggregate_windvec_python() that uses NumPy array operations."""
+
+    N = len(stamps)
+    if not rows or not N:
+        return (None, [])
     
-    with Manager.open(old_db_dict) as old_archive:
+    ts = numpy.array([row[0] for row in rows], dtype=numpy.int64)
+    # Nulls become NaNs:
+    mag = numpy.array([row[1] for row in rows], dtype=float)
+    dirn = numpy.array([row[2] for row in rows], dtype=float)
+    unit_system = numpy.array([row[3] for row in rows])
+    starts = numpy.array([stamp.start for stamp in stamps], dtype=numpy.int64)
+    stops = numpy.array([stamp.stop for stamp in stamps], dtype=numpy.int64)
+    
+    # Find the interval each record falls in:
+    idx = numpy.searchsorted(stops, ts, side='left')
+    in_interval = idx < N
+    in_interval[in_interval] &= starts[idx[in_interval]] < ts[in_interval]
+    # A good direction is necessary unless the mag is zero:
+    keep = in_interval & ~numpy.isnan(mag) & ((mag == 0.0) | ~numpy.isnan(dirn))
+    idx, mag, dirn, unit_system = idx[keep], mag[keep], dirn[keep], unit_system[keep]
+    if not len(idx):
+        return (None, [])
+
+    std_unit_system = int(unit_system[0])
+    if (unit_system != std_unit_system).any():
+        raise weewx.UnsupportedFeature("Unit type cannot change "\
+                                       "within a time interval.")
+    
+    counts = numpy.bincount(idx, minlength=N)
+    
+    if aggregate_type in ('min', 'max'):
+        # Sort by interval, then by magnitude, then by time. The first record
+        # of each interval is then the extreme. Ties go to the earliest.
+        key = mag if aggregate_type == 'min' else -mag
+        order = numpy.lexsort((numpy.arange(len(idx)), key, idx))
+        first = numpy.ones(len(order), dtype=bool)
+        first[1:] = idx[order][1:] != idx[order][:-1]
+        sel = order[first]
+        x, y = _mag_dir_to_xy(mag[sel], dirn[sel])
+        # Direction can be None only if all wind velocities were zero:
+        no_dir = numpy.isnan(dirn[sel])
+        x[no_dir] = y[no_dir] = 0.0
+        return (std_unit_system, [(int(i), complex(xx, yy)) for (i, xx, yy) in zip(idx[sel], x, y)])
+
+    if aggregate_type == 'count':
+        return (std_unit_system, [(int(i), int(counts[i])) for i in numpy.flatnonzero(counts)])
+    
+    # No need to do the arithmetic if mag is zero. We also need a good direction
+    good = (mag > 0.0) & ~numpy.isnan(dirn)
+    x = numpy.zeros(len(mag))
+    y = numpy.zeros(len(mag))
+    x[good], y[good] = _mag_dir_to_xy(mag[good], dirn[good])
+    # Sum the components over each interval. The sums are done in record order.
+    xsums = numpy.bincount(idx, weights=x, minlength=N)
+    ysums = numpy.bincount(idx, weights=y, minlength=N)
+    if aggregate_type == 'sum':
+        return (std_unit_system, [(int(i), complex(xsums[i], ysums[i])) for i in numpy.flatnonzero(counts)])
+    # Must be 'avg'
+    return (std_unit_system, [(int(i), complex(xsums[i] / counts[i], ysums[i] / counts[i])) 
+                              for i in numpy.flatnonzero(counts)])
+
+def _mag_dir_to_xy(mag, dirn):
+    """Break NumPy arrays of magnitudes and directions down into arrays of x-
+    and y-components."""
+    theta = numpy.radians(90.0 - dirn)
+    return (mag * numpy.cos(theta), mag * numpy.sin(theta))
+
+def _windvec_to_xy_python(mags, dirs):
+    """Break lists of wind magnitudes and directions down into a list of
+    complex numbers. The real part is the x-component of the wind, the
+    imaginary part the y-component. Where either the magnitude or direction
+    is None, the result is None."""
+    data_vec = []
+    for (_mag, _dir) in zip(mags, dirs):
+        if _mag is None or _dir is None:
+            data_vec.append(None)
+        else:
+            x = _mag * math.cos(math.radians(90.0 - _dir))
+            y = _mag * math.sin(math.radians(90.0 - _dir))
+            if weewx.debug:
+                # There seem to be some little rounding errors that
+                # are driving my debugging crazy. Zero them out
+                if abs(x) < 1.0e-6 : x = 0.0
+                if abs(y) < 1.0e-6 : y = 0.0
+            data_vec.append(complex(x,y))
+    return data_vec
+
+def _windvec_to_xy_numpy(mags, dirs):
+    """Version of _windvec_to_xy_python() that uses NumPy array operations."""
+    if not mags:
+        return []
+    mag = numpy.array(mags, dtype=float)
+    dirn = numpy.array(dirs, dtype=float)
+    x, y = _mag_dir_to_xy(mag, dirn)
+    if weewx.debug:
+        # Zero out the little rounding errors, as above
+        with numpy.errstate(invalid='ignore'):
+            x[numpy.abs(x) < 1.0e-6] = 0.0
+            y[numpy.abs(y) < 1.0e-6] = 0.0
+    return [None if numpy.isnan(xx) or numpy.isnan(yy) else complex(xx, yy) for (xx, yy) in zip(x, y)]
+
+
+def reconfig(old_db_dict, new_db_dict, new_unit_system=None, new_schema=None, archive_class=Manager):
+    """Copy over an old archive to a new one, using a provided schema.
+    
+    archive_class: The class used to read the old archive and write the new
+    one. See get_archive_class(). [Optional. Default is Manager]"""
+    
+    with archive_class.open(old_db_dict) as old_archive:
         if new_schema is None:
             import schemas.wview
             new_schema = schemas.wview.schema
-        with Manager.open_with_create(new_db_dict, schema=new_schema) as new_archive:
+        with archive_class.open_with_create(new_db_dict, schema=new_schema) as new_archive:
 
             # Wrap the input generator in a unit converter.
-            record_generator = weewx.units.GenWithConvert(old_archive.genBatchRecords(), new_unit_system)
+            record_generator = weewx.units.GenWithConvert(old_archive.genBatchRecords(columns=old_archive.getLiveKeys(),
+                                                                                      compact=True),
+                                                          new_unit_system)
         
             # This is very fast because it is done in a single transaction
-            # context:
-            new_archive.addRecord(record_generator)
+            # context, with the records inserted in bulk:
+            new_archive.addRecord(record_generator, chunk_size=DEFAULT_CHUNK_SIZE)
+
+#===============================================================================
+#                    Class PartitionedManager
+#===============================================================================
+
+class PartitionedManager(Manager):
+    """Manages an archive that is split into one table per year.
+    
+    The table table_name holds no records. It is the template for the yearly
+    tables, or partitions, which are named after it (e.g., archive_2015). A
+    partition is created, with the same columns, when the first record for
+    its year arrives. 
+    
+    Queries over a span of time go only to the partitions that overlap it. If
+    there is just one, which is almost always the case, the query uses it
+    directly. Otherwise, table_for_span() returns a UNION ALL of the parts of
+    the partitions within the span.
+    
+    Like archive years, a year includes midnight at its end, but not at its
+    start. Once a year is over, its partition no longer changes, so it can be
+    backed up, checked or optimized on its own.
+    
+    Note that, with MySQL, creating a partition commits any transaction in
+    progress."""
+    
+    def __init__(self, connection, table_name='archive', schema=None):
+        """Initialize an instance of PartitionedManager. See Manager."""
+        # The partitions, in time order. Each is a tuple (timespan, table name). 
+        # See _load_partitions():
+        self._partitions = []
+        # The partition used last:
+        self._last_partition = None
+
+        super(PartitionedManager, self).__init__(connection, table_name, schema)
+
+        # Records left in the template table are invisible. Most likely, this
+        # manager has been bound to an archive that has not been partitioned.
+        _row = self.getSql("SELECT MIN(dateTime) FROM %s" % self.table_name)
+        if _row and _row[0] is not None:
+            syslog.syslog(syslog.LOG_ERR, "manager: table '%s' in database '%s' holds records that are not "
+                          "in a partition. Use 'wee_database --partition-archive' to move them." % 
+                          (self.table_name, self.database_name))
+
+    def _sync(self):
+        """Resynch the internal caches, including the list of partitions."""
+        self._load_partitions()
+        super(PartitionedManager, self)._sync()
+
+    def _load_partitions(self):
+        """Find the partitions in the database."""
+        _pattern = re.compile(r'^%s_(\d{4})$' % re.escape(self.table_name))
+        self._partitions = []
+        for _table in self.connection.tables():
+            _match = _pattern.match(_table)
+            if _match:
+                self._partitions.append((self._year_span(int(_match.group(1))), _table))
+        self._partitions.sort()
+        self._last_partition = None
+        # The INSERT statements of partitions that no longer exist are of no use:
+        self._insert_stmt_cache = {}
+
+    @staticmethod
+    def _year_span(year):
+        """Return the timespan of a year."""
+        return weeutil.weeutil.TimeSpan(int(time.mktime((year, 1, 1, 0, 0, 0, 0, 0, -1))),
+                                        int(time.mktime((year + 1, 1, 1, 0, 0, 0, 0, 0, -1))))
+
+    def _main_tables(self, start_ts=None, stop_ts=None):
+        """Return a list of the partitions that overlap a span of time, in time
+        order. Both ends of the span are included."""
+        return [_table for (_span, _table) in self._partitions
+                if (start_ts is None or _span.stop >= start_ts) and (stop_ts is None or _span.start < stop_ts)]
+
+    def _main_table_of(self, timestamp, create=False):
+        """Return the name of the partition that holds the archive record with
+        a given timestamp, creating it if asked. If there is no such partition,
+        and it is not to be created, the name of the empty template table is
+        returned."""
+        # Records mostly come in order, so try the partition used last:
+        if self._last_partition is not None and self._last_partition[0].start < timestamp <= self._last_partition[0].stop:
+            return self._last_partition[1]
+        _span = weeutil.weeutil.archiveYearSpan(timestamp)
+        for _partition in self._partitions:
+            if _partition[0] == _span:
+                self._last_partition = _partition
+                return _partition[1]
+        if not create:
+            return self.table_name
+        _table = "%s_%d" % (self.table_name, time.localtime(_span.start).tm_year)
+        self.connection.createTableLike(_table, self.table_name)
+        syslog.syslog(syslog.LOG_NOTICE, "manager: Created partition '%s' in database '%s'" % (_table, self.database_name))
+        self._last_partition = (_span, _table)
+        self._partitions.append(self._last_partition)
+        self._partitions.sort()
+        return _table
+
+    def addRecord(self, record_obj, *args, **kwargs):
+        """Commit a single record or a collection of records to the archive.
+        See Manager."""
+        try:
+            super(PartitionedManager, self).addRecord(record_obj, *args, **kwargs)
+        except:
+            # If the transaction got rolled back, so did any partitions
+            # created in it:
+            self._load_partitions()
+            raise
+
+    def partition_archive(self, progress_fn=None):
+        """Move any records in the template table to the partitions. This is
+        how an archive kept in a single table gets partitioned. Each year is
+        moved in a transaction of its own.
+        
+        progress_fn: If given, it will be called after each year, with the
+        number of records moved so far, and the time of the end of the year.
+        
+        returns: The number of records moved."""
+        
+        nrecs = 0
+        try:
+            while True:
+                _row = self.getSql("SELECT MIN(dateTime) FROM %s" % self.table_name)
+                if not _row or _row[0] is None:
+                    break
+                _span = weeutil.weeutil.archiveYearSpan(_row[0])
+                with weedb.Transaction(self.connection) as _cursor:
+                    _table = self._main_table_of(_row[0], create=True)
+                    _cursor.execute("SELECT COUNT(*) FROM %s WHERE dateTime > ? AND dateTime <= ?" % self.table_name, _span)
+                    nrecs += _cursor.fetchone()[0]
+                    _cursor.execute("INSERT INTO %s SELECT * FROM %s WHERE dateTime > ? AND dateTime <= ?" % 
+                                    (_table, self.table_name), _span)
+                    _cursor.execute("DELETE FROM %s WHERE dateTime > ? AND dateTime <= ?" % self.table_name, _span)
+                syslog.syslog(syslog.LOG_INFO, "manager: Moved the records of %d in table '%s' to partition '%s'" % 
+                              (time.localtime(_span.start).tm_year, self.table_name, _table))
+                if progress_fn:
+                    progress_fn(nrecs, _span.stop)
+        finally:
+            # Start over, in case a transaction failed:
+            self._sync()
+        return nrecs
+
 
 #===============================================================================
 #                    Class DBBinder
@@ -783,19 +2234,34 @@ class DBBinder(object):
     """Given a binding name, it returns the matching database as a managed object. Caches
     results."""
 
-    def __init__(self, config_dict):
+    def __init__(self, config_dict, pool=None):
         """ Initialize a DBBinder object.
 
-        config_dict: The configuration dictionary. """
+        config_dict: The configuration dictionary.
+        
+        pool: An instance of ManagerPool. If given, managers are borrowed from
+        it, and returned to it when the binder is closed, rather than being
+        opened and closed each time. [Optional. Default is None]"""
 
         self.config_dict = config_dict           
         self.default_binding_dict = {}
         self.manager_cache = {}
+        self.pool = pool
+        # Functions that write records being held back, keyed by binding. See
+        # set_pending():
+        self.pending = {}
     
     def close(self):
         for data_binding in self.manager_cache.keys():
             try:
-                self.manager_cache[data_binding].close()
+                if weewx.debug:
+                    syslog.syslog(syslog.LOG_DEBUG, "manager: Binding '%s': %d aggregates from cache, %d from database" % 
+                                  (data_binding, self.manager_cache[data_binding].aggregate_hits,
+                                   self.manager_cache[data_binding].aggregate_misses))
+                if self.pool is not None:
+                    self.pool.put_manager(self.manager_cache[data_binding])
+                else:
+                    self.manager_cache[data_binding].close()
                 del self.manager_cache[data_binding]
             except Exception:
                 pass
@@ -810,10 +2276,32 @@ class DBBinder(object):
         """Set the defaults for the binding binding_name."""
         self.default_binding_dict[binding_name] = default_binding_dict
         
+    def set_pending(self, data_binding, flush_fn):
+        """Say that records for a binding are being held back, rather than
+        written to the database as they come.
+        
+        flush_fn: A function, taking no arguments, that writes any records
+        being held. It is called before get_manager() returns the manager for
+        the binding, so anything that reads the database through this binder
+        sees them. Set to None when records are no longer held."""
+        if flush_fn is None:
+            self.pending.pop(data_binding, None)
+        else:
+            self.pending[data_binding] = flush_fn
+            
+    def flush_pending(self, data_binding=None):
+        """Write any records being held back for a binding. If no binding is
+        given, write those of every binding. See set_pending()."""
+        for _binding in ([data_binding] if data_binding is not None else self.pending.keys()):
+            if _binding in self.pending:
+                self.pending[_binding]()
+        
     def get_manager(self, data_binding='wx_binding', initialize=False):
         """Given a binding name, returns the managed object"""
         global default_binding_dict
 
+        self.flush_pending(data_binding)
+        
         if data_binding not in self.manager_cache:
             # If this binding has a set of defaults, use them. Otherwise, use the generic
             # defaults
@@ -821,7 +2309,10 @@ class DBBinder(object):
             manager_dict = get_manager_dict_from_config(self.config_dict,
                                                         data_binding, 
                                                         default_binding_dict=defaults)
-            self.manager_cache[data_binding] = open_manager(manager_dict, initialize)
+            if self.pool is not None:
+                self.manager_cache[data_binding] = self.pool.get_manager(manager_dict, initialize)
+            else:
+                self.manager_cache[data_binding] = open_manager(manager_dict, initialize)
 
         return self.manager_cache[data_binding]
     
@@ -838,6 +2329,127 @@ class DBBinder(object):
 
         return db_lookup
 
+#===============================================================================
+#                    Class ManagerPool
+#===============================================================================
+
+class ManagerPool(object):
+    """A pool of open managers, shared by the threads of a process.
+    
+    A manager is lent to one thread at a time. When it is returned, it is kept
+    open for the next thread that needs the same database, so the cost of
+    opening it is paid only once. Before a manager is lent out, it is
+    resynchronized with the database. This also checks that the connection
+    still works. Managers that have not been used for max_idle seconds are
+    closed."""
+
+    # Options that let a connection opened by one thread be used by another
+    # (but not at the same time). For drivers not listed here, each thread
+    # gets its own managers.
+    shareable_options = {'weedb.sqlite' : {'check_same_thread' : False},
+                         'weedb.mysql'  : {}}
+    
+    # Options that open a connection that only reads:
+    read_only_options = {'weedb.sqlite' : {'read_only' : True}}
+
+    def __init__(self, max_idle=1800, read_only=False):
+        """Initialize a ManagerPool object.
+        
+        max_idle: How long a manager can sit unused in the pool before it is
+        closed, in seconds. [Optional. Default is 1800]
+        
+        read_only: If true, the managers are opened with connections that
+        cannot change the database, unless they are asked to initialize it.
+        [Optional. Default is False]"""
+        self.max_idle = max_idle
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        # Idle managers. The key is from _get_key(). The value is a list of
+        # 2-way tuples (manager, time returned), most recently returned last:
+        self._idle = {}
+        self.opens = 0
+        self.reuses = 0
+
+    def get_manager(self, manager_dict, initialize=False):
+        """Borrow a manager for the database described by a manager dictionary.
+        It should be given back with put_manager()."""
+        _key = self._get_key(manager_dict)
+        while True:
+            with self._lock:
+                self._expire()
+                try:
+                    (_manager, _) = self._idle.get(_key, []).pop()
+                except IndexError:
+                    break
+            try:
+                # Another manager may have changed the database while this
+                # one sat in the pool:
+                _manager._sync()
+            except Exception, e:
+                syslog.syslog(syslog.LOG_INFO, "manager: Discarding pooled manager for '%s': %s" % 
+                              (_manager.database_name, e))
+                self._close(_manager)
+            else:
+                self.reuses += 1
+                return _manager
+
+        _driver = manager_dict['database_dict'].get('driver')
+        _options = dict(ManagerPool.shareable_options.get(_driver, {}))
+        if self.read_only and not initialize:
+            _options.update(ManagerPool.read_only_options.get(_driver, {}))
+        _manager_dict = dict(manager_dict)
+        _manager_dict['database_dict'] = dict(manager_dict['database_dict'], **_options)
+        _manager = open_manager(_manager_dict, initialize)
+        _manager._pool_key = _key
+        self.opens += 1
+        return _manager
+
+    def put_manager(self, manager):
+        """Return a manager obtained from get_manager() to the pool."""
+        with self._lock:
+            self._idle.setdefault(manager._pool_key, []).append((manager, time.time()))
+            self._expire()
+
+    def close(self):
+        """Close all idle managers."""
+        with self._lock:
+            _idle = self._idle
+            self._idle = {}
+        for _managers in _idle.values():
+            for (_manager, _) in _managers:
+                self._close(_manager)
+
+    def _get_key(self, manager_dict):
+        """Return a key for the managers of a manager dictionary."""
+        _database_dict = manager_dict['database_dict']
+        if _database_dict.get('driver') in ManagerPool.shareable_options:
+            _thread = None
+        else:
+            _thread = threading.current_thread().ident
+        return (_thread, str(manager_dict['manager']), manager_dict['table_name'],
+                repr(sorted(_database_dict.items())))
+
+    def _expire(self):
+        """Close any managers that have been idle too long. The lock must be held."""
+        _too_old = time.time() - self.max_idle
+        for _key in self._idle.keys():
+            _managers = self._idle[_key]
+            while _managers and _managers[0][1] < _too_old:
+                self._close(_managers.pop(0)[0])
+            if not _managers:
+                del self._idle[_key]
+
+    @staticmethod
+    def _close(manager):
+        try:
+            manager.close()
+        except Exception:
+            pass
+
+# The pool shared by the report generators and RESTful threads. They only read
+# the databases:
+manager_pool = ManagerPool(read_only=True)
+
 #===============================================================================
 #                                 Utilities
 #===============================================================================
@@ -968,13 +2580,33 @@ def open_manager(manager_dict, initialize=False):
     
     manager_cls = weeutil.weeutil._get_object(manager_dict['manager'])
     if initialize:
-        return manager_cls.open_with_create(manager_dict['database_dict'],
-                                            manager_dict['table_name'],
-                                            manager_dict['schema'])
+        dbmanager = manager_cls.open_with_create(manager_dict['database_dict'],
+                                                 manager_dict['table_name'],
+                                                 manager_dict['schema'])
     else:
-        return manager_cls.open(manager_dict['database_dict'],
-                                manager_dict['table_name'])
+        dbmanager = manager_cls.open(manager_dict['database_dict'],
+                                     manager_dict['table_name'])
+    # Optionally, keep the latest records in memory:
+    if manager_dict.get('hot_hours'):
+        dbmanager.keep_hot(float(manager_dict['hot_hours']))
+    # Optionally, keep a columnar copy of the archive on disk. The option is
+    # either a boolean, or the directory to be used:
+    column_cache = manager_dict.get('column_cache')
+    if column_cache:
+        try:
+            directory = None if weeutil.weeutil.to_bool(column_cache) else False
+        except ValueError:
+            directory = column_cache
+        if directory is not False:
+            dbmanager.keep_columns(directory)
+    return dbmanager
     
+def get_archive_class(manager_cls):
+    """Return the class that manages just the archive of a manager class. It
+    can be used to copy the archive, or to read it, without the overhead of
+    the daily summaries."""
+    return PartitionedManager if issubclass(manager_cls, PartitionedManager) else Manager
+
 def open_manager_with_config(config_dict, data_binding,
                              initialize=False, default_binding_dict=default_binding_dict):
     """Given a binding name, returns an open manager object."""
@@ -1027,6 +2659,51 @@ def show_progress(nrec, last_time):
     print >>sys.stdout, "Records processed: %d; Last date: %s\r" % \
         (nrec, weeutil.weeutil.timestamp_to_string(last_time)),
     sys.stdout.flush()
+
+def _add_with_none(x, y):
+    """Add two values, either of which may be None."""
+    if x is None:
+        return y
+    if y is None:
+        return x
+    return x + y
+
+def _backfill_partition(partition):
+    """Accumulate the days in part of an archive. This runs in a worker process
+    during a parallel backfill.
+    
+    partition: A 6-way tuple (archive_class, database_dict, table_name,
+    start_ts, stop_ts, columns). The archive is opened with archive_class.
+    Archive records with timestamps greater than start_ts, and less than or
+    equal to stop_ts, will be used. Only the listed columns are read.
+    
+    returns: A list with an entry for each day, in order. Each entry is a tuple
+    (sod_ts, unit_system, stats_dict, nrecs, last_ts), where stats_dict holds
+    the stats tuple for each type. Plain tuples are used, so the results can
+    be pickled back to the parent process."""
+
+    (archive_class, database_dict, table_name, start_ts, stop_ts, columns) = partition
+    _results = []
+    _day_accum = None
+    with archive_class.open(database_dict, table_name) as archive:
+        for _rec in archive.genBatchRecords(start_ts, stop_ts, columns, compact=True):
+            _sod_ts = weeutil.weeutil.startOfArchiveDay(_rec['dateTime'])
+            if _day_accum is None or _day_accum.timespan.start != _sod_ts:
+                if _day_accum is not None:
+                    _results.append(_day_results(_day_accum, _nrecs, _last_ts))
+                _day_accum = weewx.accum.Accum(weeutil.weeutil.archiveDaySpan(_sod_ts, 0))
+                _nrecs = 0
+            _day_accum.addRecord(_rec)
+            _nrecs += 1
+            _last_ts = _rec['dateTime']
+    if _day_accum is not None:
+        _results.append(_day_results(_day_accum, _nrecs, _last_ts))
+    return _results
+
+def _day_results(day_accum, nrecs, last_ts):
+    return (day_accum.timespan.start, day_accum.unit_system,
+            dict((obs_type, day_accum[obs_type].getStatsTuple()) for obs_type in day_accum),
+            nrecs, last_ts)
         
 class DaySummaryManager(Manager):
     """Manage a daily statistical summary. 
@@ -1092,6 +2769,23 @@ class DaySummaryManager(Manager):
                'min_le'     : "SELECT SUM(min <= %(val)s) FROM %(table_name)s_day_%(obs_key)s WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
                'sum_ge'     : "SELECT SUM(sum >= %(val)s) FROM %(table_name)s_day_%(obs_key)s WHERE dateTime >= %(start)s AND dateTime < %(stop)s"}
     
+    # Aggregation types that can be calculated for a timespan that does not
+    # start and stop on midnight boundaries, by using the daily summaries
+    # for the whole days, and the archive table for any partial days. The
+    # value is the list of statistics that the SQL statement for the type
+    # returns.
+    hybrid_aggregates = {'min'    : ('min',),
+                         'max'    : ('max',),
+                         'sum'    : ('sum',),
+                         'count'  : ('count',),
+                         'avg'    : ('wsum', 'sumtime'),
+                         'rms'    : ('wsquaresum', 'sumtime'),
+                         'vecavg' : ('xsum', 'ysum', 'dirsumtime')}
+    
+    # Daily summary types that are not in the archive table, and the archive
+    # columns they are accumulated from.
+    hybrid_columns = {}
+    
     def __init__(self, connection, table_name='archive', schema=None):
         """Initialize an instance of DaySummaryManager
         
@@ -1108,13 +2802,29 @@ class DaySummaryManager(Manager):
         # Initialize my superclass:
         super(DaySummaryManager, self).__init__(connection, table_name, schema)
         
+        # Set up the daily summary tables, creating them if need be:
+        self._init_day_tables(schema)
+
+        # The day summary currently being updated, kept in memory so it does
+        # not have to be read back from the database on every archive period.
+        self._day_cache = None
+        # The stats tuples last read from, or written to, the database for the
+        # cached day, keyed by observation type. A value of None means there is
+        # no row for the type yet.
+        self._day_cache_tuples = {}
+
+    def _init_day_tables(self, schema):
+        """Find the daily summary tables, and their observation types and
+        version. If they do not exist, create them, but only if a schema has
+        been given. Managers that keep the daily summaries some other way
+        override this."""
         # If the database has not been initialized with the daily summaries, then create the
         # necessary tables, but only if a schema has been given.
         if '%s_day__metadata' % self.table_name not in self.connection.tables():
             # Database has not been initialized with the summaries. Is there a schema?
             if schema is None:
                 # Uninitialized, but no schema was supplied. Raise an exception
-                raise weedb.OperationalError("No day summary schema for table '%s' in database '%s'" % (self.table_name, connection.database_name))
+                raise weedb.OperationalError("No day summary schema for table '%s' in database '%s'" % (self.table_name, self.database_name))
             # There is a schema. Create all the daily summary tables as one transaction:
             with weedb.Transaction(self.connection) as _cursor:
                 self._initialize_day_tables(schema, _cursor)
@@ -1150,27 +2860,105 @@ class DaySummaryManager(Manager):
         _sod_ts = weeutil.weeutil.startOfArchiveDay(record['dateTime'])
 
         # Now add to the daily summary for the appropriate day:
-        _day_summary = self._get_day_summary(_sod_ts, cursor)
+        _day_summary = self._get_cached_day_summary(_sod_ts, cursor)
         _day_summary.addRecord(record)
-        self._set_day_summary(_day_summary, record['dateTime'], cursor)
+        self._set_day_summary(_day_summary, record['dateTime'], cursor, self._day_cache_tuples)
         syslog.syslog(log_level, "manager: added record %s to daily summary in '%s'" % 
                       (weeutil.weeutil.timestamp_to_string(record['dateTime']), 
                        self.database_name))
-        
+
+    def _addChunk(self, record_chunk, cursor, log_level):
+        """Specialized version that updates the daily summaries, as well as the
+        main archive table. Each day summary is read and written only once per
+        chunk, no matter how many records fall in that day."""
+
+        # First let my superclass add the records to the main archive table:
+        _added = super(DaySummaryManager, self)._addChunk(record_chunk, cursor, log_level)
+
+        _day_summary = None
+        for record in _added:
+            # Get the start of day for the record:
+            _sod_ts = weeutil.weeutil.startOfArchiveDay(record['dateTime'])
+            # If the record belongs to a different day than the one we have
+            # been working on, save the old day, and retrieve the new one:
+            if _day_summary is None or _day_summary.timespan.start != _sod_ts:
+                if _day_summary is not None:
+                    self._set_day_summary(_day_summary, _last_ts, cursor, self._day_cache_tuples)
+                _day_summary = self._get_cached_day_summary(_sod_ts, cursor)
+            _day_summary.addRecord(record)
+            _last_ts = record['dateTime']
+        if _day_summary is not None:
+            self._set_day_summary(_day_summary, _last_ts, cursor, self._day_cache_tuples)
+            syslog.syslog(log_level, "manager: added %d records to daily summary in '%s'" %
+                          (len(_added), self.database_name))
+        return _added
+
+    def addRecord(self, record_obj, log_level=syslog.LOG_NOTICE, chunk_size=None, accumulator=None):
+        """Specialized version that discards the cached day summary if the
+        transaction fails, so it cannot get out of step with the database.
+        
+        accumulator: If given, an accumulator of LOOP data, whose hi/lows are
+        used to update the daily summaries, just as updateHiLo() would. This is
+        done in the same transaction as adding the records, so the day summary
+        is read and written only once for both. [Optional. Default is None]"""
+        if accumulator is None:
+            try:
+                super(DaySummaryManager, self).addRecord(record_obj, log_level, chunk_size)
+            except:
+                self._clear_day_cache()
+                raise
+            return
+
+        record_list = [record_obj] if hasattr(record_obj, 'keys') else list(record_obj)
+        # Get the start-of-day for the timespan in the accumulator
+        _sod_ts = weeutil.weeutil.startOfArchiveDay(accumulator.timespan.stop)
+        try:
+            with weedb.Transaction(self.connection) as _cursor:
+                _day_summary = self._get_cached_day_summary(_sod_ts, _cursor)
+                _day_summary.updateHiLo(accumulator)
+                # If all the records fall in the same day as the accumulator,
+                # the hi/lows get saved along with them. Otherwise, adding
+                # a record could replace the cached day, so save it now.
+                _same_day = all(weeutil.weeutil.startOfArchiveDay(record['dateTime']) == _sod_ts 
+                                for record in record_list)
+                if not _same_day:
+                    self._set_day_summary(_day_summary, accumulator.timespan.stop, _cursor,
+                                          self._day_cache_tuples)
+                min_ts, max_ts = self._addRecords(record_list, _cursor, log_level, chunk_size)
+                # If no record was added, the hi/lows still have to be saved:
+                if _same_day and max_ts is None:
+                    self._set_day_summary(_day_summary, accumulator.timespan.stop, _cursor,
+                                          self._day_cache_tuples)
+        except:
+            self._clear_day_cache()
+            self._clear_query_cache()
+            if self._hot_start is not None:
+                self._load_hot()
+            raise
+        self._update_timestamps(min_ts, max_ts)
+
     def updateHiLo(self, accumulator):
         """Use the contents of an accumulator to update the daily hi/lows."""
         
         # Get the start-of-day for the timespan in the accumulator
         _sod_ts = weeutil.weeutil.startOfArchiveDay(accumulator.timespan.stop)
 
-        with weedb.Transaction(self.connection) as _cursor:
-            # Retrieve the daily summaries seen so far:
-            _stats_dict = self._get_day_summary(_sod_ts, _cursor)
-            # Update them with the contents of the accumulator:
-            _stats_dict.updateHiLo(accumulator)
-            # Then save the results:
-            self._set_day_summary(_stats_dict, accumulator.timespan.stop, _cursor)
+        try:
+            with weedb.Transaction(self.connection) as _cursor:
+                # Retrieve the daily summaries seen so far:
+                _stats_dict = self._get_cached_day_summary(_sod_ts, _cursor)
+                # Update them with the contents of the accumulator:
+                _stats_dict.updateHiLo(accumulator)
+                # Then save the results:
+                self._set_day_summary(_stats_dict, accumulator.timespan.stop, _cursor,
+                                      self._day_cache_tuples)
+        except:
+            self._clear_day_cache()
+            raise
+        finally:
+            self._clear_query_cache()
         
+    @memoize_aggregate
     def getAggregate(self, timespan, obs_type, aggregate_type, **option_dict):
         """Returns an aggregation of a statistical type for a given time period.
         It will use the daily summaries if possible, otherwise the archive table.
@@ -1193,15 +2981,20 @@ class DaySummaryManager(Manager):
         # We can use the day summary optimizations if the starting and ending times of
         # the aggregation interval sit on midnight boundaries, or are the first or last
         # records in the database.
+        interior_span = None
         if aggregate_type in ['last', 'lasttime'] or not (weeutil.weeutil.isMidnight(timespan.start) or \
                                                           timespan.start == self.first_timestamp) \
                                                   or not (weeutil.weeutil.isMidnight(timespan.stop)  or \
                                                           timespan.stop  == self.last_timestamp):
             
-            # Cannot use the day summaries. We'll have to calculate the aggregate
-            # using the regular archive table:
-            return Manager.getAggregate(self, timespan, obs_type, aggregate_type, 
-                                          **option_dict)
+            # Cannot use the day summaries alone. If the timespan includes any
+            # whole days, we may be able to use them for those days:
+            interior_span = self._get_interior_span(timespan, obs_type, aggregate_type)
+            if interior_span is None:
+                # No. We'll have to calculate the aggregate using the regular
+                # archive table:
+                return Manager.getAggregate(self, timespan, obs_type, aggregate_type, 
+                                              **option_dict)
 
         # We can use the daily summaries. Proceed.
                 
@@ -1238,8 +3031,13 @@ class DaySummaryManager(Manager):
                      'val'           : target_val,
                      'table_name'    : self.table_name}
             
-        # Run the query against the database:
-        _row = self.getSql(DaySummaryManager.sqlDict[aggregate_type] % interDict)
+        if interior_span:
+            # Use the daily summaries for the whole days, and the archive table
+            # for the partial days on either end:
+            _row = self._get_hybrid_row(timespan, interior_span, obs_type, aggregate_type, interDict)
+        else:
+            # Run the query against the database:
+            _row = self._get_day_row(aggregate_type, interDict)
 
         #=======================================================================
         # Each aggregation type requires a slightly different calculation.
@@ -1291,13 +3089,213 @@ class DaySummaryManager(Manager):
         # Check to see if this is a valid daily summary type:
         return obs_type in self.daykeys
 
+    def _get_day_row(self, aggregate_type, interDict):
+        """Run the daily summary query for an aggregation type, and return the
+        resulting row. Subclasses can specialize this to get the answer some
+        other way."""
+        return self.getSql(self.sqlDict[aggregate_type] % interDict)
+
+    def _get_interior_span(self, timespan, obs_type, aggregate_type):
+        """Returns the whole days within a timespan, as a TimeSpan, if an
+        aggregate over the timespan can be calculated from the daily summaries
+        for those days plus the archive table for the partial days. Otherwise,
+        returns None."""
+        
+        if aggregate_type.lower() not in self.hybrid_aggregates or obs_type not in self.daykeys:
+            return None
+        # All the columns needed to accumulate the type must be in the archive table:
+        for obs_col in self.hybrid_columns.get(obs_type, [obs_type]):
+            if obs_col not in self.sqlkeys:
+                return None
+        
+        if weeutil.weeutil.isMidnight(timespan.start):
+            interior_start = timespan.start
+        else:
+            interior_start = weeutil.weeutil.archiveDaySpan(timespan.start).stop
+        if weeutil.weeutil.isMidnight(timespan.stop):
+            interior_stop = timespan.stop
+        else:
+            interior_stop = weeutil.weeutil.archiveDaySpan(timespan.stop).start
+        
+        # Is there at least one whole day?
+        if interior_start >= interior_stop:
+            return None
+        return weeutil.weeutil.TimeSpan(interior_start, interior_stop)
+    
+    def _get_hybrid_row(self, timespan, interior_span, obs_type, aggregate_type, interDict):
+        """Returns the row the daily summary query for an aggregation type would
+        return, if the daily summaries had been cut off at the start and stop of
+        the timespan.
+        
+        The query is run against the daily summaries for the whole days in
+        interior_span. The statistics for the partial days on either side are
+        calculated from the archive table, and merged in."""
+
+        interDict = dict(interDict, start=interior_span.start, stop=interior_span.stop)
+        _row = self._get_day_row(aggregate_type, interDict)
+        
+        for partial_span in (weeutil.weeutil.TimeSpan(timespan.start, interior_span.start),
+                             weeutil.weeutil.TimeSpan(interior_span.stop, timespan.stop)):
+            if not partial_span.length:
+                continue
+            _stats = self._get_partial_stats(partial_span, obs_type)
+            if _stats is None:
+                continue
+            _partial_row = tuple(getattr(_stats, stat) for stat in self.hybrid_aggregates[aggregate_type])
+            if not _row:
+                _row = _partial_row
+            elif aggregate_type == 'min':
+                _row = (weeutil.weeutil.min_with_none((_row[0], _partial_row[0])),)
+            elif aggregate_type == 'max':
+                _row = (weeutil.weeutil.max_with_none((_row[0], _partial_row[0])),)
+            else:
+                _row = tuple(_add_with_none(x, y) for (x, y) in zip(_row, _partial_row))
+        return _row
+    
+    def _get_partial_stats(self, timespan, obs_type):
+        """Accumulate the statistics for a single type over a timespan, using
+        the archive table. Returns the stats object, or None if there were no
+        records."""
+        obs_cols = self.hybrid_columns.get(obs_type, [obs_type])
+        col_names = ['dateTime', 'usUnits'] + obs_cols
+        sql_str = "SELECT %s FROM %s WHERE dateTime > ? AND dateTime <= ?" % (', '.join(col_names), self.table_for_span(*timespan))
+        _accum = weewx.accum.Accum(timespan)
+        for _row in self.genSql(sql_str, timespan):
+            _accum.addRecord(dict(zip(col_names, _row)))
+        return _accum.get(obs_type)
+
     def has_data(self, obs_type, timespan):
         """Checks whether the observation type exists in the database and whether it has any data."""
 
         return self.exists(obs_type) and self.getAggregate(timespan, obs_type, 'count')[0] != 0
 
+    def add_obs_type(self, obs_type, sql_type='REAL', progress_fn=show_progress):
+        """Add a new observation type to the database, in place.
+        
+        The type is added to the archive table, unless it is already there.
+        Then its daily summary is created, and filled from the archive. Only
+        the new type is read from the archive, and the daily summaries of the
+        other types are left alone. See Manager.add_obs_type().
+        
+        obs_type: The name of the new type.
+        
+        sql_type: Its SQL type in the archive table. [Optional. Default is 'REAL']
+        
+        progress_fn: This function will be called after processing every 1000
+        records.
+        
+        returns: A 2-way tuple (nrecs, ndays) with the number of records read,
+        and the number of days summarized."""
+        
+        if obs_type in self.daykeys:
+            raise weewx.ViolatedPrecondition("Type '%s' already has a daily summary in database '%s'" % 
+                                             (obs_type, self.database_name))
+        if obs_type not in self.sqlkeys:
+            Manager.add_obs_type(self, obs_type, sql_type)
+        with weedb.Transaction(self.connection) as _cursor:
+            self._add_day_type(obs_type, _cursor)
+        syslog.syslog(syslog.LOG_NOTICE, "manager: Added daily summary for type '%s' in database '%s'" % 
+                      (obs_type, self.database_name))
+        return self._rebuild_day_types([obs_type], progress_fn=progress_fn)
+
+    def rebuild_day_summary(self, obs_types, start_ts=None, stop_ts=None, progress_fn=show_progress):
+        """Recalculate the daily summaries of some types, over a span of days,
+        from the archive.
+        
+        This is useful after values in the archive have been corrected, for
+        example with updateValue(). Only the archive columns the types need
+        are read, and only their daily summaries are written. The summaries of
+        other types are left alone. The highs and lows will be no more
+        accurate than the archive period.
+        
+        obs_types: An observation type, or a list of them.
+        
+        start_ts: The first day to be rebuilt is the one that includes this
+        time. [Optional. Default is to start with the first day in the archive]
+        
+        stop_ts: The last day to be rebuilt is the one that includes this time.
+        [Optional. Default is to end with the last day in the archive]
+        
+        progress_fn: This function will be called after processing every 1000
+        records.
+        
+        returns: A 2-way tuple (nrecs, ndays) with the number of records read,
+        and the number of days rebuilt."""
+        
+        if isinstance(obs_types, basestring):
+            obs_types = [obs_types]
+        for _obs_type in obs_types:
+            if _obs_type not in self.daykeys:
+                raise weewx.ViolatedPrecondition("Type '%s' has no daily summary in database '%s'" % 
+                                                 (_obs_type, self.database_name))
+        # Work in whole archive days:
+        _start = weeutil.weeutil.archiveDaySpan(start_ts).start if start_ts is not None else None
+        _stop = weeutil.weeutil.archiveDaySpan(stop_ts).stop if stop_ts is not None else None
+
+        syslog.syslog(syslog.LOG_INFO, "manager: Rebuilding daily summaries of %s in database '%s'" % 
+                      (', '.join(obs_types), self.database_name))
+        t1 = time.time()
+        nrecs, ndays = self._rebuild_day_types(obs_types, _start, _stop, progress_fn)
+        syslog.syslog(syslog.LOG_INFO, "manager: Processed %d records to rebuild %d day summaries in %.2f seconds" % 
+                      (nrecs, ndays, time.time() - t1))
+        return (nrecs, ndays)
+
+    def _add_day_type(self, obs_type, cursor):
+        """Create the daily summary of a new type."""
+        cursor.execute(DaySummaryManager.sql_create_str % (self.table_name, obs_type))
+        self.daykeys.append(obs_type)
+
+    def _rebuild_day_types(self, obs_types, start_ts=None, stop_ts=None, progress_fn=None):
+        """Recalculate the daily summaries of some types from the archive. The
+        other types are left alone. Only the archive columns the types are
+        accumulated from get read.
+        
+        start_ts, stop_ts: Archive records with timestamps greater than start_ts,
+        and less than or equal to stop_ts, will be used. They should fall on
+        the boundaries of archive days. [Optional. Default is the whole archive]
+        
+        returns: A 2-way tuple (nrecs, ndays)."""
+        
+        _columns = []
+        for _obs_type in obs_types:
+            _columns += [x for x in self.hybrid_columns.get(_obs_type, [_obs_type]) 
+                         if x in self.sqlkeys and x not in _columns]
+        
+        nrecs = 0
+        ndays = 0
+        _day_accum = None
+        with weedb.Transaction(self.connection) as _cursor:
+            # Days that have a summary, but no longer have any archive records,
+            # will get empty statistics:
+            _empty_days = self._get_day_stamps(obs_types, start_ts, stop_ts, _cursor)
+            for _rec in self.genBatchRecords(start_ts, stop_ts, _columns, compact=True):
+                _sod_ts = weeutil.weeutil.startOfArchiveDay(_rec['dateTime'])
+                if _day_accum is None or _day_accum.timespan.start != _sod_ts:
+                    if _day_accum is not None:
+                        self._set_day_types(_day_accum, obs_types, _cursor)
+                        ndays += 1
+                    _day_accum = weewx.accum.Accum(weeutil.weeutil.archiveDaySpan(_sod_ts, 0))
+                    _empty_days.discard(_sod_ts)
+                _day_accum.addRecord(_rec)
+                nrecs += 1
+                if progress_fn and nrecs % 1000 == 0:
+                    progress_fn(nrecs, _rec['dateTime'])
+            if _day_accum is not None:
+                self._set_day_types(_day_accum, obs_types, _cursor)
+                ndays += 1
+            for _sod_ts in sorted(_empty_days):
+                _day_accum = weewx.accum.Accum(weeutil.weeutil.archiveDaySpan(_sod_ts, 0))
+                _day_accum.unit_system = self.std_unit_system
+                self._set_day_types(_day_accum, obs_types, _cursor)
+                ndays += 1
+
+        # The daily summaries have been changed behind the caches' back:
+        self._clear_day_cache()
+        self._clear_query_cache()
+        return (nrecs, ndays)
+
     def backfill_day_summary(self, start_ts=None, stop_ts=None, 
-                             progress_fn=show_progress, trans_days=5):
+                             progress_fn=show_progress, trans_days=5, jobs=1):
         """Fill the statistical database from an archive database.
         
         Normally, the daily summaries get filled by LOOP packets (to get maximum time
@@ -1320,6 +3318,11 @@ class DaySummaryManager(Manager):
         
         trans_day: Number of days of archive data to be used for each daily summaries database transaction. [Optional. Default is 5.] 
         
+        jobs: The number of worker processes to use. If greater than 1, the
+        days are accumulated in parallel, trans_days days at a time, then merged
+        into the daily summaries in order. This requires a manager obtained
+        through open() or open_with_create(). [Optional. Default is 1.]
+        
         returns: A 2-way tuple (nrecs, ndays) where 
           nrecs is the number of records backfilled;
           ndays is the number of days
@@ -1327,7 +3330,35 @@ class DaySummaryManager(Manager):
         
         syslog.syslog(syslog.LOG_INFO, "manager: Starting backfill of daily summaries")
         t1 = time.time()
+
+        # The backfill writes directly to the database, so the cached day,
+        # and any cached aggregates, may become stale:
+        self._clear_day_cache()
+        self._clear_query_cache()
         
+        if jobs > 1 and self.database_dict is None:
+            syslog.syslog(syslog.LOG_INFO, "manager: Database details unknown. Cannot do a parallel backfill")
+            jobs = 1
+
+        if jobs > 1:
+            nrecs, ndays = self._backfill_parallel(start_ts, stop_ts, progress_fn, trans_days, jobs)
+        else:
+            nrecs, ndays = self._backfill_serial(start_ts, stop_ts, progress_fn, trans_days)
+
+        tdiff = time.time() - t1
+        if nrecs:
+            syslog.syslog(syslog.LOG_INFO, 
+                          "manager: Processed %d records to backfill %d day summaries in %.2f seconds" % (nrecs, ndays, tdiff))
+        else:
+            syslog.syslog(syslog.LOG_INFO,
+                          "manager: Daily summaries up to date")
+        
+        return (nrecs, ndays)
+
+
+    def _backfill_serial(self, start_ts, stop_ts, progress_fn, trans_days):
+        """Backfill the daily summaries, one record at a time. See backfill_day_summary()."""
+
         nrecs = 0
         ndays = 0
         
@@ -1357,12 +3388,15 @@ class DaySummaryManager(Manager):
         # If we have a stop time then make sure our tranche does not go past it
         if stop_ts:
             tranche_stop_ts = min(stop_ts, tranche_stop_ts)
+        # Read only the columns that hold data somewhere in the records to be
+        # backfilled. The rest would only be None.
+        _columns = self._scan_live_keys(self.sqlkeys, tranche_start_ts, stop_ts)
         while True:
             with weedb.Transaction(self.connection) as _cursor:
                 # Go through all the archive records in the tranche, adding 
                 # them to the accumulator and then the daily summary tables
                 start = tranche_start_ts + 1 if tranche_start_ts else None
-                for _rec in self.genBatchRecords(start, tranche_stop_ts):
+                for _rec in self.genBatchRecords(start, tranche_stop_ts, _columns, compact=True):
                     # Get the start-of-day for the record:
                     _sod_ts = weeutil.weeutil.startOfArchiveDay(_rec['dateTime'])
                     # If this is the very first record, fetch a new accumulator
@@ -1390,7 +3424,7 @@ class DaySummaryManager(Manager):
         
                 # Tranche complete; but are we done?
                 if tranche_stop_ts:
-                    if tranche_stop_ts >= max(stop_ts, self.lastGoodStamp()):
+                    if tranche_stop_ts >= (stop_ts or self.lastGoodStamp()):
                         # We had a stop time and we have reached it so we are done
                         # First record the daily summary for the last day then break
                         if _day_accum:
@@ -1409,23 +3443,88 @@ class DaySummaryManager(Manager):
             # past it
             if stop_ts:
                 tranche_stop_ts = min(stop_ts, tranche_stop_ts)
-        tdiff = time.time() - t1
-        if nrecs:
-            syslog.syslog(syslog.LOG_INFO, 
-                          "manager: Processed %d records to backfill %d day summaries in %.2f seconds" % (nrecs, ndays, tdiff))
-        else:
-            syslog.syslog(syslog.LOG_INFO,
-                          "manager: Daily summaries up to date")
+
+        return (nrecs, ndays)
+
+    def _backfill_parallel(self, start_ts, stop_ts, progress_fn, trans_days, jobs):
+        """Backfill the daily summaries, using a pool of worker processes. 
+        
+        The time span is split into partitions of trans_days days. Each worker
+        opens its own connection to the database and accumulates the days in a
+        partition. The results are then merged into the daily summaries in
+        time order, one database transaction per partition. See 
+        backfill_day_summary()."""
+        
+        import multiprocessing
+
+        nrecs = 0
+        ndays = 0
+
+        # If a start time for the backfill wasn't given, then start with the time of
+        # the last statistics recorded, or else the start of the archive:
+        if not start_ts:
+            start_ts = self._getLastUpdate()
+        if not start_ts:
+            if self.first_timestamp is None:
+                # No archive records. Nothing to be done.
+                return (nrecs, ndays)
+            start_ts = self.first_timestamp - 1
+        if not stop_ts:
+            stop_ts = self.last_timestamp
+        
+        # Split the time span into partitions. Each partition ends on a
+        # midnight, so a day does not get split between workers. The extra
+        # half day takes care of any DST transitions.
+        _partitions = []
+        _start = start_ts
+        # The workers read only the columns that hold data somewhere in the
+        # records to be backfilled:
+        _columns = self._scan_live_keys(self.sqlkeys, start_ts, stop_ts)
+        while stop_ts is not None and _start < stop_ts:
+            _stop = weeutil.weeutil.startOfDay(weeutil.weeutil.startOfArchiveDay(_start + 1) + trans_days * 86400 + 43200)
+            _stop = min(_stop, stop_ts)
+            _partitions.append((get_archive_class(type(self)), self.database_dict, self.table_name, _start, _stop, _columns))
+            _start = _stop
+
+        _pool = multiprocessing.Pool(jobs)
+        try:
+            # imap() returns the results in the same order as the partitions
+            for _day_results in _pool.imap(_backfill_partition, _partitions):
+                with weedb.Transaction(self.connection) as _cursor:
+                    for (_sod_ts, _unit_system, _stats_dict, _nrecs, _lastTime) in _day_results:
+                        # Merge what the worker found into anything already
+                        # in the daily summary for the day.
+                        _day_accum = self._get_day_summary(_sod_ts, _cursor)
+                        _day_accum.unit_system = _unit_system
+                        _worker_accum = weewx.accum.Accum(_day_accum.timespan)
+                        for _obs_type in _stats_dict:
+                            _worker_accum.set_stats(_obs_type, _stats_dict[_obs_type])
+                            _day_accum.init_type(_obs_type)
+                            _day_accum[_obs_type].mergeHiLo(_worker_accum[_obs_type])
+                            _day_accum[_obs_type].mergeSum(_worker_accum[_obs_type])
+                        self._set_day_summary(_day_accum, _lastTime, _cursor)
+                        ndays += 1
+                        nrecs += _nrecs
+                if progress_fn and _day_results:
+                    progress_fn(nrecs, _lastTime)
+            _pool.close()
+        finally:
+            _pool.terminate()
+            _pool.join()
         
         return (nrecs, ndays)
 
 
     #--------------------------- UTILITY FUNCTIONS -----------------------------------
 
-    def _get_day_summary(self, sod_ts, cursor=None):
+    def _get_day_summary(self, sod_ts, cursor=None, stats_dict=None):
         """Return an instance of an appropriate accumulator, initialized to a given day's statistics.
 
-        sod_ts: The timestamp of the start-of-day of the desired day."""
+        sod_ts: The timestamp of the start-of-day of the desired day.
+        
+        stats_dict: If given, the stats tuple read for each type is saved in
+        this dictionary, keyed by type. The value will be None for types
+        that do not have a row for the day yet."""
                 
         # Get the TimeSpan for the day starting with sod_ts:
         _timespan = weeutil.weeutil.archiveDaySpan(sod_ts,0)
@@ -1444,20 +3543,49 @@ class DaySummaryManager(Manager):
                 # If the date does not exist in the database yet then _row will be None.
                 _stats_tuple = _row[1:] if _row is not None else None
                 _day_accum.set_stats(_day_key, _stats_tuple)
+                if stats_dict is not None:
+                    stats_dict[_day_key] = tuple(_stats_tuple) if _stats_tuple is not None else None
             
             return _day_accum
         finally:
             if not cursor:
                 _cursor.close()
 
-    def _set_day_summary(self, day_accum, lastUpdate, cursor):
+    def _get_cached_day_summary(self, sod_ts, cursor=None):
+        """Like _get_day_summary(), except the accumulator for the day being
+        updated is kept in memory, so the database is read only when the day
+        rolls over. The returned accumulator should be saved using
+        _set_day_summary(), passing in self._day_cache_tuples, so that only
+        the types that have changed get written.
+        
+        This assumes this manager is the only writer of the daily summaries
+        for the current day."""
+        
+        if self._day_cache is None or self._day_cache.timespan.start != sod_ts:
+            # Nothing cached, or the day has rolled over. Read the day in.
+            self._clear_day_cache()
+            _stats_dict = {}
+            self._day_cache = self._get_day_summary(sod_ts, cursor, _stats_dict)
+            self._day_cache_tuples = _stats_dict
+        return self._day_cache
+
+    def _clear_day_cache(self):
+        """Discard the cached day summary."""
+        self._day_cache = None
+        self._day_cache_tuples = {}
+
+    def _set_day_summary(self, day_accum, lastUpdate, cursor, last_tuples=None):
         """Write all statistics for a day to the database in a single transaction.
         
         day_accum: an accumulator with the daily summary. See weewx.accum
         
         lastUpdate: the time of the last update will be set to this. Normally, this
         is the timestamp of the last archive record added to the instance
-        day_accum."""
+        day_accum.
+        
+        last_tuples: If given, a dictionary holding the stats tuples last saved
+        for this day, keyed by type. Types whose statistics are unchanged will
+        not be written. The dictionary is updated with what gets written."""
 
         # Make sure the new data uses the same unit system as the database.
         self._check_unit_system(day_accum.unit_system)
@@ -1469,8 +3597,12 @@ class DaySummaryManager(Manager):
             # Don't try an update for types not in the database:
             if _summary_type not in self.daykeys:
                 continue
+            _stats_tuple = day_accum[_summary_type].getStatsTuple()
+            # Skip types that have not changed since they were last saved:
+            if last_tuples is not None and last_tuples.get(_summary_type) == _stats_tuple:
+                continue
             # ... get the stats tuple to be written to the database...
-            _write_tuple = (_sod,) + day_accum[_summary_type].getStatsTuple()
+            _write_tuple = (_sod,) + _stats_tuple
             # ... and an appropriate SQL command with the correct number of question marks ...
             _qmarks = ','.join(len(_write_tuple)*'?')
             _sql_replace_str = "REPLACE INTO %s_day_%s VALUES(%s)" % (self.table_name, _summary_type, _qmarks)
@@ -1480,18 +3612,44 @@ class DaySummaryManager(Manager):
                 cursor.execute(_sql_replace_str, _write_tuple)
             except weedb.OperationalError, e:
                 syslog.syslog(syslog.LOG_ERR, "manager: Operational error database %s; %s" % (self.database_name, e))
+            else:
+                if last_tuples is not None:
+                    last_tuples[_summary_type] = _stats_tuple
                 
         # Update the time of the last daily summary update:
-        cursor.execute(DaySummaryManager.meta_replace_str % self.table_name, ('lastUpdate', str(int(lastUpdate))))
+        cursor.execute(self.meta_replace_str % self.table_name, ('lastUpdate', str(int(lastUpdate))))
+
+    def _get_day_stamps(self, obs_types, start_ts, stop_ts, cursor):
+        """Return the set of the start of days that have a daily summary for
+        any of some types, within a span. A value of None for start_ts or
+        stop_ts means the span is open at that end."""
+        _days = set()
+        for _obs_type in obs_types:
+            cursor.execute("SELECT dateTime FROM %s_day_%s WHERE dateTime >= ? AND dateTime < ?" % (self.table_name, _obs_type),
+                           (start_ts or 0, stop_ts if stop_ts is not None else sys.maxint))
+            _days.update(_row[0] for _row in cursor.fetchall())
+        return _days
+
+    def _set_day_types(self, day_accum, obs_types, cursor):
+        """Write the statistics of some types for a day. The other types, and
+        the time of the last update, are left alone."""
+        
+        self._check_unit_system(day_accum.unit_system)
+        for _obs_type in obs_types:
+            # Types with no data for the day still get a row:
+            day_accum.init_type(_obs_type)
+            _write_tuple = (day_accum.timespan.start,) + day_accum[_obs_type].getStatsTuple()
+            _qmarks = ','.join(len(_write_tuple)*'?')
+            cursor.execute("REPLACE INTO %s_day_%s VALUES(%s)" % (self.table_name, _obs_type, _qmarks), _write_tuple)
             
     def _getLastUpdate(self, cursor=None):
         """Returns the time of the last update to the statistical database."""
 
         if cursor:
-            cursor.execute(DaySummaryManager.select_update_str % self.table_name)
+            cursor.execute(self.select_update_str % self.table_name)
             _row = cursor.fetchone()
         else:
-            _row = self.getSql(DaySummaryManager.select_update_str % self.table_name)
+            _row = self.getSql(self.select_update_str % self.table_name)
         return int(_row[0]) if _row else None
     
     def drop_daily(self):
@@ -1507,6 +3665,8 @@ class DaySummaryManager(Manager):
                         _cursor.execute("DROP TABLE %s" % _table_name)
 
             del self.daykeys
+            self._clear_day_cache()
+            self._clear_query_cache()
         except weedb.OperationalError, e:
             syslog.syslog(syslog.LOG_ERR, 
                           "manager: Operational error database '%s'; %s" % (self.connection.database_name, e))
@@ -1514,6 +3674,303 @@ class DaySummaryManager(Manager):
             syslog.syslog(syslog.LOG_INFO,
                           "manager: Dropped daily summary tables from database '%s'" % (self.connection.database_name,))
 
+
+#===============================================================================
+#                        Class WideDaySummaryManager
+#
+#     Like DaySummaryManager, except the daily summaries are kept in a single
+#     table, with one row per day.
+#===============================================================================
+
+class WideDaySummaryManager(DaySummaryManager):
+    """Manage a daily statistical summary, using a single table.
+    
+    This is an alternative layout to the one used by DaySummaryManager. Rather
+    than a separate table for each type, all the statistics for a day are held
+    in a single row. The columns are named after the type and statistic. For
+    example, for type 'outTemp' there are columns
+    
+        outTemp_min, outTemp_mintime, outTemp_max, outTemp_maxtime, outTemp_sum,
+        outTemp_count, outTemp_wsum, outTemp_sumtime
+    
+    Types listed in vector_types have the additional columns needed for
+    vectors (max_dir, xsum, ysum, dirsumtime, squaresum, and wsquaresum).
+    
+    For table 'archive', the summary table is called 'archive_daysummary'. In
+    addition, there is a table called 'archive_daysummary__metadata', which
+    holds the time of the last update. Reading or writing a day takes a single
+    SQL statement.
+    
+    Daily summaries kept in the per-type tables can be moved into this layout
+    with migrate_day_tables()."""
+    
+    version = "1.0"
+    
+    # Names of the statistics held for scalars, and the extra statistics held
+    # for vectors. The order must match the stats tuples in weewx.accum.
+    scalar_stats = ['min', 'mintime', 'max', 'maxtime', 'sum', 'count', 'wsum', 'sumtime']
+    vector_stats = scalar_stats + ['max_dir', 'xsum', 'ysum', 'dirsumtime', 'squaresum', 'wsquaresum']
+    
+    # Types that are not in the archive schema, but that need vector statistics.
+    vector_types = []
+    
+    # The SQL types of the statistics:
+    stats_sql_types = {'mintime' : 'INTEGER', 'maxtime' : 'INTEGER', 'count' : 'INTEGER',
+                       'sumtime' : 'INTEGER', 'dirsumtime' : 'INTEGER'}
+    
+    meta_create_str   = """CREATE TABLE %s_daysummary__metadata (name CHAR(20) NOT NULL UNIQUE PRIMARY KEY, value TEXT);"""
+    meta_replace_str  = """REPLACE INTO %s_daysummary__metadata VALUES(?, ?)"""  
+    
+    select_update_str = """SELECT value FROM %s_daysummary__metadata WHERE name = 'lastUpdate';"""
+
+    # Set of SQL statements to be used for calculating aggregate statistics. Key is the aggregation type.
+    sqlDict = {'min'        : "SELECT MIN(%(obs_key)s_min) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'minmax'     : "SELECT MIN(%(obs_key)s_max) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'max'        : "SELECT MAX(%(obs_key)s_max) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'maxmin'     : "SELECT MAX(%(obs_key)s_min) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'meanmin'    : "SELECT AVG(%(obs_key)s_min) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'meanmax'    : "SELECT AVG(%(obs_key)s_max) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'maxsum'     : "SELECT MAX(%(obs_key)s_sum) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'mintime'    : "SELECT %(obs_key)s_mintime FROM %(table_name)s_daysummary  WHERE dateTime >= %(start)s AND dateTime < %(stop)s AND " \
+                              "%(obs_key)s_min = (SELECT MIN(%(obs_key)s_min) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime <%(stop)s)",
+               'maxmintime' : "SELECT %(obs_key)s_mintime FROM %(table_name)s_daysummary  WHERE dateTime >= %(start)s AND dateTime < %(stop)s AND " \
+                              "%(obs_key)s_min = (SELECT MAX(%(obs_key)s_min) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime <%(stop)s)",
+               'maxtime'    : "SELECT %(obs_key)s_maxtime FROM %(table_name)s_daysummary  WHERE dateTime >= %(start)s AND dateTime < %(stop)s AND " \
+                              "%(obs_key)s_max = (SELECT MAX(%(obs_key)s_max) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime <%(stop)s)",
+               'minmaxtime' : "SELECT %(obs_key)s_maxtime FROM %(table_name)s_daysummary  WHERE dateTime >= %(start)s AND dateTime < %(stop)s AND " \
+                              "%(obs_key)s_max = (SELECT MIN(%(obs_key)s_max) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime <%(stop)s)",
+               'maxsumtime' : "SELECT %(obs_key)s_maxtime FROM %(table_name)s_daysummary  WHERE dateTime >= %(start)s AND dateTime < %(stop)s AND " \
+                              "%(obs_key)s_sum = (SELECT MAX(%(obs_key)s_sum) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime <%(stop)s)",
+               'gustdir'    : "SELECT %(obs_key)s_max_dir FROM %(table_name)s_daysummary  WHERE dateTime >= %(start)s AND dateTime < %(stop)s AND " \
+                              "%(obs_key)s_max = (SELECT MAX(%(obs_key)s_max) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s)",
+               'sum'        : "SELECT SUM(%(obs_key)s_sum) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'count'      : "SELECT SUM(%(obs_key)s_count) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'avg'        : "SELECT SUM(%(obs_key)s_wsum),SUM(%(obs_key)s_sumtime) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'rms'        : "SELECT SUM(%(obs_key)s_wsquaresum),SUM(%(obs_key)s_sumtime) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'vecavg'     : "SELECT SUM(%(obs_key)s_xsum),SUM(%(obs_key)s_ysum),SUM(%(obs_key)s_dirsumtime)  FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'vecdir'     : "SELECT SUM(%(obs_key)s_xsum),SUM(%(obs_key)s_ysum) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'max_ge'     : "SELECT SUM(%(obs_key)s_max >= %(val)s) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'max_le'     : "SELECT SUM(%(obs_key)s_max <= %(val)s) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'min_ge'     : "SELECT SUM(%(obs_key)s_min >= %(val)s) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'min_le'     : "SELECT SUM(%(obs_key)s_min <= %(val)s) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s",
+               'sum_ge'     : "SELECT SUM(%(obs_key)s_sum >= %(val)s) FROM %(table_name)s_daysummary WHERE dateTime >= %(start)s AND dateTime < %(stop)s"}
+
+    def _init_day_tables(self, schema):
+        """Specialized version that uses the single daily summary table,
+        rather than the per-type tables."""
+        # If the database has not been initialized with the daily summary, then
+        # create the necessary tables, but only if a schema has been given.
+        if '%s_daysummary__metadata' % self.table_name not in self.connection.tables():
+            if schema is None:
+                raise weedb.OperationalError("No day summary schema for table '%s' in database '%s'" % (self.table_name, self.database_name))
+            with weedb.Transaction(self.connection) as _cursor:
+                self._initialize_day_tables(schema, _cursor)
+            syslog.syslog(syslog.LOG_NOTICE, "manager: Created daily summary table")
+        
+        self._init_day_columns()
+        row = self.connection.execute("""SELECT value FROM %s_daysummary__metadata WHERE name = 'Version';""" % self.table_name)
+        self.version = row[0] if row is not None else "1.0"
+
+    def _init_day_columns(self):
+        """Work out the observation types, and their statistics, from the
+        columns of the daily summary table."""
+        _columns = self.connection.columnsOf('%s_daysummary' % self.table_name)
+        self.daykeys = [x[:-len('_sumtime')] for x in _columns if x.endswith('_sumtime')]
+        # For each type, the list of statistics it holds:
+        self.day_stats = dict((_obs_type, WideDaySummaryManager.vector_stats 
+                               if '%s_wsquaresum' % _obs_type in _columns 
+                               else WideDaySummaryManager.scalar_stats) for _obs_type in self.daykeys)
+        # Form the statements used to read and write a day:
+        _column_list = ['dateTime'] + ['%s_%s' % (_obs_type, _stat) for _obs_type in self.daykeys
+                                                                   for _stat in self.day_stats[_obs_type]]
+        self._select_day_str = "SELECT %s FROM %s_daysummary WHERE dateTime = ?" % (', '.join(_column_list), self.table_name)
+        self._replace_day_str = "REPLACE INTO %s_daysummary (%s) VALUES (%s)" % (self.table_name, ', '.join(_column_list),
+                                                                                  ','.join(len(_column_list)*'?'))
+
+    def _initialize_day_tables(self, archiveSchema, cursor):  # @UnusedVariable
+        """Initialize the table needed for the daily summary."""
+        _columns = ['dateTime INTEGER NOT NULL UNIQUE PRIMARY KEY']
+        for _obs_type in self.obskeys + [x for x in self.vector_types if x not in self.obskeys]:
+            _stats = WideDaySummaryManager.vector_stats if _obs_type in self.vector_types else WideDaySummaryManager.scalar_stats
+            _columns += ['%s_%s %s' % (_obs_type, _stat, WideDaySummaryManager.stats_sql_types.get(_stat, 'REAL')) for _stat in _stats]
+        cursor.execute("CREATE TABLE %s_daysummary (%s);" % (self.table_name, ', '.join(_columns)))
+        # Create the meta table:
+        cursor.execute(self.meta_create_str % self.table_name)
+        # Put the version number in it:
+        cursor.execute(self.meta_replace_str % self.table_name, ("Version", WideDaySummaryManager.version))
+
+    def _add_day_type(self, obs_type, cursor):
+        """Add the columns for the daily summary of a new type."""
+        for _stat in WideDaySummaryManager.scalar_stats:
+            cursor.execute("ALTER TABLE %s_daysummary ADD COLUMN %s_%s %s" % 
+                           (self.table_name, obs_type, _stat, WideDaySummaryManager.stats_sql_types.get(_stat, 'REAL')))
+        self._init_day_columns()
+
+    def migrate_day_tables(self, progress_fn=None):
+        """Move daily summaries held in the old layout, with a table for each
+        type, into the single summary table. The old tables are then dropped.
+        Types in the old tables that are not in the summary table are not
+        copied.
+        
+        progress_fn: If given, this function will be called after every 100
+        days, with the number of days so far, and the timestamp of the last one.
+        
+        returns: The number of days migrated."""
+
+        # Use a regular DaySummaryManager to read the old tables. This will
+        # raise weedb.OperationalError if there are no old tables.
+        _old_manager = DaySummaryManager(self.connection, self.table_name)
+        
+        # Find all the days in the old tables
+        _day_set = set()
+        for _obs_type in _old_manager.daykeys:
+            for _row in self.genSql("SELECT dateTime FROM %s_day_%s" % (self.table_name, _obs_type)):
+                _day_set.add(_row[0])
+        _last_update = _old_manager._getLastUpdate()
+        
+        syslog.syslog(syslog.LOG_INFO, "manager: Migrating %d daily summaries in '%s'" % (len(_day_set), self.database_name))
+        
+        ndays = 0
+        with weedb.Transaction(self.connection) as _cursor:
+            for _sod_ts in sorted(_day_set):
+                _day_accum = _old_manager._get_day_summary(_sod_ts, _cursor)
+                _day_accum.unit_system = self.std_unit_system
+                self._set_day_summary(_day_accum, _last_update or _sod_ts, _cursor)
+                ndays += 1
+                if progress_fn and ndays % 100 == 0:
+                    progress_fn(ndays, _sod_ts)
+
+        # Now that the data is safe, drop the old tables
+        _old_manager.drop_daily()
+        self._clear_day_cache()
+        syslog.syslog(syslog.LOG_INFO, "manager: Migrated %d daily summaries in '%s'" % (ndays, self.database_name))
+        return ndays
+
+    def _get_day_summary(self, sod_ts, cursor=None, stats_dict=None):
+        """Return an instance of an appropriate accumulator, initialized to a given day's statistics.
+
+        sod_ts: The timestamp of the start-of-day of the desired day.
+        
+        stats_dict: If given, the stats tuple read for each type is saved in
+        this dictionary, keyed by type. The value will be None if there is no
+        row for the day yet."""
+
+        # Get the TimeSpan for the day starting with sod_ts:
+        _timespan = weeutil.weeutil.archiveDaySpan(sod_ts,0)
+
+        # Get an empty day accumulator:
+        _day_accum = weewx.accum.Accum(_timespan)
+        
+        _cursor = cursor or self.connection.cursor()
+
+        try:
+            _cursor.execute(self._select_day_str, (_day_accum.timespan.start,))
+            _row = _cursor.fetchone()
+            # Hand the statistics for each type on to the accumulator. If the
+            # date does not exist in the database yet then _row will be None.
+            i = 1
+            for _day_key in self.daykeys:
+                N = len(self.day_stats[_day_key])
+                _stats_tuple = tuple(_row[i:i+N]) if _row is not None else None
+                _day_accum.set_stats(_day_key, _stats_tuple)
+                if stats_dict is not None:
+                    stats_dict[_day_key] = _stats_tuple
+                i += N
+            
+            return _day_accum
+        finally:
+            if not cursor:
+                _cursor.close()
+
+    def _set_day_summary(self, day_accum, lastUpdate, cursor, last_tuples=None):
+        """Write all statistics for a day to the database, as a single row.
+        
+        day_accum: an accumulator with the daily summary. See weewx.accum
+        
+        lastUpdate: the time of the last update will be set to this. Normally, this
+        is the timestamp of the last archive record added to the instance
+        day_accum.
+        
+        last_tuples: If given, a dictionary holding the stats tuples last saved
+        for this day, keyed by type. The row will be written only if something
+        has changed. The dictionary is updated with what gets written."""
+
+        # Make sure the new data uses the same unit system as the database.
+        self._check_unit_system(day_accum.unit_system)
+        
+        _changed = last_tuples is None
+        _stats_tuples = {}
+        _write_list = [day_accum.timespan.start]
+        for _day_key in self.daykeys:
+            # Types not in the accumulator get empty statistics:
+            day_accum.init_type(_day_key)
+            _stats_tuples[_day_key] = day_accum[_day_key].getStatsTuple()
+            if not _changed and last_tuples.get(_day_key) != _stats_tuples[_day_key]:
+                _changed = True
+            _write_list.extend(_stats_tuples[_day_key])
+
+        if _changed:
+            try:
+                cursor.execute(self._replace_day_str, _write_list)
+            except weedb.OperationalError, e:
+                syslog.syslog(syslog.LOG_ERR, "manager: Operational error database %s; %s" % (self.database_name, e))
+            else:
+                if last_tuples is not None:
+                    last_tuples.update(_stats_tuples)
+
+        # Update the time of the last daily summary update:
+        cursor.execute(self.meta_replace_str % self.table_name, ('lastUpdate', str(int(lastUpdate))))
+
+    def _get_day_stamps(self, obs_types, start_ts, stop_ts, cursor):  # @UnusedVariable
+        """Return the set of the start of days within a span that have a row in
+        the daily summary table."""
+        cursor.execute("SELECT dateTime FROM %s_daysummary WHERE dateTime >= ? AND dateTime < ?" % self.table_name,
+                       (start_ts or 0, stop_ts if stop_ts is not None else sys.maxint))
+        return set(_row[0] for _row in cursor.fetchall())
+
+    def _set_day_types(self, day_accum, obs_types, cursor):
+        """Write the statistics of some types for a day. The other columns of
+        the row are left alone."""
+        
+        self._check_unit_system(day_accum.unit_system)
+        _column_list = []
+        _write_list = []
+        for _obs_type in obs_types:
+            day_accum.init_type(_obs_type)
+            _column_list += ['%s_%s' % (_obs_type, _stat) for _stat in self.day_stats[_obs_type]]
+            _write_list.extend(day_accum[_obs_type].getStatsTuple())
+        _sod = day_accum.timespan.start
+        cursor.execute("SELECT dateTime FROM %s_daysummary WHERE dateTime = ?" % self.table_name, (_sod,))
+        if cursor.fetchone():
+            cursor.execute("UPDATE %s_daysummary SET %s WHERE dateTime = ?" % 
+                           (self.table_name, ', '.join('%s=?' % x for x in _column_list)), _write_list + [_sod])
+        else:
+            cursor.execute("INSERT INTO %s_daysummary (dateTime, %s) VALUES (%s)" % 
+                           (self.table_name, ', '.join(_column_list), ','.join((len(_column_list) + 1)*'?')), 
+                           [_sod] + _write_list)
+
+    def drop_daily(self):
+        """Drop the daily summary."""
+        
+        syslog.syslog(syslog.LOG_INFO, 
+                      "manager: Dropping daily summary table from '%s' ..." % self.connection.database_name)
+        try:
+            _all_tables = self.connection.tables()
+            with weedb.Transaction(self.connection) as _cursor:
+                for _table_name in ['%s_daysummary' % self.table_name, '%s_daysummary__metadata' % self.table_name]:
+                    if _table_name in _all_tables:
+                        _cursor.execute("DROP TABLE %s" % _table_name)
+
+            del self.daykeys
+            self._clear_day_cache()
+            self._clear_query_cache()
+        except weedb.OperationalError, e:
+            syslog.syslog(syslog.LOG_ERR, 
+                          "manager: Operational error database '%s'; %s" % (self.connection.database_name, e))
+        else:
+            syslog.syslog(syslog.LOG_INFO,
+                          "manager: Dropped daily summary table from database '%s'" % (self.connection.database_name,))
+
 if __name__ == '__main__':
     import doctest
 
@@ -80,7 +80,8 @@ class StdReportEngine(threading.Thread):
     See below for examples of generators.
     """
 
-    def __init__(self, config_dict, stn_info, record=None, gen_ts=None, first_run=True):
+    def __init__(self, config_dict, stn_info, record=None, gen_ts=None, first_run=True,
+                 archive_writer=None):
         """Initializer for the report engine.
 
         config_dict: The configuration dictionary.
@@ -95,6 +96,10 @@ class StdReportEngine(threading.Thread):
 
         first_run: True if this is the first time the report engine has been
         run.  If this is the case, then any 'one time' events should be done.
+
+        archive_writer: If the archive is being written in the background, the
+        weewx.engine.ArchiveWriter doing it. The reports wait until it has
+        written everything it has been given. [Optional; default is None]
         """
         threading.Thread.__init__(self, name="ReportThread")
 
@@ -103,12 +108,17 @@ class StdReportEngine(threading.Thread):
         self.record = record
         self.gen_ts = gen_ts
         self.first_run = first_run
+        self.archive_writer = archive_writer
 
     def run(self):
         """This is where the actual work gets done.
 
         Runs through the list of reports. """
 
+        # Make sure the latest records are in the database:
+        if self.archive_writer is not None:
+            self.archive_writer.flush()
+
         if self.gen_ts:
             syslog.syslog(syslog.LOG_DEBUG,
                           "reportengine: Running reports for time %s" %
@@ -265,7 +275,10 @@ class ReportGenerator(object):
         self.gen_ts = gen_ts
         self.first_run = first_run
         self.stn_info = stn_info
-        self.db_binder = weewx.manager.DBBinder(self.config_dict)
+        # Borrow managers from the process-wide pool, so the databases do not
+        # get opened anew for every generator:
+        self.db_binder = weewx.manager.DBBinder(self.config_dict,
+                                                pool=weewx.manager.manager_pool)
 
     def start(self):
         self.run()
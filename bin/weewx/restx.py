@@ -111,6 +111,19 @@ class StdRESTful(weewx.engine.StdService):
     """Abstract base class for RESTful weewx services.
     
     Offers a few common bits of functionality."""
+    
+    def __init__(self, engine, config_dict):
+        super(StdRESTful, self).__init__(engine, config_dict)
+        # This is bound ahead of the handler of any specializing class:
+        self.bind(weewx.NEW_ARCHIVE_RECORD, self.write_pending)
+        
+    def write_pending(self, event):  # @UnusedVariable
+        """If the archive thread reads the database, have any archive records
+        that are being held back (for example, while catching up) written
+        before it gets the new record."""
+        _thread = getattr(self, 'archive_thread', None)
+        if _thread is not None and _thread.manager_dict is not None:
+            self.engine.db_binder.flush_pending()
         
     def shutDown(self):
         """Shut down any threads"""
@@ -232,7 +245,7 @@ class RESTThread(threading.Thread):
                 _result = dbmanager.getSql(
                     "SELECT SUM(rain), MIN(usUnits), MAX(usUnits) FROM %s "
                     "WHERE dateTime>? AND dateTime<=?" %
-                    dbmanager.table_name, (_time_ts - 3600.0, _time_ts))
+                    dbmanager.table_for_span(_time_ts - 3600, _time_ts), (_time_ts - 3600.0, _time_ts))
                 if _result is not None and _result[0] is not None:
                     if not _result[1] == _result[2] == record['usUnits']:
                         raise ValueError("Inconsistent units (%s vs %s vs %s) when querying for hourRain" %
@@ -246,7 +259,7 @@ class RESTThread(threading.Thread):
                 _result = dbmanager.getSql(
                     "SELECT SUM(rain), MIN(usUnits), MAX(usUnits) FROM %s "
                     "WHERE dateTime>? AND dateTime<=?" %
-                    dbmanager.table_name, (_time_ts - 24 * 3600.0, _time_ts))
+                    dbmanager.table_for_span(_time_ts - 24 * 3600, _time_ts), (_time_ts - 24 * 3600.0, _time_ts))
                 if _result is not None and _result[0] is not None:
                     if not _result[1] == _result[2] == record['usUnits']:
                         raise ValueError("Inconsistent units (%s vs %s vs %s) when querying for rain24" %
@@ -264,7 +277,7 @@ class RESTThread(threading.Thread):
                 _result = dbmanager.getSql(
                     "SELECT SUM(rain), MIN(usUnits), MAX(usUnits) FROM %s "
                     "WHERE dateTime>=? AND dateTime<=?" %
-                    dbmanager.table_name, (_sod_ts, _time_ts))
+                    dbmanager.table_for_span(_sod_ts, _time_ts), (_sod_ts, _time_ts))
                 if _result is not None and _result[0] is not None:
                     if not _result[1] == _result[2] == record['usUnits']:
                         raise ValueError("Inconsistent units (%s vs %s vs %s) when querying for dayRain" %
@@ -281,17 +294,10 @@ class RESTThread(threading.Thread):
         return _datadict
 
     def run(self):
-        """If there is a database specified, open the database, then call
-        run_loop() with the database.  If no database is specified, simply
-        call run_loop()."""
+        """Call run_loop(). If there is a database specified, a manager for
+        it is borrowed from the process-wide pool for each record."""
         
-        # Open up the archive. Use a 'with' statement. This will automatically
-        # close the archive in the case of an exception:
-        if self.manager_dict is not None:
-            with weewx.manager.open_manager(self.manager_dict) as _manager:
-                self.run_loop(_manager)
-        else:
-            self.run_loop()
+        self.run_loop()
 
     def run_loop(self, dbmanager=None):
         """Runs a continuous loop, waiting for records to appear in the queue,
@@ -316,7 +322,7 @@ class RESTThread(threading.Thread):
             try:
                 # Process the record, using whatever method the specializing
                 # class provides
-                self.process_record(_record, dbmanager)
+                self._process_record(_record, dbmanager)
             except AbortedPost:
                 if self.log_success:
                     _time_str = timestamp_to_string(_record['dateTime'])
@@ -352,6 +358,22 @@ class RESTThread(threading.Thread):
                                   "restx: %s: Published record %s" % 
                                   (self.protocol_name, _time_str))
 
+    def _process_record(self, record, dbmanager):
+        """Call process_record(). If no manager is given, but there is a
+        database specified, borrow a manager from the process-wide pool just
+        for this record. The pool brings a borrowed manager up to date, so
+        any new partitions or tiers are seen."""
+        if dbmanager is None and self.manager_dict is not None:
+            # Use a 'finally' clause, so the manager gets returned in the
+            # case of an exception:
+            _manager = weewx.manager.manager_pool.get_manager(self.manager_dict)
+            try:
+                self.process_record(record, _manager)
+            finally:
+                weewx.manager.manager_pool.put_manager(_manager)
+        else:
+            self.process_record(record, dbmanager)
+
     def process_record(self, record, dbmanager):
         """Default version of process_record.
         
@@ -1487,7 +1509,7 @@ class AWEKASThread(RESTThread):
         # Be prepare to catch it.
         try:
             rr = dbmanager.getSql('select rainRate from %s where dateTime=?' %
-                                  dbmanager.table_name, (r['dateTime'],))
+                                  dbmanager.table_for_span(r['dateTime'], r['dateTime']), (r['dateTime'],))
         except weedb.OperationalError:
             pass
         else:
@@ -0,0 +1,124 @@
+#
+#    Copyright (c) 2009-2015 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+
+"""Service that thins out the archive as it ages, by rolling up old records
+into coarser tiers. See weewx.manager.Manager.downsample()."""
+
+from __future__ import with_statement
+import syslog
+import thread
+import threading
+import time
+
+import weedb
+import weewx.engine
+import weewx.manager
+
+
+class StdRetention(weewx.engine.StdService):
+    """Rolls up the archive records older than a given age into records of a
+    coarser interval. It is not one of the standard services. To use it, add
+    it to archive_services, after weewx.engine.StdArchive. Sample
+    configuration:
+
+    [StdRetention]
+        data_binding = wx_binding
+        run_interval = 3600         # how often to look for old records, in seconds
+        [[15_minute]]
+            interval = 900          # in seconds
+            age = 90                # in days
+        [[hourly]]
+            interval = 3600
+            age = 365
+
+    The rolling up is done in a thread of its own, so the main loop does not
+    have to wait for it. The first time, there may be years of records to go
+    through."""
+
+    def __init__(self, engine, config_dict):
+        super(StdRetention, self).__init__(engine, config_dict)
+
+        svc_dict = config_dict['StdRetention']
+        self.data_binding = svc_dict.get('data_binding', 'wx_binding')
+        self.run_interval = int(svc_dict.get('run_interval', 3600))
+        # The tiers, as a list of (interval, age) tuples, youngest first. The
+        # age is in seconds.
+        tiers = sorted((int(float(svc_dict[tier]['age']) * 86400), int(svc_dict[tier]['interval']))
+                       for tier in svc_dict.sections)
+        self.tiers = [(interval, age) for (age, interval) in tiers]
+        self.thread = None
+        self.last_run = None
+
+        if not self.tiers:
+            syslog.syslog(syslog.LOG_INFO, "retention: No tiers specified. Nothing to be done.")
+            return
+        for i in range(1, len(self.tiers)):
+            if self.tiers[i][0] <= self.tiers[i - 1][0]:
+                syslog.syslog(syslog.LOG_ERR, "retention: Older tiers must have longer intervals. Service disabled.")
+                return
+
+        self.bind(weewx.NEW_ARCHIVE_RECORD, self.new_archive_record)
+
+    def new_archive_record(self, event):
+        """Launch a thread to roll up old records, if it is time to do so."""
+        if self.thread and self.thread.isAlive():
+            return
+        if self.last_run and event.record['dateTime'] - self.last_run < self.run_interval:
+            return
+        try:
+            self.thread = RetentionThread(self.config_dict, self.data_binding, self.tiers, event.record['dateTime'])
+            self.thread.start()
+            self.last_run = event.record['dateTime']
+        except thread.error:
+            syslog.syslog(syslog.LOG_ERR, "retention: Unable to launch retention thread.")
+            self.thread = None
+
+    def shutDown(self):
+        if self.thread:
+            syslog.syslog(syslog.LOG_INFO, "retention: Shutting down retention thread")
+            self.thread.stop_event.set()
+            self.thread.join(20.0)
+            if self.thread.isAlive():
+                syslog.syslog(syslog.LOG_ERR, "retention: Unable to shut down retention thread")
+            else:
+                syslog.syslog(syslog.LOG_DEBUG, "retention: Retention thread has been terminated")
+        self.thread = None
+
+
+class RetentionThread(threading.Thread):
+    """Rolls up the old records of each tier in turn, youngest first."""
+
+    def __init__(self, config_dict, data_binding, tiers, now_ts):
+        threading.Thread.__init__(self, name="RetentionThread")
+        self.config_dict = config_dict
+        self.data_binding = data_binding
+        self.tiers = tiers
+        self.now_ts = now_ts
+        # Set when the thread is to stop, at the end of the batch in progress:
+        self.stop_event = threading.Event()
+
+    def run(self):
+        t1 = time.time()
+        try:
+            with weewx.manager.open_manager_with_config(self.config_dict, self.data_binding) as dbmanager:
+                for (interval, age) in self.tiers:
+                    dbmanager.downsample(interval, self.now_ts - age, progress_fn=self.check_stop)
+        except StopRetention:
+            syslog.syslog(syslog.LOG_INFO, "retention: Stopped before all old records were rolled up")
+        except (weedb.DatabaseError, weewx.ViolatedPrecondition), e:
+            syslog.syslog(syslog.LOG_ERR, "retention: Unable to roll up old records: %s" % e)
+        else:
+            syslog.syslog(syslog.LOG_DEBUG, "retention: Done in %.2f seconds" % (time.time() - t1))
+
+    def check_stop(self, nrecs, last_ts):  # @UnusedVariable
+        """Called after each batch. Raises StopRetention if the thread has
+        been asked to stop."""
+        if self.stop_event.isSet():
+            raise StopRetention()
+
+
+class StopRetention(Exception):
+    """Raised to stop the retention thread between two batches."""
@@ -356,6 +356,9 @@ class CurrentObj(object):
         self.formatter    = formatter
         self.converter    = converter
         self.max_delta    = max_delta
+        # The current record. It gets fetched the first time it is needed.
+        self._record      = None
+        self._have_record = False
         
     def __getattr__(self, obs_type):
         """Return the given observation type."""
@@ -364,19 +367,25 @@ class CurrentObj(object):
             raise AttributeError
 
         try:
-            # Get the appropriate database manager ...
-            db_manager = self.db_lookup(self.data_binding)
+            # Get the current record ...
+            record = self._get_record()
         except weewx.UnknownBinding:
             vt = weewx.units.UnknownType(self.data_binding)
         else:
-            # ... get the current record from it ...  
-            record  = db_manager.getRecord(self.current_time, max_delta=self.max_delta)
             # ... form a ValueTuple ...
             vt = weewx.units.as_value_tuple(record, obs_type)
         # ... and then finally, return a ValueHelper
         return weewx.units.ValueHelper(vt, 'current',
                                        self.formatter,
                                        self.converter)
+    
+    def _get_record(self):
+        """Return the current record, getting it from the database the first time."""
+        if not self._have_record:
+            db_manager = self.db_lookup(self.data_binding)
+            self._record = db_manager.getRecord(self.current_time, max_delta=self.max_delta)
+            self._have_record = True
+        return self._record
         
 #===============================================================================
 #                             Class TrendObj
@@ -412,6 +421,9 @@ class TrendObj(object):
                                                   'current',
                                                   self.formatter,
                                                   self.converter)
+        # The records for now and "time_delta" ago. They get fetched the first
+        # time they are needed.
+        self._records = None
         
     def __getattr__(self, obs_type):
         """Return the trend for the given observation type."""
@@ -419,10 +431,8 @@ class TrendObj(object):
         if obs_type in ['__call__', 'has_key']:
             raise AttributeError
 
-        db_manager  = self.db_lookup(self.data_binding)
         # Get the current record, and one "time_delta" ago:        
-        now_record  = db_manager.getRecord(self.nowtime, self.time_grace_val)
-        then_record = db_manager.getRecord(self.nowtime - self.time_delta_val, self.time_grace_val)
+        (now_record, then_record) = self._get_records()
 
         # Do both records exist?
         if now_record is None or then_record is None:
@@ -455,3 +465,13 @@ class TrendObj(object):
         return weewx.units.ValueHelper(trend, 'current',
                                        self.formatter,
                                        self.converter)
+
+    def _get_records(self):
+        """Return the records for now and "time_delta" ago, getting them from
+        the database the first time. The whole records are read, so they
+        serve every type asked for."""
+        if self._records is None:
+            db_manager  = self.db_lookup(self.data_binding)
+            self._records = (db_manager.getRecord(self.nowtime, self.time_grace_val),
+                             db_manager.getRecord(self.nowtime - self.time_delta_val, self.time_grace_val))
+        return self._records
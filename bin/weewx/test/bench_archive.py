@@ -0,0 +1,53 @@
+#
+#    Copyright (c) 2009-2015 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Create the multi-year sqlite archives used by the benchmarks.
+
+The archives have 5 minute records, starting at start_ts. They are kept
+between runs, and only made again if the number of years changes."""
+
+from __future__ import with_statement
+import os
+import time
+
+import weedb
+import weewx.manager
+
+start_ts = int(time.mktime((2010, 1, 1, 0, 0, 0, 0, 0, -1)))
+interval = 300
+
+def create_archive(db_dict, schema, years, insert_sql, gen_values):
+    """Create an archive, unless one with the right number of records is
+    already there.
+
+    db_dict: The database dictionary of the archive.
+
+    schema: The schema of the archive.
+
+    years: How many years of records to put in it.
+
+    insert_sql: The INSERT statement that adds a record.
+
+    gen_values: A function that is given the number of a record, counting
+    from 1, and returns the values for insert_sql.
+
+    returns: The number of records in the archive."""
+    nrecs = int(years * 365.25 * 24 * 3600 / interval)
+    if not os.path.exists(db_dict['SQLITE_ROOT']):
+        os.makedirs(db_dict['SQLITE_ROOT'])
+    try:
+        with weewx.manager.Manager.open(db_dict) as archive:
+            if archive.getSql("SELECT COUNT(*) FROM archive")[0] == nrecs:
+                return nrecs
+    except weedb.OperationalError:
+        pass
+    try:
+        weedb.drop(db_dict)
+    except weedb.NoDatabase:
+        pass
+    with weewx.manager.Manager.open_with_create(db_dict, schema=schema) as archive:
+        with weedb.Transaction(archive.connection) as cursor:
+            cursor.executemany(insert_sql, (gen_values(i) for i in xrange(1, nrecs + 1)))
+    return nrecs
@@ -0,0 +1,66 @@
+#
+#    Copyright (c) 2009-2015 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Benchmark for finding the archive record nearest a given time.
+
+Compares Manager.getNearestStamp(), which does two seeks on the dateTime
+index, against the old query, which sorted the candidate records on their
+distance to the time. The archive is a multi-year sqlite database, with
+5 minute records.
+
+Usage: python bench_nearest.py [years [max_delta]]"""
+
+from __future__ import with_statement
+import random
+import sys
+import time
+
+import weewx.manager
+from bench_archive import create_archive, start_ts, interval
+
+archive_schema = [('dateTime', 'INTEGER NOT NULL UNIQUE PRIMARY KEY'),
+                  ('usUnits',  'INTEGER NOT NULL'),
+                  ('interval', 'INTEGER NOT NULL'),
+                  ('outTemp',  'REAL')]
+
+archive_db_dict = {'database_name': 'bench_nearest.sdb', 'driver': 'weedb.sqlite',
+                   'SQLITE_ROOT': '/var/tmp/weewx_test'}
+
+nlookups = 2000
+
+def old_nearest(archive, timestamp, max_delta):
+    """The query Manager.getRecord() used to use."""
+    return archive.getSql("SELECT dateTime FROM archive WHERE dateTime>=? AND dateTime<=? "
+                          "ORDER BY ABS(dateTime-?) ASC LIMIT 1",
+                          (timestamp - max_delta, timestamp + max_delta, timestamp))
+
+def run(fn, archive, stamps, max_delta):
+    t0 = time.time()
+    for ts in stamps:
+        fn(archive, ts, max_delta)
+    return time.time() - t0
+
+def main(years=5, max_delta=3600):
+    nrecs = create_archive(archive_db_dict, archive_schema, years, "INSERT INTO archive VALUES (?, 1, 5, ?)",
+                           lambda i: (start_ts + i * interval, float(i % 100)))
+    print "Archive with %d records over %s years. max_delta is %d seconds." % (nrecs, years, max_delta)
+
+    random.seed(42)
+    stamps = [start_ts + random.randint(0, nrecs * interval) for _ in xrange(nlookups)]
+    with weewx.manager.Manager.open(archive_db_dict) as archive:
+        # The two should agree (except, possibly, on ties):
+        for ts in stamps[:100]:
+            _old = old_nearest(archive, ts, max_delta)
+            _new = archive.getNearestStamp(ts, max_delta)
+            assert abs(_old[0] - ts) == abs(_new - ts)
+
+        t_old = run(old_nearest, archive, stamps, max_delta)
+        t_new = run(weewx.manager.Manager.getNearestStamp, archive, stamps, max_delta)
+
+    print "Sort on distance:  %8.1f microseconds per lookup" % (t_old / nlookups * 1.0e6)
+    print "Two index seeks:   %8.1f microseconds per lookup" % (t_new / nlookups * 1.0e6)
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,79 @@
+#
+#    Copyright (c) 2009-2015 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Benchmark for the records returned by Manager.genBatchRecords().
+
+Compares dictionaries, the default, against compact records (option
+compact=True). The archive is a multi-year sqlite database, with 5 minute
+records and the standard wview schema. Each kind of record is timed going
+through the whole archive, the way a backfill or a transfer does. Then all
+the records are kept in a list, to show what they cost in memory. Each run is
+done in a process of its own, so the peak resident set sizes do not mix.
+
+Usage: python bench_records.py [years]"""
+
+from __future__ import with_statement
+import multiprocessing
+import resource
+import sys
+import time
+
+import weewx.manager
+import schemas.wview
+from bench_archive import create_archive, start_ts, interval
+
+archive_db_dict = {'database_name': 'bench_records.sdb', 'driver': 'weedb.sqlite',
+                   'SQLITE_ROOT': '/var/tmp/weewx_test'}
+
+insert_sql = "INSERT INTO archive (dateTime, usUnits, `interval`, barometer, inTemp, outTemp, " \
+    "outHumidity, windSpeed, windDir, windGust, rain) VALUES (?, 1, 5, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+def gen_values(i):
+    """The values of the i'th record."""
+    return (start_ts + i * interval, 30.0 + 0.001 * (i % 100), 70.0, float(i % 100),
+            float(i % 90), float(i % 20), float(i % 360), float(i % 30), 0.0)
+
+def max_rss():
+    """Peak resident set size of this process, in megabytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def bench(compact, queue):
+    """Run in a child process. Puts the results on the queue."""
+    with weewx.manager.Manager.open(archive_db_dict) as archive:
+        rss0 = max_rss()
+        # Go through the records, using a few of the values in each:
+        t0 = time.time()
+        n = 0
+        total = 0.0
+        for rec in archive.genBatchRecords(compact=compact):
+            total += rec['outTemp'] + rec['windSpeed']
+            n += 1
+        t_stream = time.time() - t0
+        # Now keep them all:
+        t0 = time.time()
+        recs = list(archive.genBatchRecords(compact=compact))
+        t_list = time.time() - t0
+        queue.put((n, t_stream, t_list, max_rss() - rss0, len(recs)))
+
+def run(compact):
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=bench, args=(compact, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def main(years=2):
+    nrecs = create_archive(archive_db_dict, schemas.wview.schema, years, insert_sql, gen_values)
+    print "Archive with %d records over %s years, %d columns each." % (nrecs, years, len(schemas.wview.schema))
+
+    for (label, compact) in (("Dictionaries:   ", False), ("Compact records:", True)):
+        (n, t_stream, t_list, rss, nlist) = run(compact)
+        assert n == nlist == nrecs
+        print "%s %8.0f records per second; %8.0f into a list; peak RSS up %6.1f MB" % \
+            (label, n / t_stream, n / t_list, rss)
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -19,6 +19,7 @@ import configobj
 
 os.environ['TZ'] = 'America/Los_Angeles'
 
+import weedb
 import weeutil.weeutil
 import weewx.tags
 import gen_fake_data
@@ -279,6 +280,78 @@ class Common(unittest.TestCase):
                     self.assertEqual(str(table_answer), str(daily_answer), 
                                      msg="aggregation=%s; %s vs %s" % (aggregation, table_answer, daily_answer))
             
+    def test_agg_hybrid(self):
+        """Test aggregation over spans that include whole days, but do not start and stop on midnight"""
+        
+        # Note that this spans the spring DST boundary:
+        span = weeutil.weeutil.TimeSpan(time.mktime((2010,3,10,6,30,0,0,0,-1)),
+                                        time.mktime((2010,3,17,18,10,0,0,0,-1)))
+        
+        with weewx.manager.open_manager_with_config(self.config_dict, 'wx_binding') as manager:
+            self.assertEqual(manager._get_interior_span(span, 'outTemp', 'avg'),
+                             weeutil.weeutil.TimeSpan(time.mktime((2010,3,11,0,0,0,0,0,-1)),
+                                                      time.mktime((2010,3,17,0,0,0,0,0,-1))))
+            for obs_type in ['outTemp', 'rain']:
+                for aggregation in ['min', 'max', 'sum', 'count', 'avg']:
+                    # Get the answer using the raw archive table:
+                    table_answer = weewx.manager.Manager.getAggregate(manager, span, obs_type, aggregation)
+                    hybrid_answer = manager.getAggregate(span, obs_type, aggregation)
+                    self.assertAlmostEqual(table_answer[0], hybrid_answer[0], 6,
+                                           msg="%s %s: %s vs %s" % (obs_type, aggregation, table_answer, hybrid_answer))
+            
+            # Check the wind vector aggregates against the statistics accumulated over the whole span:
+            wind_stats = manager._get_partial_stats(span, 'wind')
+            self.assertAlmostEqual(manager.getAggregate(span, 'wind', 'rms')[0], wind_stats.rms, 6)
+            # The daily summaries normalize vecavg by the time with a valid direction:
+            self.assertAlmostEqual(manager.getAggregate(span, 'wind', 'vecavg')[0],
+                                   math.sqrt(wind_stats.xsum**2 + wind_stats.ysum**2) / wind_stats.dirsumtime, 6)
+            self.assertAlmostEqual(manager.getAggregate(span, 'wind', 'max')[0], wind_stats.max, 6)
+
+    def test_rollups(self):
+        """Test the monthly and yearly rollups of the daily summaries"""
+        
+        with weewx.manager.open_manager_with_config(self.config_dict, 'wx_binding') as manager:
+            # The rollups were kept up to date by the backfill:
+            self.assertEqual(sorted(manager.rollup_keys), sorted(day_keys))
+            self.assertEqual(manager.rollups_through, weeutil.weeutil.startOfArchiveDay(gen_fake_data.stop_ts))
+            
+            # The whole months come from the monthly rollups:
+            sep_1_ts = time.mktime((2010,9,1,0,0,0,0,0,-1))
+            self.assertEqual(manager._plan_rollups(gen_fake_data.start_ts, gen_fake_data.stop_ts, 2),
+                             [('month', gen_fake_data.start_ts, sep_1_ts), ('day', sep_1_ts, gen_fake_data.stop_ts)])
+            
+            spans = [weeutil.weeutil.TimeSpan(gen_fake_data.start_ts, gen_fake_data.stop_ts),
+                     weeutil.weeutil.TimeSpan(time.mktime((2010,1,1,0,0,0,0,0,-1)), time.mktime((2011,1,1,0,0,0,0,0,-1))),
+                     weeutil.weeutil.TimeSpan(time.mktime((2010,2,10,0,0,0,0,0,-1)), time.mktime((2010,6,20,0,0,0,0,0,-1))),
+                     weeutil.weeutil.TimeSpan(time.mktime((2010,2,10,5,0,0,0,0,-1)), time.mktime((2010,6,20,5,0,0,0,0,-1)))]
+            
+            def get_answers():
+                answers = []
+                for span in spans:
+                    for (obs_type, aggregations) in [('outTemp', ['min', 'max', 'sum', 'count', 'avg']),
+                                                     ('rain',    ['sum', 'count']),
+                                                     ('wind',    ['max', 'rms', 'vecavg'])]:
+                        for aggregation in aggregations:
+                            answers.append(manager.getAggregate(span, obs_type, aggregation)[0])
+                return answers
+            
+            rollup_answers = get_answers()
+            # Now get the answers from the daily summaries alone:
+            manager.rollup_keys = []
+            manager._clear_query_cache()
+            daily_answers = get_answers()
+            for (rollup_answer, daily_answer) in zip(rollup_answers, daily_answers):
+                self.assertAlmostEqual(rollup_answer, daily_answer, 6)
+            
+            # Rebuild the rollups. They should be the same as the ones kept up to date.
+            month_rows = list(manager.genSql("SELECT * FROM archive_month_outTemp ORDER BY dateTime"))
+            year_rows = list(manager.genSql("SELECT * FROM archive_year_wind ORDER BY dateTime"))
+            # The first record, at midnight, belongs to December 2009, so 9 months in all:
+            self.assertEqual(manager.rebuild_rollups(), 9)
+            self.assertEqual(list(manager.genSql("SELECT * FROM archive_month_outTemp ORDER BY dateTime")), month_rows)
+            self.assertEqual(list(manager.genSql("SELECT * FROM archive_year_wind ORDER BY dateTime")), year_rows)
+            self.assertEqual(get_answers(), rollup_answers)
+
     def test_rainYear(self):
         db_binder = weewx.manager.DBBinder(self.config_dict)
         db_lookup = db_binder.bind_default()
@@ -309,6 +382,71 @@ class Common(unittest.TestCase):
         self.assertEqual(str(tagStats.year().cooldeg.sum), "1026.2°F-day")
     
 
+    def test_wide_summary(self):
+        """Test migrating to the wide daily summary, then compare it against the usual layout"""
+        
+        # Use a separate database, holding the first month of the fake data:
+        wide_dict = configobj.ConfigObj(self.config_dict.dict())
+        wide_db = 'wide_' + self.database_type
+        wide_dict['Databases'][wide_db] = dict(wide_dict['Databases'][wide_dict['DataBindings']['wx_binding']['database']])
+        wide_dict['Databases'][wide_db]['database_name'] = 'test_wide.sdb' if self.database_type == 'sqlite' else 'test_wide_weewx'
+        wide_dict['DataBindings']['wx_binding']['database'] = wide_db
+        try:
+            weewx.manager.drop_database_with_config(wide_dict, 'wx_binding')
+        except weedb.DatabaseError:
+            pass
+        month_stop_ts = int(time.mktime((2010,2,1,0,0,0,0,0,-1)))
+        gen_fake_data.configDatabase(wide_dict, 'wx_binding', stop_ts=month_stop_ts)
+        
+        # Switch to the wide manager, then migrate:
+        wide_dict['DataBindings']['wx_binding']['manager'] = 'weewx.wxmanager.WXWideDaySummaryManager'
+        with weewx.manager.open_manager_with_config(wide_dict, 'wx_binding', initialize=True) as wide_manager:
+            self.assertEqual(sorted(wide_manager.daykeys), sorted(day_keys))
+            # The first record, at midnight, belongs to 31 December, so 32 days in all:
+            self.assertEqual(wide_manager.migrate_day_tables(), 32)
+            self.assertFalse([x for x in wide_manager.connection.tables() if x.startswith('archive_day_')])
+            self.assertEqual(wide_manager._getLastUpdate(), month_stop_ts)
+            
+        month_span = weeutil.weeutil.TimeSpan(gen_fake_data.start_ts, month_stop_ts)
+        spans = [month_span] + list(weeutil.weeutil.genDaySpans(month_span.start, month_span.stop))[:7]
+        # A span that does not start or stop on midnight:
+        hybrid_span = weeutil.weeutil.TimeSpan(month_span.start + 5 * 3600, month_span.stop - 3 * 86400 - 3600)
+        
+        def compare(wide_manager):
+            with weewx.manager.open_manager_with_config(self.config_dict, 'wx_binding') as manager:
+                for span in spans:
+                    for (obs_type, aggregations) in [('outTemp', ['min', 'max', 'mintime', 'maxtime', 'avg', 'count', 'meanmax']),
+                                                     ('rain',    ['sum', 'maxsum', 'count']),
+                                                     ('wind',    ['max', 'maxtime', 'gustdir', 'rms', 'vecavg', 'vecdir'])]:
+                        for aggregation in aggregations:
+                            expected = manager.getAggregate(span, obs_type, aggregation)
+                            answer = wide_manager.getAggregate(span, obs_type, aggregation)
+                            self.assertAlmostEqual(answer[0], expected[0], 
+                                                   msg="%s %s; %s vs %s" % (obs_type, aggregation, answer, expected))
+                for (obs_type, aggregation) in [('outTemp', 'min'), ('outTemp', 'avg'), ('rain', 'sum'), 
+                                                ('wind', 'count'), ('wind', 'rms'), ('wind', 'vecavg')]:
+                    self.assertAlmostEqual(wide_manager.getAggregate(hybrid_span, obs_type, aggregation)[0],
+                                           manager.getAggregate(hybrid_span, obs_type, aggregation)[0])
+                self.assertEqual(wide_manager.getAggregate(month_span, 'outTemp', 'max_ge', val=(40.0, 'degree_F', 'group_temperature')),
+                                 manager.getAggregate(month_span, 'outTemp', 'max_ge', val=(40.0, 'degree_F', 'group_temperature')))
+                self.assertAlmostEqual(wide_manager.getAggregate(month_span, 'heatdeg', 'sum', skin_dict=skin_dict)[0],
+                                       manager.getAggregate(month_span, 'heatdeg', 'sum', skin_dict=skin_dict)[0])
+
+        with weewx.manager.open_manager_with_config(wide_dict, 'wx_binding') as wide_manager:
+            compare(wide_manager)
+            
+            # Now rebuild the summary from the archive table, and check again:
+            wide_manager.drop_daily()
+        with weewx.manager.open_manager_with_config(wide_dict, 'wx_binding', initialize=True) as wide_manager:
+            wide_manager.backfill_day_summary()
+            compare(wide_manager)
+            
+            # Adding a record should update the summary for its day:
+            last_day_ts = weeutil.weeutil.startOfArchiveDay(month_stop_ts + 600)
+            record = dict(wide_manager.getRecord(month_stop_ts), dateTime=month_stop_ts + 600, outTemp=-100.0)
+            wide_manager.addRecord(record)
+            self.assertEqual(wide_manager._get_day_summary(last_day_ts)['outTemp'].min, -100.0)
+
 class TestSqlite(Common):
 
     def __init__(self, *args, **kwargs):
@@ -324,7 +462,8 @@ class TestMySQL(Common):
     
 def suite():
     tests = ['test_create_stats', 'testScalarTally', 'testWindTally', 
-             'testTags', 'test_rainYear', 'test_agg_intervals', 'test_agg', 'test_heatcool']
+             'testTags', 'test_rainYear', 'test_agg_intervals', 'test_agg', 'test_agg_hybrid', 'test_rollups', 'test_heatcool',
+             'test_wide_summary']
     
     # Test both sqlite and MySQL:
     return unittest.TestSuite(map(TestSqlite, tests) + map(TestMySQL, tests))
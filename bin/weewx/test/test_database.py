@@ -6,10 +6,16 @@
 #
 """Test archive and stats database modules"""
 from __future__ import with_statement
+import array
+import shutil
 import unittest
+import threading
 import time
 
+import weewx.accum
 import weewx.manager
+import weewx.tags
+import weewx.units
 import weedb
 import weeutil.weeutil
 
@@ -132,6 +138,711 @@ class Common(unittest.TestCase):
             metric_record = {'dateTime': stop_ts + interval, 'interval': interval, 'usUnits' : 16, 'outTemp': 20.0}
             self.assertRaises(weewx.UnitError, archive.addRecord, metric_record)
 
+    def test_add_archive_records_bulk(self):
+        # Add the records in bulk, using a chunk size that does not evenly divide them:
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords(), chunk_size=10)
+            self.assertEqual(archive.first_timestamp, start_ts)
+            self.assertEqual(archive.last_timestamp, stop_ts)
+
+        with weewx.manager.Manager.open(self.archive_db_dict) as archive:
+            self.assertEqual(archive.firstGoodStamp(), start_ts)
+            self.assertEqual(archive.lastGoodStamp(), stop_ts)
+            for (_rec, _expected_rec) in zip(archive.genBatchRecords(), genRecords()):
+                self.assertEqual(_rec.pop('windSpeed'), None)
+                self.assertEqual(_expected_rec, _rec)
+
+            # Records that already exist, or that are repeated within a chunk,
+            # should be quietly skipped. New records, with a different set of
+            # keys, should still get in:
+            new_records = [{'dateTime': start_ts, 'interval': interval, 'usUnits' : 1, 'outTemp': 0.0},
+                           {'dateTime': stop_ts + interval, 'interval': interval, 'usUnits' : 1, 'outTemp': 1.0},
+                           {'dateTime': stop_ts + interval, 'interval': interval, 'usUnits' : 1, 'outTemp': 2.0},
+                           {'dateTime': stop_ts + 2*interval, 'interval': interval, 'usUnits' : 1, 'windSpeed': 3.0}]
+            archive.addRecord(new_records, chunk_size=10)
+            self.assertEqual(archive.getRecord(start_ts)['outTemp'], temperfunc(0))
+            self.assertEqual(archive.getRecord(stop_ts + interval)['outTemp'], 1.0)
+            self.assertEqual(archive.getRecord(stop_ts + 2*interval)['windSpeed'], 3.0)
+            self.assertEqual(archive.last_timestamp, stop_ts + 2*interval)
+
+            # Test changing the unit system. It should raise a UnitError exception:
+            metric_record = {'dateTime': stop_ts + 3*interval, 'interval': interval, 'usUnits' : 16, 'outTemp': 20.0}
+            self.assertRaises(weewx.UnitError, archive.addRecord, [metric_record], chunk_size=10)
+
+    def test_add_bulk_bad_record(self):
+        # A bad record in the middle of a group. The others must get into the
+        # archive and the daily summaries, once each:
+        records = [expected_record(irec) for irec in range(5)]
+        records[3]['interval'] = None
+        with weewx.manager.DaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(records, chunk_size=10)
+            self.assertEqual(archive.getSql("SELECT COUNT(*) FROM archive")[0], 4)
+            self.assertEqual(archive.last_timestamp, timefunc(4))
+            self.assertEqual(archive.getSql("SELECT SUM(count) FROM archive_day_outTemp")[0], 4)
+
+    def test_day_summary_cache(self):
+        with weewx.manager.DaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            for _rec in genRecords():
+                archive.addRecord(_rec)
+                # The cached day should always be the day of the last record:
+                self.assertEqual(archive._day_cache.timespan.start,
+                                 weeutil.weeutil.startOfArchiveDay(_rec['dateTime']))
+            _cached = archive._day_cache
+
+        # The cached day should agree with what is in the database
+        with weewx.manager.DaySummaryManager.open(self.archive_db_dict) as archive:
+            _day_summary = archive._get_day_summary(_cached.timespan.start)
+            for _obs_type in archive.daykeys:
+                self.assertEqual(_day_summary[_obs_type].getStatsTuple(),
+                                 _cached[_obs_type].getStatsTuple())
+            # Types without any data must still have a row for every day:
+            for _span in weeutil.weeutil.genDaySpans(start_ts, stop_ts):
+                self.assertEqual(archive.getAggregate(_span, 'windSpeed', 'count')[0], 0)
+            
+            # Only types that have changed should be written. Give the cached
+            # day a change the database does not know about, then add a record
+            # that does not touch it:
+            archive.addRecord(expected_record(nrecs))
+            archive._day_cache['windSpeed'].max = 99.0
+            archive.addRecord({'dateTime': timefunc(nrecs+1), 'interval': interval, 'usUnits' : 1, 'outTemp': 0.0})
+            _day_summary = archive._get_day_summary(archive._day_cache.timespan.start)
+            self.assertEqual(_day_summary['windSpeed'].max, None)
+            self.assertEqual(_day_summary['outTemp'].min, 0.0)
+            
+            # A failed transaction should discard the cached day:
+            metric_record = {'dateTime': timefunc(nrecs+2), 'interval': interval, 'usUnits' : 16, 'outTemp': 20.0}
+            self.assertRaises(weewx.UnitError, archive.addRecord, metric_record)
+            self.assertEqual(archive._day_cache, None)
+
+    def test_add_with_hilo(self):
+        def loop_accum(irec, outTemp):
+            # An accumulator of LOOP data, with a high not seen by the record
+            _accum = weewx.accum.Accum(weeutil.weeutil.TimeSpan(timefunc(irec) - interval, timefunc(irec)))
+            _accum.addRecord({'dateTime': timefunc(irec) - 60, 'usUnits': 1, 'outTemp': outTemp})
+            return _accum
+
+        with weewx.manager.DaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            for _rec in genRecords():
+                archive.addRecord(_rec, accumulator=loop_accum(nrecs-1, 100.0))
+            self.assertEqual(archive.getSql("SELECT COUNT(*) FROM archive")[0], nrecs)
+            # If the record is already in the database, the hi/lows are still saved:
+            archive.addRecord(expected_record(nrecs-1), accumulator=loop_accum(nrecs-1, 101.0))
+            # Records and hi/lows for different days:
+            archive.addRecord(expected_record(nrecs+1), accumulator=loop_accum(nrecs-1, 102.0))
+
+        with weewx.manager.DaySummaryManager.open(self.archive_db_dict) as archive:
+            _sod_ts = weeutil.weeutil.startOfArchiveDay(timefunc(nrecs-1))
+            _day_summary = archive._get_day_summary(_sod_ts)
+            self.assertEqual(_day_summary['outTemp'].max, 102.0)
+            self.assertEqual(_day_summary['outTemp'].count, len([ts for ts in timevec if _sod_ts < ts]))
+            _day_summary = archive._get_day_summary(weeutil.weeutil.startOfArchiveDay(timefunc(nrecs+1)))
+            self.assertEqual(_day_summary['outTemp'].max, temperfunc(nrecs+1))
+
+    def test_add_obs_type(self):
+        _sod_list = sorted(set(weeutil.weeutil.startOfArchiveDay(ts) for ts in timevec))
+        with weewx.manager.DaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            _days = [archive._get_day_summary(_sod_ts) for _sod_ts in _sod_list]
+            # Lose the daily summary of inTemp:
+            archive.connection.execute("DROP TABLE archive_day_inTemp")
+
+        with weewx.manager.DaySummaryManager.open(self.archive_db_dict) as archive:
+            self.assertFalse('inTemp' in archive.daykeys)
+            # The type is already in the archive, so only the daily summary
+            # gets added. It should be the same as before:
+            self.assertEqual(archive.add_obs_type('inTemp', progress_fn=None), (nrecs, len(_sod_list)))
+            for _day in _days:
+                self.assertEqual(archive._get_day_summary(_day.timespan.start)['inTemp'].getStatsTuple(),
+                                 _day['inTemp'].getStatsTuple())
+            # A new type gets a column, and an empty summary for every day: 
+            archive.add_obs_type('dewpoint', progress_fn=None)
+            self.assertRaises(weewx.ViolatedPrecondition, archive.add_obs_type, 'dewpoint')
+            self.assertTrue('dewpoint' in archive.sqlkeys)
+            self.assertEqual(archive.getAggregate(weeutil.weeutil.TimeSpan(start_ts, stop_ts), 'dewpoint', 'count')[0], 0)
+            # New records can use it:
+            archive.addRecord({'dateTime': timefunc(nrecs), 'interval': interval, 'usUnits' : 1, 'dewpoint': 50.0})
+            self.assertEqual(archive.getRecord(timefunc(nrecs))['dewpoint'], 50.0)
+            _sod_ts = weeutil.weeutil.startOfArchiveDay(timefunc(nrecs))
+            self.assertEqual(archive._get_day_summary(_sod_ts)['dewpoint'].max, 50.0)
+
+        # The same, using a single table for the daily summaries:
+        weedb.drop(self.archive_db_dict)
+        with weewx.manager.WideDaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            archive.add_obs_type('heatindex', progress_fn=None)
+            self.assertTrue('heatindex' in archive.daykeys)
+            _span = weeutil.weeutil.TimeSpan(_sod_list[0], _sod_list[-1] + 24*3600)
+            self.assertEqual(archive.getAggregate(_span, 'heatindex', 'count')[0], 0)
+            # The other types are left alone:
+            self.assertEqual(archive.getAggregate(_span, 'outTemp', 'count')[0], nrecs)
+
+    def test_rebuild_day_summary(self):
+        _sod_list = sorted(set(weeutil.weeutil.startOfArchiveDay(ts) for ts in timevec))
+        with weewx.manager.DaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            _days = [archive._get_day_summary(_sod_ts) for _sod_ts in _sod_list]
+            # Fix a value in the archive, then rebuild just the day it is in:
+            archive.updateValue(timefunc(10), 'outTemp', 200.0)
+            archive.updateValue(timefunc(10), 'inTemp', 200.0)
+            self.assertEqual(archive.rebuild_day_summary('outTemp', timefunc(10), timefunc(10), progress_fn=None),
+                             (len([ts for ts in timevec if weeutil.weeutil.startOfArchiveDay(ts) == _sod_list[1]]), 1))
+            _day = archive._get_day_summary(_sod_list[1])
+            self.assertEqual((_day['outTemp'].max, _day['outTemp'].maxtime), (200.0, timefunc(10)))
+            # Other types and other days are left alone:
+            self.assertEqual(_day['inTemp'].getStatsTuple(), _days[1]['inTemp'].getStatsTuple())
+            for i in (0, 2):
+                self.assertEqual(archive._get_day_summary(_sod_list[i])['outTemp'].getStatsTuple(), 
+                                 _days[i]['outTemp'].getStatsTuple())
+            # A day with no records left gets empty statistics:
+            archive.connection.execute("DELETE FROM archive WHERE dateTime > ?", (_sod_list[2],))
+            archive.rebuild_day_summary(['outTemp', 'inTemp'], progress_fn=None)
+            self.assertEqual(archive._get_day_summary(_sod_list[2])['outTemp'].count, 0)
+            self.assertEqual(archive._get_day_summary(_sod_list[1])['inTemp'].max, 200.0)
+            self.assertRaises(weewx.ViolatedPrecondition, archive.rebuild_day_summary, 'fooTemp')
+
+    def test_aggregate_cache(self):
+        with weewx.manager.DaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            span = weeutil.weeutil.TimeSpan(start_ts, start_ts + 3 * 24 * 3600)
+            self.assertEqual(archive.getAggregate(span, 'outTemp', 'max')[0], temperfunc(nrecs-1))
+            self.assertEqual((archive.aggregate_hits, archive.aggregate_misses), (0, 1))
+            # The second time around, the answer should come from the cache:
+            self.assertEqual(archive.getAggregate(span, 'outTemp', 'max')[0], temperfunc(nrecs-1))
+            self.assertEqual((archive.aggregate_hits, archive.aggregate_misses), (1, 1))
+            # A different aggregation, or a different value of 'val', has to go to the database:
+            archive.getAggregate(span, 'outTemp', 'min')
+            archive.getAggregate(span, 'outTemp', 'max_ge', val=(70.0, 'degree_F', 'group_temperature'))
+            archive.getAggregate(span, 'outTemp', 'max_ge', val=(75.0, 'degree_F', 'group_temperature'))
+            self.assertEqual((archive.aggregate_hits, archive.aggregate_misses), (1, 4))
+            # So does the version of my superclass:
+            self.assertEqual(weewx.manager.Manager.getAggregate(archive, span, 'outTemp', 'max')[0], temperfunc(nrecs-1))
+            self.assertEqual((archive.aggregate_hits, archive.aggregate_misses), (1, 5))
+            
+            # Adding a record should invalidate the cache:
+            archive.addRecord({'dateTime': timefunc(nrecs), 'interval': interval, 'usUnits' : 1, 'outTemp': 100.0})
+            self.assertEqual(archive.getAggregate(span, 'outTemp', 'max')[0], 100.0)
+            self.assertEqual((archive.aggregate_hits, archive.aggregate_misses), (1, 6))
+
+    def test_record_cache(self):
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            ts = timefunc(5)
+            record = archive.getRecord(ts)
+            self.assertEqual(record['outTemp'], temperfunc(5))
+            # Changing the returned record should not change the cached copy:
+            record['outTemp'] = None
+            self.assertEqual(archive.getRecord(ts)['outTemp'], temperfunc(5))
+            # Nor should a lookup with a different max_delta get the same answer:
+            self.assertEqual(archive.getRecord(ts + 10, max_delta=60)['dateTime'], ts)
+            self.assertEqual(archive.getRecord(ts + 10), None)
+            
+            # Updating a value should invalidate the cache:
+            archive.updateValue(ts, 'outTemp', 100.0)
+            self.assertEqual(archive.getRecord(ts)['outTemp'], 100.0)
+            # So should adding a record:
+            self.assertEqual(archive.getRecord(timefunc(nrecs)), None)
+            archive.addRecord({'dateTime': timefunc(nrecs), 'interval': interval, 'usUnits' : 1, 'outTemp': 100.0})
+            self.assertEqual(archive.getRecord(timefunc(nrecs))['outTemp'], 100.0)
+
+    def test_trend_reads(self):
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            # Count the records read from the database:
+            _reads = []
+            _getRecord = archive._getRecord
+            archive._getRecord = lambda *args: _reads.append(args) or _getRecord(*args)
+            trend = weewx.tags.TrendObj(3 * interval, 300, lambda binding: archive, 'wx_binding', stop_ts,
+                                        weewx.units.Formatter(), weewx.units.Converter())
+            self.assertAlmostEqual(trend.outTemp.raw, temperfunc(nrecs - 1) - temperfunc(nrecs - 4), 6)
+            self.assertAlmostEqual(trend.barometer.raw, barfunc(nrecs - 1) - barfunc(nrecs - 4), 6)
+            self.assertEqual(trend.windSpeed.raw, None)
+            self.assertAlmostEqual(trend.inTemp.raw, 0.3, 6)
+            # Now and "time_delta" ago, once each, for all the types:
+            self.assertEqual(len(_reads), 2)
+
+    def test_live_keys(self):
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            # Column windSpeed has never held any data:
+            self.assertEqual(archive.getLiveKeys(), ['dateTime', 'usUnits', 'interval', 'barometer', 'inTemp', 'outTemp'])
+            # Only the requested columns are read. Unknown columns are ignored:
+            self.assertEqual(archive.getRecord(timefunc(5), columns=['outTemp', 'fooTemp']),
+                             {'dateTime': timefunc(5), 'usUnits': 1, 'outTemp': temperfunc(5)})
+            _recs = list(archive.genBatchRecords(timefunc(1), timefunc(3), columns=['barometer']))
+            self.assertEqual(_recs, [{'dateTime': timefunc(i), 'usUnits': 1, 'barometer': barfunc(i)} for i in (2, 3)])
+            # A new record with data in windSpeed gets noticed:
+            archive.addRecord({'dateTime': timefunc(nrecs), 'interval': interval, 'usUnits' : 1, 'windSpeed': 5.0})
+            self.assertEqual(archive.getLiveKeys(), ['dateTime', 'usUnits', 'interval', 'barometer', 'inTemp', 'outTemp', 'windSpeed'])
+
+    def test_compact_records(self):
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            for (_rec, _dict) in zip(archive.genBatchRecords(compact=True), archive.genBatchRecords()):
+                # Compact records read just like dictionaries:
+                self.assertEqual(_rec, _dict)
+                self.assertEqual(dict(_rec), _dict)
+                self.assertEqual(_rec['outTemp'], _dict['outTemp'])
+                self.assertEqual(_rec.get('fooTemp', 1.0), 1.0)
+                self.assertTrue('barometer' in _rec)
+                self.assertEqual(sorted(_rec.keys()), sorted(_dict.keys()))
+            # The class is made only once for a set of columns:
+            _recs = list(archive.genBatchRecords(columns=['outTemp'], compact=True))
+            self.assertTrue(type(_recs[0]) is type(_recs[-1]))
+            self.assertEqual(_recs[-1].items(), [('dateTime', timefunc(nrecs-1)), ('usUnits', 1), ('outTemp', temperfunc(nrecs-1))])
+            # They cannot be changed:
+            def set_value(rec):
+                rec['outTemp'] = 1.0
+            self.assertRaises(TypeError, set_value, _recs[0])
+            self.assertRaises(KeyError, _recs[0].__getitem__, 'barometer')
+
+    def test_nearest_stamp(self):
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+            ts = timefunc(5)
+            self.assertEqual(archive.getNearestStamp(ts), ts)
+            self.assertEqual(archive.getNearestStamp(ts + 10, 60), ts)
+            self.assertEqual(archive.getNearestStamp(ts - 10, 60), ts)
+            # Nothing within max_delta:
+            self.assertEqual(archive.getNearestStamp(ts + 100, 60), None)
+            # Closer to the later record:
+            self.assertEqual(archive.getNearestStamp(ts + interval - 100, interval), ts + interval)
+            # A tie goes to the earlier record:
+            self.assertEqual(archive.getNearestStamp(ts + interval / 2, interval), ts)
+            # Off either end of the archive:
+            self.assertEqual(archive.getNearestStamp(start_ts - 3600), start_ts)
+            self.assertEqual(archive.getNearestStamp(stop_ts + 3600), stop_ts)
+            self.assertEqual(archive.getNearestStamp(stop_ts + 3600, 600), None)
+            self.assertEqual(archive.getRecord(ts + 10, max_delta=60)['dateTime'], ts)
+
+    def test_partitions(self):
+        # Records every 3 hours, from a few days before New Year 2012 until a
+        # few days after New Year 2013:
+        _first_ts = int(time.mktime((2011, 12, 28, 0, 0, 0, 0, 0, -1)))
+        _last_ts = int(time.mktime((2013, 1, 3, 0, 0, 0, 0, 0, -1)))
+        _recs = [dict(expected_record(0), dateTime=ts, outTemp=float(ts % 97), barometer=30.0 + ts % 7 / 10.0)
+                 for ts in range(_first_ts, _last_ts + 1, 3 * 3600)]
+        _new_year_ts = int(time.mktime((2012, 1, 1, 0, 0, 0, 0, 0, -1)))
+        
+        # The same records, in a single table, and in a table per year:
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive, \
+                weewx.manager.PartitionedManager.open_with_create(self.archive_db_dict, 'parted', schema=archive_schema) as parted:
+            archive.addRecord(_recs, chunk_size=100)
+            parted.addRecord(_recs[:10])
+            parted.addRecord(_recs[10:], chunk_size=100)
+            self.assertEqual(sorted(x for x in parted.connection.tables() if x.startswith('parted')),
+                             ['parted', 'parted_2011', 'parted_2012', 'parted_2013'])
+            self.assertEqual(parted.getSql("SELECT COUNT(*) FROM parted")[0], 0)
+            # Midnight on New Year belongs to the old year:
+            self.assertEqual(parted.getSql("SELECT MAX(dateTime) FROM parted_2011")[0], _new_year_ts)
+            self.assertEqual(parted.std_unit_system, std_unit_system)
+            self.assertEqual((parted.first_timestamp, parted.last_timestamp), (_first_ts, _last_ts))
+            self.assertEqual((parted.firstGoodStamp(), parted.lastGoodStamp()), (_first_ts, _last_ts))
+
+            # A span within one year goes straight to its table:
+            self.assertEqual(parted.table_for_span(_new_year_ts + 1, _new_year_ts + 86400), 'parted_2012')
+            self.assertEqual(parted.table_for_span(_first_ts - 400 * 86400, _first_ts - 380 * 86400), 'parted')
+            
+            self.assertEqual(list(parted.genBatchRows()), list(archive.genBatchRows()))
+            _spans = [weeutil.weeutil.TimeSpan(_first_ts, _last_ts),
+                      weeutil.weeutil.TimeSpan(_new_year_ts - 5 * 86400, _new_year_ts + 86400),
+                      weeutil.weeutil.TimeSpan(_new_year_ts, _new_year_ts + 10 * 86400),
+                      weeutil.weeutil.TimeSpan(_last_ts - 40 * 86400, _last_ts + 86400)]
+            for _span in _spans:
+                self.assertEqual(list(parted.genBatchRecords(*_span, columns=['outTemp'])), 
+                                 list(archive.genBatchRecords(*_span, columns=['outTemp'])))
+                for _aggregate in ['min', 'max', 'mintime', 'maxtime', 'sum', 'count', 'avg', 'last', 'lasttime']:
+                    self.assertEqual(parted.getAggregate(_span, 'outTemp', _aggregate), 
+                                     archive.getAggregate(_span, 'outTemp', _aggregate))
+                self.assertEqual(parted.getSqlVectors(_span, 'barometer'), archive.getSqlVectors(_span, 'barometer'))
+                for _aggregate in ['avg', 'max']:
+                    self.assertEqual(parted.getSqlVectors(_span, 'outTemp', _aggregate, 86400), 
+                                     archive.getSqlVectors(_span, 'outTemp', _aggregate, 86400))
+            for _ts in [_first_ts, _new_year_ts, _new_year_ts + 10, _last_ts]:
+                self.assertEqual(parted.getRecord(_ts, 3600), archive.getRecord(_ts, 3600))
+            # The nearest record can be in another year:
+            self.assertEqual(parted.getNearestStamp(_new_year_ts + 3600), _new_year_ts)
+            self.assertEqual(parted.getNearestStamp(_last_ts + 365 * 86400), _last_ts)
+            self.assertEqual(parted.getNearestStamp(_first_ts - 365 * 86400), _first_ts)
+            self.assertEqual(parted.getLiveKeys(), archive.getLiveKeys())
+            
+            # Adding a type adds it to every year:
+            parted.add_obs_type('dewpoint')
+            parted.addRecord(dict(expected_record(0), dateTime=_last_ts + 365 * 86400, dewpoint=50.0))
+            for _table in ['parted', 'parted_2011', 'parted_2013', 'parted_2014']:
+                self.assertEqual(parted.connection.columnsOf(_table), parted.sqlkeys)
+            self.assertEqual(parted.getRecord(_last_ts + 365 * 86400)['dewpoint'], 50.0)
+            
+            # If the transaction adding a record fails, the partition created
+            # for it might or might not survive, depending on the database.
+            # Either way, the manager should know.
+            _bad_recs = [dict(expected_record(0), dateTime=_last_ts + 3 * 365 * 86400),
+                         dict(expected_record(0), dateTime=_last_ts + 3 * 365 * 86400 + 3600, usUnits=16)]
+            self.assertRaises(weewx.UnitError, parted.addRecord, _bad_recs)
+            self.assertEqual(parted._archive_tables(), 
+                             sorted(x for x in parted.connection.tables() if x.startswith('parted_')))
+        
+        # Partition the single table. Afterwards, it should look just the same:
+        with weewx.manager.PartitionedManager.open(self.archive_db_dict) as archive:
+            self.assertEqual(archive.first_timestamp, None)
+            self.assertEqual(archive.partition_archive(), len(_recs))
+            self.assertEqual(archive.partition_archive(), 0)
+            self.assertEqual(archive._archive_tables(), ['archive_2011', 'archive_2012', 'archive_2013'])
+            self.assertEqual((archive.first_timestamp, archive.last_timestamp), (_first_ts, _last_ts))
+            with weewx.manager.PartitionedManager.open(self.archive_db_dict, 'parted') as parted:
+                self.assertEqual(list(archive.genBatchRecords(_first_ts, _last_ts)), 
+                                 list(parted.genBatchRecords(_first_ts, _last_ts, columns=archive.sqlkeys)))
+
+    def test_downsample(self):
+        # Five minute records for three days:
+        _recs = [dict(expected_record(0), dateTime=start_ts + i * 300, interval=5, outTemp=float(i % 13), windSpeed=float(i % 5))
+                 for i in range(1, 3 * 288 + 1)]
+        _day1 = weeutil.weeutil.TimeSpan(start_ts, start_ts + 86400)
+        _days = weeutil.weeutil.TimeSpan(start_ts, start_ts + 2 * 86400)
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(_recs)
+            _avg1 = archive.getAggregate(_day1, 'outTemp', 'avg')[0]
+            _avg2 = archive.getAggregate(_days, 'windSpeed', 'avg')[0]
+            self.assertRaises(weewx.ViolatedPrecondition, archive.downsample, 5400, start_ts + 86400)
+            
+            # Roll up the first day into 15 minute records. The end is rounded down:
+            self.assertEqual(archive.downsample(900, start_ts + 86400 + 600), 288)
+            self.assertEqual(archive.getSql("SELECT COUNT(*), MIN(dateTime), MAX(dateTime), MIN(`interval`) FROM archive_tier_900"), 
+                             (96, start_ts + 900, start_ts + 86400, 15))
+            self.assertEqual(archive.getSql("SELECT MIN(dateTime) FROM archive")[0], start_ts + 86400 + 300)
+            self.assertEqual(archive.getRecord(start_ts + 900)['outTemp'], (1 + 2 + 3) / 3.0)
+            self.assertEqual(archive.first_timestamp, start_ts + 900)
+            self.assertAlmostEqual(archive.getAggregate(_day1, 'outTemp', 'avg')[0], _avg1)
+            self.assertEqual(archive.table_for_span(start_ts, start_ts + 3600), 'archive_tier_900')
+            self.assertEqual(archive.table_for_span(start_ts + 2 * 86400, None), 'archive')
+            self.assertEqual(len(list(archive.genBatchRecords())), 96 + 2 * 288)
+            self.assertEqual(archive.getNearestStamp(start_ts + 86400 + 100), start_ts + 86400)
+            
+            # Then roll up the first two days into hourly records. They come
+            # from both the 15 minute tier and the main table:
+            self.assertEqual(archive.downsample(3600, start_ts + 2 * 86400), 96 + 288)
+            self.assertEqual(archive.downsample(3600, start_ts + 2 * 86400), 0)
+            self.assertEqual(archive.getSql("SELECT COUNT(*) FROM archive_tier_900")[0], 0)
+            self.assertEqual(archive.getSql("SELECT COUNT(*) FROM archive_tier_3600")[0], 48)
+            self.assertAlmostEqual(archive.getAggregate(_days, 'windSpeed', 'avg')[0], _avg2)
+            self.assertEqual(archive.getSqlVectors(_days, 'outTemp', 'count', 86400)[2][0], [24, 24])
+
+        # Another manager finds the tiers. A type gets added to all of them:
+        with weewx.manager.Manager.open(self.archive_db_dict) as archive:
+            self.assertEqual(archive._archive_tables(), ['archive_tier_3600', 'archive'])
+            self.assertEqual(archive._archive_tables(start_ts, start_ts + 86400), ['archive_tier_3600'])
+            self.assertEqual(len(list(archive.genBatchRecords())), 48 + 288)
+            archive.add_obs_type('dewpoint')
+            for _table in ['archive_tier_900', 'archive_tier_3600']:
+                self.assertEqual(archive.connection.columnsOf(_table), archive.sqlkeys)
+
+    def test_downsample_elsewhere(self):
+        _recs = [dict(expected_record(0), dateTime=start_ts + i * 300, interval=5, outTemp=float(i % 13))
+                 for i in range(1, 3 * 288 + 1)]
+        _day1 = weeutil.weeutil.TimeSpan(start_ts, start_ts + 86400)
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive, \
+                weewx.manager.Manager.open(self.archive_db_dict) as reader:
+            archive.addRecord(_recs)
+            self.assertEqual(len(list(reader.genBatchRecords(*_day1))), 288)
+            
+            # The reader sees records rolled up by the other manager, without
+            # being resynchronized:
+            archive.downsample(900, start_ts + 86400)
+            self.assertEqual(reader.getAggregate(_day1, 'outTemp', 'count')[0], 96)
+            self.assertEqual(len(list(reader.genBatchRecords(start_ts + 43200, start_ts + 86400))), 48)
+            self.assertEqual(reader.getRecord(start_ts + 900)['interval'], 15)
+            
+            # A span that starts after the end of the tier it knew about, and
+            # covers records moved out of the main table since:
+            archive.downsample(3600, start_ts + 2 * 86400)
+            _span = weeutil.weeutil.TimeSpan(start_ts + 86400 + 3600, start_ts + 2 * 86400)
+            self.assertEqual(reader.table_for_span(*_span), 'archive_tier_3600')
+            self.assertEqual(reader.getAggregate(_span, 'outTemp', 'count')[0], 23)
+            
+            # A late record goes to the tier that holds its time:
+            reader.addRecord(dict(expected_record(0), dateTime=start_ts + 86400 + 1800, interval=60))
+            self.assertEqual(archive.getSql("SELECT COUNT(*) FROM archive_tier_3600 WHERE dateTime = ?", 
+                                            (start_ts + 86400 + 1800,))[0], 1)
+
+    def test_hot_records(self):
+        manager_dict = {'database_dict' : self.archive_db_dict, 'table_name' : 'archive',
+                        'manager' : 'weewx.manager.Manager', 'schema' : archive_schema, 'hot_hours' : '12'}
+        with weewx.manager.open_manager(manager_dict, initialize=True) as archive, \
+                weewx.manager.Manager.open(self.archive_db_dict) as reference:
+            archive.addRecord(genRecords())
+            self.assertEqual(archive.table_for_span(stop_ts - 6 * 3600, stop_ts), archive._hot_table)
+            self.assertEqual(archive.table_for_span(stop_ts - 12 * 3600, stop_ts), 'archive')
+            self.assertEqual(archive.getSql("SELECT COUNT(*) FROM %s" % archive._hot_table)[0], 12)
+            
+            # Queries over the last 12 hours get the same answers from memory:
+            reference._sync()
+            _span = weeutil.weeutil.TimeSpan(stop_ts - 6 * 3600, stop_ts)
+            self.assertEqual(archive.getSqlVectors(_span, 'outTemp'), reference.getSqlVectors(_span, 'outTemp'))
+            self.assertEqual(archive.getSqlVectors(_span, 'outTemp', 'max', 7200), reference.getSqlVectors(_span, 'outTemp', 'max', 7200))
+            for _aggregate in ['min', 'maxtime', 'avg', 'count', 'last']:
+                self.assertEqual(archive.getAggregate(_span, 'outTemp', _aggregate), 
+                                 reference.getAggregate(_span, 'outTemp', _aggregate))
+            self.assertEqual(archive.getRecord(stop_ts - 3600), reference.getRecord(stop_ts - 3600))
+            
+            # New records go into memory as well. The oldest ones drop out:
+            archive.addRecord(dict(expected_record(nrecs), outTemp=100.0))
+            self.assertEqual(archive.getSql("SELECT COUNT(*), MAX(outTemp) FROM %s" % archive._hot_table), (12, 100.0))
+            archive.updateValue(stop_ts, 'outTemp', 50.0)
+            self.assertEqual(archive.getRecord(stop_ts)['outTemp'], 50.0)
+            # If adding records fails, memory is left just as the database:
+            _bad_recs = [expected_record(nrecs + 1), dict(expected_record(nrecs + 2), usUnits=16)]
+            self.assertRaises(weewx.UnitError, archive.addRecord, _bad_recs)
+            self.assertEqual(archive.getRecord(timefunc(nrecs + 1)), None)
+            self.assertEqual(archive.getSql("SELECT COUNT(*) FROM %s" % archive._hot_table)[0], 12)
+            
+            # A reader that cannot change the database also keeps a copy. It
+            # finds the records added by the writer:
+            with weewx.manager.Manager.open(dict(self.archive_db_dict, read_only=True)) as reader:
+                reader.keep_hot(12)
+                archive.addRecord(expected_record(nrecs + 1))
+                self.assertEqual(reader.getRecord(timefunc(nrecs + 1)), archive.getRecord(timefunc(nrecs + 1)))
+                self.assertEqual(reader.table_for_span(timefunc(nrecs), timefunc(nrecs + 1)), reader._hot_table)
+                self.assertEqual(reader.getSql("SELECT COUNT(*) FROM %s" % reader._hot_table)[0], 12)
+                # Resynchronizing keeps the copy, unless records in it are
+                # gone from the database:
+                reader._load_hot = None
+                reader._sync()
+                del reader._load_hot
+                archive.connection.execute("DELETE FROM archive WHERE dateTime = ?", (timefunc(nrecs + 1),))
+                reader._sync()
+                self.assertEqual(reader.getRecord(timefunc(nrecs + 1)), None)
+                self.assertEqual(reader.getSql("SELECT MAX(dateTime) FROM %s" % reader._hot_table)[0], timefunc(nrecs))
+            
+            # A new type goes into memory too:
+            archive.add_obs_type('dewpoint')
+            archive.addRecord(dict(expected_record(nrecs + 2), dewpoint=40.0))
+            self.assertEqual(archive.getRecord(timefunc(nrecs + 2))['dewpoint'], 40.0)
+            archive.keep_hot(None)
+            self.assertEqual(archive.table_for_span(stop_ts - 6 * 3600, stop_ts), 'archive')
+
+    def test_column_cache(self):
+        column_dir = '/var/tmp/weewx_test/columns'
+        shutil.rmtree(column_dir, ignore_errors=True)
+        manager_dict = {'database_dict' : self.archive_db_dict, 'table_name' : 'archive',
+                        'manager' : 'weewx.manager.Manager', 'schema' : archive_schema, 'column_cache' : column_dir}
+        with weewx.manager.open_manager(manager_dict, initialize=True) as archive, \
+                weewx.manager.Manager.open(self.archive_db_dict) as reference:
+            # A new copy holds only the records added from then on:
+            archive.addRecord(genRecords())
+            self.assertEqual(archive._column_cache.span(), (0, stop_ts))
+            archive._column_cache.reset(archive.sqlkeys, stop_ts)
+            _span = weeutil.weeutil.TimeSpan(start_ts, stop_ts)
+            self.assertEqual(archive._getColumnVectors(_span, 'outTemp'), None)
+            self.assertEqual(archive.rebuild_columns(), nrecs)
+            self.assertEqual(archive._column_cache.span(), (0, stop_ts))
+
+            # The copy gives the same answers as the database:
+            reference._sync()
+            for _span in [weeutil.weeutil.TimeSpan(start_ts, stop_ts), 
+                          weeutil.weeutil.TimeSpan(start_ts + 6 * 3600, stop_ts - 3 * 3600)]:
+                for obs_type in ['outTemp', 'barometer', 'windSpeed']:
+                    self.assertNotEqual(archive._getColumnVectors(_span, obs_type), None)
+                    self.assertEqual(archive.getSqlVectors(_span, obs_type), reference.getSqlVectors(_span, obs_type))
+                    for _aggregate in weewx.manager.Manager.scan_aggregates:
+                        _vectors = archive.getSqlVectors(_span, obs_type, _aggregate, 6 * 3600)
+                        _reference = reference.getSqlVectors(_span, obs_type, _aggregate, 6 * 3600)
+                        self.assertEqual(_vectors[0:2], _reference[0:2])
+                        self.assertEqual(_vectors[2][1:], _reference[2][1:])
+                        for (v, r) in zip(_vectors[2][0], _reference[2][0]):
+                            self.assertAlmostEqual(v, r)
+            # An aggregate the copy cannot do goes to the database:
+            self.assertEqual(archive._getColumnVectors(_span, 'outTemp', 'mintime', 6 * 3600), None)
+            
+            # New records, changes, and new types go into the copy as well:
+            archive.addRecord(expected_record(nrecs))
+            self.assertEqual(archive._column_cache.span(), (0, timefunc(nrecs)))
+            archive.updateValue(timefunc(nrecs), 'outTemp', 50.0)
+            archive.add_obs_type('dewpoint')
+            archive.addRecord(dict(expected_record(nrecs + 1), dewpoint=40.0))
+            _span = weeutil.weeutil.TimeSpan(stop_ts, timefunc(nrecs + 1))
+            self.assertEqual(archive.getSqlVectors(_span, 'outTemp')[2][0], [temperfunc(nrecs - 1), 50.0, temperfunc(nrecs + 1)])
+            self.assertEqual(archive.getSqlVectors(_span, 'dewpoint')[2][0], [None, None, 40.0])
+            
+            # A record added in the middle gets in too:
+            archive.addRecord(dict(expected_record(0), dateTime=start_ts + 1800))
+            reference._sync()
+            _span = weeutil.weeutil.TimeSpan(start_ts, timefunc(nrecs + 1))
+            self.assertNotEqual(archive._getColumnVectors(_span, 'outTemp'), None)
+            self.assertEqual(archive.getSqlVectors(_span, 'outTemp'), reference.getSqlVectors(_span, 'outTemp'))
+            
+            # Records added by another manager are missed, so the query goes to the database:
+            reference.addRecord(expected_record(nrecs + 2))
+            archive._sync()
+            _span = weeutil.weeutil.TimeSpan(start_ts, timefunc(nrecs + 2))
+            self.assertEqual(archive._getColumnVectors(_span, 'outTemp'), None)
+            self.assertEqual(archive.getSqlVectors(_span, 'outTemp'), reference.getSqlVectors(_span, 'outTemp'))
+            # ... until the copy picks them up:
+            archive._append_columns()
+            self.assertEqual(archive._column_cache.span(), (0, timefunc(nrecs + 2)))
+            
+            # Records rolled up are dropped from the copy:
+            self.assertEqual(archive.downsample(3 * 3600, start_ts + 12 * 3600), 14)
+            self.assertEqual(archive._column_cache.span()[0], start_ts + 12 * 3600)
+            reference._sync()
+            _span = weeutil.weeutil.TimeSpan(start_ts, stop_ts)
+            self.assertEqual(archive._getColumnVectors(_span, 'outTemp'), None)
+            self.assertEqual(archive.getSqlVectors(_span, 'outTemp'), reference.getSqlVectors(_span, 'outTemp'))
+            _span = weeutil.weeutil.TimeSpan(start_ts + 13 * 3600, stop_ts)
+            self.assertNotEqual(archive._getColumnVectors(_span, 'outTemp'), None)
+            self.assertEqual(archive.getSqlVectors(_span, 'outTemp'), reference.getSqlVectors(_span, 'outTemp'))
+        shutil.rmtree(column_dir, ignore_errors=True)
+
+    def test_binder_pending(self):
+        weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema).close()
+        config_dict = {'DataBindings' : {'wx_binding' : {'database_dict' : self.archive_db_dict, 'table_name' : 'archive',
+                                                         'manager' : 'weewx.manager.Manager'}}}
+        with weewx.manager.DBBinder(config_dict) as binder:
+            archive = binder.get_manager()
+            # Records held back get written before anything reads through the
+            # binder:
+            held = list(genRecords())
+            def flush():
+                archive.addRecord(held)
+                del held[:]
+            binder.set_pending('wx_binding', flush)
+            self.assertEqual(archive.lastGoodStamp(), None)
+            self.assertEqual(binder.get_manager().lastGoodStamp(), stop_ts)
+            self.assertEqual(held, [])
+            binder.set_pending('wx_binding', None)
+            self.assertEqual(binder.pending, {})
+            binder.flush_pending()
+
+    def test_manager_pool(self):
+        manager_dict = {'database_dict' : self.archive_db_dict, 'table_name' : 'archive',
+                        'manager' : 'weewx.manager.Manager', 'schema' : archive_schema}
+        pool = weewx.manager.ManagerPool()
+        archive = pool.get_manager(manager_dict, initialize=True)
+        pool.put_manager(archive)
+        # The same manager should come back, rather than a new one:
+        self.assertTrue(pool.get_manager(manager_dict) is archive)
+        self.assertEqual((pool.opens, pool.reuses), (1, 1))
+        # A second borrower gets a manager of its own:
+        archive2 = pool.get_manager(manager_dict)
+        self.assertFalse(archive2 is archive)
+        self.assertEqual(pool.opens, 2)
+        
+        # Changes made through one manager should be seen by the other, after
+        # it has been through the pool:
+        archive2.addRecord(genRecords())
+        pool.put_manager(archive2)
+        self.assertEqual(archive.last_timestamp, None)
+        pool.put_manager(archive)
+        self.assertTrue(pool.get_manager(manager_dict) is archive)
+        self.assertEqual(archive.last_timestamp, stop_ts)
+        
+        # The manager can be used by another thread:
+        pool.put_manager(archive)
+        results = []
+        def borrow():
+            _archive = pool.get_manager(manager_dict)
+            results.append((_archive, _archive.getRecord(start_ts)['outTemp']))
+            pool.put_manager(_archive)
+        _thread = threading.Thread(target=borrow)
+        _thread.start()
+        _thread.join()
+        self.assertEqual(results, [(archive, temperfunc(0))])
+        
+        # A manager that no longer works should be replaced:
+        pool.get_manager(manager_dict).connection.close()
+        archive3 = pool.get_manager(manager_dict)
+        self.assertTrue(archive3 is archive2)
+        pool.put_manager(archive3)
+        pool.put_manager(archive)
+        self.assertEqual(pool.get_manager(manager_dict).getRecord(start_ts)['outTemp'], temperfunc(0))
+        
+        # Idle managers should get closed:
+        pool.max_idle = -1
+        pool.put_manager(archive3)
+        self.assertEqual(pool._idle, {})
+        pool.close()
+
+    def test_backfill_parallel(self):
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+
+        with weewx.manager.DaySummaryManager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            # Backfill part of the archive the usual way, so the parallel
+            # backfill has to merge into a partially completed day:
+            self.assertEqual(archive.backfill_day_summary(stop_ts=start_ts + 30*interval, progress_fn=None), (31, 3))
+            self.assertEqual(archive.backfill_day_summary(progress_fn=None, trans_days=1, jobs=2), (nrecs-31, 1))
+            self.assertEqual(archive._getLastUpdate(), stop_ts)
+
+            # Check the daily summaries against the archive table:
+            for span in weeutil.weeutil.genDaySpans(start_ts - 1, stop_ts):
+                for obs_type in ['outTemp', 'barometer', 'inTemp']:
+                    for aggregate in ['min', 'mintime', 'max', 'maxtime', 'sum', 'count', 'avg']:
+                        self.assertAlmostEqual(archive.getAggregate(span, obs_type, aggregate)[0],
+                                               weewx.manager.Manager.getAggregate(archive, span, obs_type, aggregate)[0])
+
+    def test_columns(self):
+        with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
+            archive.addRecord(genRecords())
+
+            for (obs_type, aggregate_type) in [('barometer', None), ('windSpeed', None), ('outTemp', 'avg'),
+                                               ('outTemp', 'last'), ('windSpeed', 'count')]:
+                vectors = archive.getSqlVectors((start_ts, stop_ts), obs_type, aggregate_type, 6*interval)
+                columns = archive.getSqlVectors((start_ts, stop_ts), obs_type, aggregate_type, 6*interval,
+                                                columnar=True)
+                for (vec_t, col_t) in zip(vectors, columns):
+                    # Same units, and the same values, with NaN for None:
+                    self.assertEqual(vec_t[1:], col_t[1:])
+                    self.assertEqual(len(vec_t[0]), len(col_t[0]))
+                    for (v, c) in zip(vec_t[0], col_t[0]):
+                        if v is None:
+                            self.assertTrue(c != c)
+                        else:
+                            self.assertEqual(v, c)
+                self.assertTrue(isinstance(columns[1][0], weewx.manager.numpy.ndarray if weewx.manager.numpy
+                                           else array.array))
+
+    def test_windvec_aggregate(self):
+        # Records of (dateTime, windSpeed, windDir, usUnits), in two intervals of an hour each
+        start_ts = 1262332800
+        rows = [(start_ts + 600,  2.0,  90.0, 1),
+                (start_ts + 1200, 0.0,  None, 1),
+                (start_ts + 1800, None, 45.0, 1),
+                (start_ts + 2400, 4.0,  None, 1),
+                (start_ts + 3600, 4.0, 180.0, 1),
+                (start_ts + 4200, 0.0,  None, 1),
+                (start_ts + 7200, 1.0, 270.0, 1)]
+        stamps = list(weeutil.weeutil.intervalgen(start_ts, start_ts + 3 * 3600, 3600))
+        
+        # Check the pure Python version against values worked out by hand
+        _, results = weewx.manager._aggregate_windvec_python(rows, stamps, 'count')
+        self.assertEqual(results, [(0, 3), (1, 2)])
+        _, results = weewx.manager._aggregate_windvec_python(rows, stamps, 'sum')
+        self.assertEqual([i for (i, v) in results], [0, 1])
+        self.assertAlmostEqual(results[0][1].real, 2.0)
+        self.assertAlmostEqual(results[0][1].imag, -4.0)
+        self.assertAlmostEqual(results[1][1].real, -1.0)
+        _, results = weewx.manager._aggregate_windvec_python(rows, stamps, 'min')
+        self.assertEqual([v for (i, v) in results], [complex(0.0, 0.0), complex(0.0, 0.0)])
+        
+        # Now check that the NumPy version gives the same results
+        if weewx.manager.numpy is None:
+            return
+        for aggregate_type in ('min', 'max', 'sum', 'avg', 'count'):
+            (unit_p, results_p) = weewx.manager._aggregate_windvec_python(rows, stamps, aggregate_type)
+            (unit_n, results_n) = weewx.manager._aggregate_windvec_numpy(rows, stamps, aggregate_type)
+            self.assertEqual(unit_p, unit_n)
+            self.assertEqual([i for (i, v) in results_p], [i for (i, v) in results_n])
+            for ((i, v_p), (i, v_n)) in zip(results_p, results_n):
+                self.assertAlmostEqual(v_p.real, v_n.real)
+                self.assertAlmostEqual(v_p.imag, v_n.imag)
+        mags = [row[1] for row in rows]
+        dirs = [row[2] for row in rows]
+        xy_p = weewx.manager._windvec_to_xy_python(mags, dirs)
+        xy_n = weewx.manager._windvec_to_xy_numpy(mags, dirs)
+        self.assertEqual([v is None for v in xy_p], [v is None for v in xy_n])
+        for (v_p, v_n) in zip(xy_p, xy_n):
+            if v_p is not None:
+                self.assertAlmostEqual(v_p.real, v_n.real)
+                self.assertAlmostEqual(v_p.imag, v_n.imag)
+
     def test_get_records(self):
         # Add a bunch of records:
         with weewx.manager.Manager.open_with_create(self.archive_db_dict, schema=archive_schema) as archive:
@@ -215,6 +926,20 @@ class Common(unittest.TestCase):
                 # Compare them.
                 self.assertAlmostEqual(expected_avg, barvec[2][0][irec])
 
+            # The other aggregations should agree with an aggregation done over each interval:
+            for aggregate_type in ['min', 'max', 'sum', 'count', 'last']:
+                vec = archive.getSqlVectors((start_ts, stop_ts), 'barometer', aggregate_type=aggregate_type, aggregate_interval=6*interval)
+                for (start, stop, value) in zip(vec[0][0], vec[1][0], vec[2][0]):
+                    span = weeutil.weeutil.TimeSpan(start, stop)
+                    self.assertAlmostEqual(value, archive.getAggregate(span, 'barometer', aggregate_type)[0])
+                self.assertEqual(vec[1][0], barvec[1][0])
+            
+            # A type with no data has a count of zero in every interval, but no other aggregation:
+            countvec = archive.getSqlVectors((start_ts, stop_ts), 'windSpeed', aggregate_type='count', aggregate_interval=6*interval)
+            self.assertEqual(countvec[2][0], n_expected * [0])
+            sumvec = archive.getSqlVectors((start_ts, stop_ts), 'windSpeed', aggregate_type='sum', aggregate_interval=6*interval)
+            self.assertEqual(sumvec[2][0], [])
+
 class TestSqlite(Common):
 
     def __init__(self, *args, **kwargs):
@@ -230,7 +955,9 @@ class TestMySQL(Common):
     
 def suite():
     tests = ['test_no_archive', 'test_create_archive', 
-             'test_empty_archive', 'test_add_archive_records', 'test_get_records']
+             'test_empty_archive', 'test_add_archive_records', 'test_add_archive_records_bulk', 'test_add_bulk_bad_record',
+             'test_day_summary_cache', 'test_add_with_hilo', 'test_add_obs_type', 'test_rebuild_day_summary', 'test_aggregate_cache', 'test_record_cache', 'test_trend_reads', 'test_live_keys', 'test_compact_records', 'test_nearest_stamp', 'test_partitions', 'test_downsample', 'test_downsample_elsewhere', 'test_hot_records', 'test_column_cache', 'test_binder_pending', 'test_manager_pool', 'test_backfill_parallel', 'test_columns', 'test_windvec_aggregate',
+             'test_get_records']
     return unittest.TestSuite(map(TestSqlite, tests) + map(TestMySQL, tests))
             
 if __name__ == '__main__':
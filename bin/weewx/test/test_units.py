@@ -6,6 +6,8 @@
 #
 """Test module weewx.units"""
 
+import array
+import math
 import unittest
 import operator
 
@@ -66,6 +68,26 @@ class ConverterTest(unittest.TestCase):
         self.assertEqual(weewx.units.convert(value_t, "hour"),   (24.0, 'hour', 'group_deltatime'))
         self.assertEqual(weewx.units.convert(value_t, "day"),    (1.0, 'day', 'group_deltatime'))
         
+    def testConvertColumn(self):
+        # Columns hold NaN for the nulls, which has to come out as NaN:
+        nan = float('nan')
+        cm = weewx.units.Converter(weewx.units.MetricUnits)
+        column = array.array('d', [50.0, nan, 86.0])
+        (new_column, unit, group) = cm.convert((column, "degree_F", "group_temperature"))
+        self.assertTrue(isinstance(new_column, array.array))
+        self.assertEqual((unit, group), ("degree_C", "group_temperature"))
+        self.assertEqual(new_column[0], 10.0)
+        self.assertTrue(math.isnan(new_column[1]))
+        self.assertEqual(new_column[2], 30.0)
+
+        if weewx.units.numpy is None:
+            return
+        column = weewx.units.numpy.array([50.0, nan, 86.0])
+        new_column = cm.convert((column, "degree_F", "group_temperature"))[0]
+        self.assertTrue(isinstance(new_column, weewx.units.numpy.ndarray))
+        self.assertEqual(list(new_column[[0, 2]]), [10.0, 30.0])
+        self.assertTrue(math.isnan(new_column[1]))
+
     def testConvertDict(self):
         d_m =  {'outTemp'   : 20.01,
                 'barometer' : 1002.3,
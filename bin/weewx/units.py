@@ -7,6 +7,7 @@
 
 """Data structures and functions for dealing with units."""
 
+import array
 import locale
 import time
 import syslog
@@ -15,6 +16,12 @@ import weewx
 import weeutil.weeutil
 from weeutil.weeutil import ListOfDicts
 
+# NumPy is optional. If it is there, columns of values are NumPy arrays:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class UnknownType(object):
     """Indicates that the observation type is unknown."""
     def __init__(self, obs_type):
@@ -1037,7 +1044,9 @@ def convert(val_t, target_unit_type):
 
     val_t: A value-tuple with the value to be converted. The first
     element is the value (either a scalar or iterable), the second element 
-    the unit type (e.g., "foot", or "inHg") it is in.
+    the unit type (e.g., "foot", or "inHg") it is in. The value can also be
+    a column, as returned by Manager.getSqlVectors(columnar=True): a NumPy
+    array, or an array.array. The column is converted as a whole.
     
     target_unit_type: The unit type (e.g., "meter", or "mbar") to
     which the value is to be converted. 
@@ -1056,12 +1065,21 @@ def convert(val_t, target_unit_type):
         if weewx.debug:
             syslog.syslog(syslog.LOG_DEBUG, "units: Unable to convert from %s to %s" %(val_t[1], target_unit_type))
         raise
-    # Try converting a sequence first. A TypeError exception will occur if
-    # the value is actually a scalar:
-    try:
-        new_val = map(lambda x : conversion_func(x) if x is not None else None, val_t[0])
-    except TypeError:
-        new_val = conversion_func(val_t[0]) if val_t[0] is not None else None
+    if numpy is not None and isinstance(val_t[0], numpy.ndarray):
+        # The conversion functions are plain arithmetic, so they work on the
+        # whole array at once. NaN stays NaN.
+        new_val = conversion_func(val_t[0])
+    elif isinstance(val_t[0], array.array):
+        # There is no arithmetic on an array.array, but at least NaN goes
+        # through the conversion function with no test for None:
+        new_val = array.array('d', map(conversion_func, val_t[0]))
+    else:
+        # Try converting a sequence first. A TypeError exception will occur if
+        # the value is actually a scalar:
+        try:
+            new_val = map(lambda x : conversion_func(x) if x is not None else None, val_t[0])
+        except TypeError:
+            new_val = conversion_func(val_t[0]) if val_t[0] is not None else None
     # Add on the unit type and the group type and return the results:
     return ValueTuple(new_val, target_unit_type, val_t[2])
 
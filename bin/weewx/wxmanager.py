@@ -5,7 +5,11 @@
 #
 """Weather-specific database manager."""
 
+import syslog
+
+import weedb
 import weeutil.weeutil
+import weewx.accum
 import weewx.wxformulas
 import weewx.manager
 
@@ -16,7 +20,16 @@ import weewx.manager
 class WXDaySummaryManager(weewx.manager.DaySummaryManager):
     """Daily summaries, suitable for WX applications.
 
-    Like a regular daily summary database, except it understands wind, and heating- and cooling-degree days."""
+    Like a regular daily summary database, except it understands wind, and heating- and cooling-degree days.
+    
+    It can also keep monthly and yearly rollups of the daily summaries. They
+    have the same layout as the daily summaries. For example, for type
+    'outTemp' there are tables 'archive_month_outTemp' and
+    'archive_year_outTemp'. A rollup is brought up to date when the month or
+    year it covers is over, so only periods that end on or before the start of
+    the current day (the 'rollupsThrough' entry in the metadata) are used.
+    New databases get the rollups automatically. Existing databases can add
+    them with rebuild_rollups()."""
 
     # Default base temperature and unit type for heating and cooling degree days,
     # as a value tuple
@@ -28,15 +41,54 @@ class WXDaySummaryManager(weewx.manager.DaySummaryManager):
       "min REAL, mintime INTEGER, max REAL, maxtime INTEGER, sum REAL, count INTEGER, "\
       "wsum REAL, sumtime INTEGER, "\
       "max_dir REAL, xsum REAL, ysum REAL, dirsumtime INTEGER, squaresum REAL, wsquaresum REAL);"
-                             
+
+    # Sql statements to be used to create the monthly and yearly rollups:
+    rollup_create_str = "CREATE TABLE %s_%s_%s (dateTime INTEGER NOT NULL UNIQUE PRIMARY KEY, "\
+      "min REAL, mintime INTEGER, max REAL, maxtime INTEGER, sum REAL, count INTEGER, "\
+      "wsum REAL, sumtime INTEGER);"
+    wx_rollup_create_str = "CREATE TABLE %s_%s_wind (dateTime INTEGER NOT NULL UNIQUE PRIMARY KEY, "\
+      "min REAL, mintime INTEGER, max REAL, maxtime INTEGER, sum REAL, count INTEGER, "\
+      "wsum REAL, sumtime INTEGER, "\
+      "max_dir REAL, xsum REAL, ysum REAL, dirsumtime INTEGER, squaresum REAL, wsquaresum REAL);"
+    
+    select_rollups_str = """SELECT value FROM %s_day__metadata WHERE name = 'rollupsThrough';"""
+
+    # The rollup levels, finest first, along with a generator of the periods in each:
+    rollup_levels = [('month', weeutil.weeutil.genMonthSpans),
+                     ('year',  weeutil.weeutil.genYearSpans)]
+    
+    # The types that have rollups, and the start of the first day that has not
+    # been rolled up. None, unless the database has rollups.
+    rollup_keys = []
+    rollups_through = None
+
+    # Wind is accumulated from these archive columns:
+    hybrid_columns = {'wind' : ['windSpeed', 'windDir', 'windGust', 'windGustDir']}
+
+    def _init_day_tables(self, schema):
+        """Specializing version that also finds the rollups."""
+        # First initialize my superclass:
+        super(WXDaySummaryManager, self)._init_day_tables(schema)
+        
+        # Find out whether there are any rollups:
+        _all_tables = self.connection.tables()
+        self.rollup_keys = [x for x in self.daykeys 
+                            if all('%s_%s_%s' % (self.table_name, level, x) in _all_tables for (level, _) in self.rollup_levels)]
+        if self.rollup_keys:
+            self.rollups_through = self._getRollupsThrough()
+    
     def _initialize_day_tables(self, archiveSchema, cursor):
-        """Specializing version that adds schema for wind data."""
+        """Specializing version that adds schema for wind data, and for the rollups."""
         # First initialize my superclass:
-        weewx.manager.DaySummaryManager._initialize_day_tables(self, archiveSchema, cursor)
+        super(WXDaySummaryManager, self)._initialize_day_tables(archiveSchema, cursor)
         
         # Now initialize the WX specific tables
         cursor.execute(WXDaySummaryManager.wx_sql_create_str % self.table_name)
         
+        # Then the rollups:
+        self._create_rollup_tables(self.obskeys + ['wind'], cursor)
+        
+    @weewx.manager.memoize_aggregate
     def getAggregate(self, timespan, obs_type, aggregateType, **option_dict):
         """Specialized version of getDayAggregate that can calculate heating or cooling degree days.
 
@@ -97,3 +149,216 @@ class WXDaySummaryManager(weewx.manager.DaySummaryManager):
         (t, g) = weewx.units.getStandardUnitType(self.std_unit_system, obs_type, aggregateType)
         # Return as a value tuple
         return weewx.units.ValueTuple(_result, t, g)
+
+    def _get_day_row(self, aggregate_type, interDict):
+        """Specialized version that uses the monthly and yearly rollups for
+        any whole months and years in the time span."""
+        
+        if self.rollups_through is not None and interDict['obs_key'] in self.rollup_keys \
+                and aggregate_type in self.hybrid_aggregates:
+            _plan = self._plan_rollups(interDict['start'], interDict['stop'], len(self.rollup_levels))
+            if [x for x in _plan if x[0] != 'day']:
+                # Each part of the plan supplies some rows to a subquery. The
+                # aggregate is then taken over all of them.
+                _stats = self.hybrid_aggregates[aggregate_type]
+                _parts = ["SELECT %s FROM %s_%s_%s WHERE dateTime >= %d AND dateTime < %d" % 
+                          (', '.join(_stats), self.table_name, level, interDict['obs_key'], start, stop)
+                          for (level, start, stop) in _plan]
+                if aggregate_type in ['min', 'max']:
+                    _sql_aggs = ["%s(%s)" % (aggregate_type.upper(), _stat) for _stat in _stats]
+                else:
+                    _sql_aggs = ["SUM(%s)" % _stat for _stat in _stats]
+                return self.getSql("SELECT %s FROM (%s) AS rollup" % (', '.join(_sql_aggs), ' UNION ALL '.join(_parts)))
+        
+        return weewx.manager.DaySummaryManager._get_day_row(self, aggregate_type, interDict)
+    
+    def _plan_rollups(self, start_ts, stop_ts, nlevels):
+        """Break a time span down into parts that can be answered from the
+        daily summaries, or the first nlevels of rollups. Coarser levels are
+        preferred.
+        
+        returns: A list of 3-way tuples (level, start, stop). The level is
+        'day', or one of the rollup levels."""
+        if start_ts >= stop_ts:
+            return []
+        if nlevels == 0:
+            return [('day', start_ts, stop_ts)]
+        
+        # Find the whole periods of this level that have been rolled up:
+        (level, gen_spans) = self.rollup_levels[nlevels - 1]
+        _limit = min(stop_ts, self.rollups_through)
+        _spans = [x for x in gen_spans(start_ts, stop_ts) if x.start >= start_ts and x.stop <= _limit]
+        if not _spans:
+            return self._plan_rollups(start_ts, stop_ts, nlevels - 1)
+        # The periods are contiguous. Any leftovers on either side get
+        # answered by the finer levels:
+        return self._plan_rollups(start_ts, _spans[0].start, nlevels - 1) \
+            + [(level, _spans[0].start, _spans[-1].stop)] \
+            + self._plan_rollups(_spans[-1].stop, stop_ts, nlevels - 1)
+    
+    def _add_day_type(self, obs_type, cursor):
+        """Specialized version that also creates the rollups of the new type,
+        if the database has rollups."""
+        weewx.manager.DaySummaryManager._add_day_type(self, obs_type, cursor)
+        if self.rollup_keys:
+            self._create_rollup_tables([obs_type], cursor)
+            self.rollup_keys.append(obs_type)
+
+    def _rebuild_day_types(self, obs_types, start_ts=None, stop_ts=None, progress_fn=None):
+        """Specialized version that also redoes the rollups of the types, for
+        the months and years that were rebuilt."""
+        _result = weewx.manager.DaySummaryManager._rebuild_day_types(self, obs_types, start_ts, stop_ts, progress_fn)
+        _rollup_types = [x for x in obs_types if x in self.rollup_keys]
+        if _rollup_types and self.rollups_through is not None and self.first_timestamp is not None:
+            _start = weeutil.weeutil.startOfArchiveDay(start_ts + 1 if start_ts else self.first_timestamp)
+            _stop = weeutil.weeutil.startOfArchiveDay(stop_ts or self.last_timestamp) + 1
+            with weedb.Transaction(self.connection) as _cursor:
+                self._rollup(_start, _stop, self.rollups_through, _cursor, _rollup_types)
+            self._clear_query_cache()
+        return _result
+
+    def _set_day_summary(self, day_accum, lastUpdate, cursor, last_tuples=None):
+        """Specialized version that also keeps the rollups up to date."""
+        weewx.manager.DaySummaryManager._set_day_summary(self, day_accum, lastUpdate, cursor, last_tuples)
+        if self.rollup_keys:
+            self._update_rollups(day_accum.timespan.start, cursor)
+    
+    def _update_rollups(self, sod_ts, cursor):
+        """Update the rollups, after the daily summary for a day has been written."""
+        if sod_ts == self.rollups_through:
+            # This is the usual case: the current day is being updated. Nothing
+            # needs to be done until the day is over.
+            return
+        if self.rollups_through is None or sod_ts > self.rollups_through:
+            # A new day. Any months or years that ended before it are now complete.
+            if self.rollups_through is not None:
+                self._rollup(self.rollups_through, sod_ts, sod_ts, cursor)
+            cursor.execute(self.meta_replace_str % self.table_name, ('rollupsThrough', str(int(sod_ts))))
+            self.rollups_through = sod_ts
+        else:
+            # A day that has already been rolled up has changed. Redo the
+            # month and year that hold it.
+            self._rollup(sod_ts, sod_ts + 1, self.rollups_through, cursor)
+    
+    def _rollup(self, start_ts, stop_ts, limit_ts, cursor, obs_types=None):
+        """Recalculate the rollups for all periods that overlap a time span and
+        end on or before limit_ts. Each level is calculated from the one below it.
+        If obs_types is given, only the rollups of those types are done."""
+        _finer = 'day'
+        for (level, gen_spans) in self.rollup_levels:
+            for _span in gen_spans(start_ts, stop_ts):
+                if _span.stop <= limit_ts:
+                    self._rollup_span(_span, _finer, level, cursor, obs_types)
+            _finer = level
+    
+    def _rollup_span(self, span, finer, level, cursor, obs_types=None):
+        """Calculate the rollups for a single period, from the level below it."""
+        for _obs_type in (obs_types or self.rollup_keys):
+            _stats = weewx.accum.init_dict.get(_obs_type, weewx.accum.ScalarStats)()
+            cursor.execute("SELECT * FROM %s_%s_%s WHERE dateTime >= ? AND dateTime < ? ORDER BY dateTime ASC" 
+                           % (self.table_name, finer, _obs_type), (int(span.start), int(span.stop)))
+            for _row in cursor.fetchall():
+                _x_stats = weewx.accum.init_dict.get(_obs_type, weewx.accum.ScalarStats)(_row[1:])
+                _stats.mergeHiLo(_x_stats)
+                _stats.mergeSum(_x_stats)
+            _write_tuple = (int(span.start),) + _stats.getStatsTuple()
+            _qmarks = ','.join(len(_write_tuple)*'?')
+            cursor.execute("REPLACE INTO %s_%s_%s VALUES(%s)" % (self.table_name, level, _obs_type, _qmarks), _write_tuple)
+
+    def rebuild_rollups(self, progress_fn=None):
+        """Drop any rollups, then rebuild them from the daily summaries.
+        
+        progress_fn: If given, this function will be called after each month
+        is rolled up. It will be called with two arguments: the number of
+        months done so far, and the start of the month.
+        
+        returns: The number of months rolled up."""
+        
+        syslog.syslog(syslog.LOG_INFO, "wxmanager: Rebuilding rollups in database '%s'" % self.database_name)
+        self.drop_rollups()
+        with weedb.Transaction(self.connection) as _cursor:
+            self._create_rollup_tables(self.daykeys, _cursor)
+        self.rollup_keys = list(self.daykeys)
+        
+        # Everything up to the start of the day of the last update can be rolled up:
+        _lastUpdate = self._getLastUpdate()
+        if _lastUpdate is None or self.first_timestamp is None:
+            return 0
+        _first_ts = weeutil.weeutil.startOfArchiveDay(self.first_timestamp)
+        _through_ts = weeutil.weeutil.startOfArchiveDay(_lastUpdate)
+        
+        nmonths = 0
+        _finer = 'day'
+        for (level, gen_spans) in self.rollup_levels:
+            for _span in gen_spans(_first_ts, _through_ts):
+                if _span.stop <= _through_ts:
+                    with weedb.Transaction(self.connection) as _cursor:
+                        self._rollup_span(_span, _finer, level, _cursor)
+                    if level == 'month':
+                        nmonths += 1
+                        if progress_fn:
+                            progress_fn(nmonths, _span.start)
+            _finer = level
+        
+        with weedb.Transaction(self.connection) as _cursor:
+            _cursor.execute(self.meta_replace_str % self.table_name, ('rollupsThrough', str(int(_through_ts))))
+        self.rollups_through = _through_ts
+        
+        syslog.syslog(syslog.LOG_INFO, "wxmanager: Rolled up %d months in database '%s'" % (nmonths, self.database_name))
+        return nmonths
+    
+    def drop_rollups(self):
+        """Drop the monthly and yearly rollups."""
+        _all_tables = self.connection.tables()
+        with weedb.Transaction(self.connection) as _cursor:
+            for (level, _) in self.rollup_levels:
+                for _table_name in _all_tables:
+                    if _table_name.startswith('%s_%s_' % (self.table_name, level)):
+                        _cursor.execute("DROP TABLE %s" % _table_name)
+            if '%s_day__metadata' % self.table_name in _all_tables:
+                _cursor.execute("DELETE FROM %s_day__metadata WHERE name = 'rollupsThrough'" % self.table_name)
+        self.rollup_keys = []
+        self.rollups_through = None
+        self._clear_query_cache()
+        
+    def drop_daily(self):
+        """Specialized version that drops the rollups, too."""
+        self.drop_rollups()
+        weewx.manager.DaySummaryManager.drop_daily(self)
+
+    def _create_rollup_tables(self, obs_types, cursor):
+        """Create the monthly and yearly rollup tables for some types."""
+        for (level, _) in self.rollup_levels:
+            for _obs_type in obs_types:
+                if _obs_type == 'wind':
+                    cursor.execute(WXDaySummaryManager.wx_rollup_create_str % (self.table_name, level))
+                else:
+                    cursor.execute(WXDaySummaryManager.rollup_create_str % (self.table_name, level, _obs_type))
+
+    def _getRollupsThrough(self):
+        """Returns the start of the first day that has not been rolled up, or None."""
+        _row = self.getSql(self.select_rollups_str % self.table_name)
+        return int(_row[0]) if _row and _row[0] else None
+
+#===============================================================================
+#                        Class WXWideDaySummaryManager
+#===============================================================================
+
+class WXWideDaySummaryManager(weewx.manager.WideDaySummaryManager, WXDaySummaryManager):
+    """Daily summaries, suitable for WX applications, kept in a single table with
+    one row per day.
+
+    Like WXDaySummaryManager, except it uses the layout of WideDaySummaryManager."""
+
+    # Wind is not in the archive schema, but it gets a vector summary:
+    vector_types = ['wind']
+
+
+class WXPartitionedDaySummaryManager(weewx.manager.PartitionedManager, WXDaySummaryManager):
+    """Like WXDaySummaryManager, except the archive is kept in one table per
+    year. See PartitionedManager."""
+
+
+class WXPartitionedWideDaySummaryManager(weewx.manager.PartitionedManager, WXWideDaySummaryManager):
+    """Like WXWideDaySummaryManager, except the archive is kept in one table per
+    year. See PartitionedManager."""
@@ -333,7 +333,7 @@ class WXCalculate(object):
                 "SELECT"
                 " MAX(outTemp),MIN(outTemp),AVG(radiation),AVG(windSpeed),usUnits"
                 " FROM %s WHERE dateTime>? AND dateTime <=?"
-                % dbmanager.table_name, (start_ts, end_ts))
+                % dbmanager.table_for_span(start_ts, end_ts), (start_ts, end_ts))
             if r is None or None in r:
                 data['ET'] = None
             else:
@@ -369,7 +369,7 @@ class WXCalculate(object):
             for row in dbmanager.genSql("SELECT `interval`,windSpeed,usUnits"
                                         " FROM %s"
                                         " WHERE dateTime>? AND dateTime<=?" %
-                                        dbmanager.table_name, (sts, ets)):
+                                        dbmanager.table_for_span(sts, ets), (sts, ets)):
                 if row is None or None in row:
                     continue
                 if row[1]:
@@ -402,7 +402,7 @@ class WXCalculate(object):
         if ts12 != self.ts_12h_ago:
             # We're in a new interval. Hit the database to get the temperature
             dbmanager = self.db_binder.get_manager(self.binding)
-            record = dbmanager.getRecord(ts12, max_delta=self.max_delta_12h)
+            record = dbmanager.getRecord(ts12, max_delta=self.max_delta_12h, columns=['outTemp'])
             if record is None:
                 # Nothing in the database. Set temperature to None.
                 self.temperature_12h_ago = None
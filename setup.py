@@ -191,6 +191,7 @@ class weewx_install_data(install_data):
                 if DEBUG:
                     print "Station info =", stn_info
             weecfg.modify_config(config_dict, stn_info, DEBUG)
+            weecfg.modify_new_install(config_dict)
 
         # Set the WEEWX_ROOT
         config_dict['WEEWX_ROOT'] = os.path.normpath(install_dir)